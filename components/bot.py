@@ -1,115 +1,156 @@
 import gradio as gr
-import json
-from pathlib import Path
+import math
 import pandas as pd
 
 from components.ui_styles import RESULTS_COLUMN_WIDTHS_FULL
+from core.results import results_version
+from core.results_index import COLUMNS, list_result_frs, query_page, summary_stats
+from downloads.paths import FINAL_JSON_PATH
 
-def load_full_final_output():
-    """Load the complete final_output.json and convert to DataFrame"""
-    final_output_path = Path("outputs/final_output.json")
-    
-    if not final_output_path.exists():
-        # Return empty DataFrame with proper column structure
-        return pd.DataFrame(columns=[
-            'Document', 'FR ID', 'Test #', 'Test Case', 'Precondition', 'Steps', 
-            'Test Data', 'Expected Result', 'Environment', 'Actual Result', 'Status', 'Jira Bug Link'
-        ])
-    
+ALL_FRS = "All FRs"
+PAGE_SIZES = [25, 50, 100, 200]
+DEFAULT_PAGE_SIZE = 50
+
+def results_signature():
+    """Changes whenever new results land (shard written or final_output.json rewritten)"""
+    try:
+        final_mtime = FINAL_JSON_PATH.stat().st_mtime_ns
+    except OSError:
+        final_mtime = 0
+    return (results_version(), final_mtime)
+
+def load_results_page(page=1, page_size=DEFAULT_PAGE_SIZE, sort_by="FR ID", descending=False, fr_filter=ALL_FRS, search=""):
+    """Load one page of test cases; returns (DataFrame, page label, clamped page)"""
     try:
-        with open(final_output_path, 'r') as f:
-            data = json.load(f)
-        
-        # Extract all test cases from all FRs
-        rows = []
-        document_id = data.get('document_id', 'Unknown Document')
-        
-        for test_suite in data.get('test_suite', []):
-            fr_id = test_suite.get('fr_id', 'Unknown')
-            for i, test_case in enumerate(test_suite.get('test_cases', []), 1):
-                rows.append({
-                    'Document': document_id,
-                    'FR ID': fr_id,
-                    'Test #': i,
-                    'Test Case': test_case.get('title', ''),
-                    'Precondition': test_case.get('precondition', ''),
-                    'Steps': test_case.get('steps', ''),
-                    'Test Data': test_case.get('test_data', ''),
-                    'Expected Result': test_case.get('expected_result', ''),
-                    'Environment': test_case.get('environment', ''),
-                    'Actual Result': test_case.get('actual_result', ''),
-                    'Status': test_case.get('status', ''),
-                    'Jira Bug Link': test_case.get('jira_bug_link', '')
-                })
-        
-        if rows:
-            return pd.DataFrame(rows)
-        else:
-            # Return empty DataFrame if no test cases found
-            return pd.DataFrame(columns=[
-                'Document', 'FR ID', 'Test #', 'Test Case', 'Precondition', 'Steps', 
-                'Test Data', 'Expected Result', 'Environment', 'Actual Result', 'Status', 'Jira Bug Link'
-            ])
-            
+        fr = None if fr_filter in (None, "", ALL_FRS) else fr_filter
+        page_size = int(page_size or DEFAULT_PAGE_SIZE)
+        rows, total = query_page(page, page_size, sort_by, descending, fr, search)
+        pages = max(1, math.ceil(total / page_size))
+        if page > pages:
+            page = pages
+            rows, total = query_page(page, page_size, sort_by, descending, fr, search)
     except Exception as e:
-        print(f"Error loading final output in bot: {e}")
-        # Return empty DataFrame on error instead of dummy data
-        return pd.DataFrame(columns=[
-            'Document', 'FR ID', 'Test #', 'Test Case', 'Precondition', 'Steps', 
-            'Test Data', 'Expected Result', 'Environment', 'Actual Result', 'Status', 'Jira Bug Link'
-        ])
+        print(f"Error loading results page in bot: {e}")
+        rows, total, pages = [], 0, 1
+
+    df = pd.DataFrame(rows, columns=list(COLUMNS)) if rows else pd.DataFrame(columns=list(COLUMNS))
+    label = f"Page {page} of {pages} — {total} test case(s)"
+    if search and search.strip():
+        label += f" matching “{search.strip()}”"
+    return df, label, page
 
 def get_summary_stats():
-    """Get summary statistics from the final output"""
-    final_output_path = Path("outputs/final_output.json")
-    
-    if not final_output_path.exists():
-        return "No results available yet. Please run the analysis first."
-    
+    """Get summary statistics from the results index"""
     try:
-        with open(final_output_path, 'r') as f:
-            data = json.load(f)
-        
-        total_frs = len(data.get('test_suite', []))
-        total_test_cases = sum(len(suite.get('test_cases', [])) for suite in data.get('test_suite', []))
-        document_id = data.get('document_id', 'Unknown Document')
-        
-        avg = total_test_cases / total_frs if total_frs > 0 else 0.0
-        return (
-            f"📊 **{document_id}** — "
-            f"{total_frs} FR(s), {total_test_cases} test case(s), "
-            f"{avg:.1f} avg per FR"
-        )
-               
+        stats = summary_stats()
     except Exception as e:
         return f"Error loading summary: {e}"
 
+    if not stats["frs"]:
+        return "No results available yet. Please run the analysis first."
+
+    document_id = stats["first_document"] or "Unknown Document"
+    if stats["documents"] > 1:
+        document_id = f"{stats['documents']} documents"
+    avg = stats["test_cases"] / stats["frs"]
+    return (
+        f"📊 **{document_id}** — "
+        f"{stats['frs']} FR(s), {stats['test_cases']} test case(s), "
+        f"{avg:.1f} avg per FR"
+    )
+
+def fr_filter_choices():
+    try:
+        return [ALL_FRS] + list_result_frs()
+    except Exception:
+        return [ALL_FRS]
+
 def bot():
     from config import UI_POLL_INTERVAL_SEC
 
     gr.Markdown("### Final compiled test cases")
-    
+
     # Summary statistics
     summary = gr.Markdown(get_summary_stats())
-    
-    # Full results dataframe
+
+    searchBox = gr.Textbox(
+        label="Search test cases",
+        placeholder="e.g. phone number — matches title, steps, data, expected result",
+    )
+
+    with gr.Row():
+        frFilter = gr.Dropdown(choices=fr_filter_choices(), value=ALL_FRS, label="FR", interactive=True)
+        sortBy = gr.Dropdown(choices=list(COLUMNS), value="FR ID", label="Sort by", interactive=True)
+        sortDesc = gr.Checkbox(value=False, label="Descending")
+        pageSize = gr.Dropdown(choices=PAGE_SIZES, value=DEFAULT_PAGE_SIZE, label="Rows per page", interactive=True)
+
+    initial_df, initial_label, _ = load_results_page()
+
+    # One page of results; the server only sends the rows being looked at
     full_results = gr.Dataframe(
-        value=load_full_final_output(),
+        value=initial_df,
         label="Complete Test Cases",
         wrap=True,
         column_widths=RESULTS_COLUMN_WIDTHS_FULL,
         interactive=False,
         elem_classes=["dect-df", "dect-df-full"],
     )
-    
-    def poll_results():
-        return get_summary_stats(), load_full_final_output()
+
+    with gr.Row():
+        prevButton = gr.Button("◀ Previous", size="sm")
+        pageLabel = gr.Markdown(initial_label)
+        nextButton = gr.Button("Next ▶", size="sm")
+
+    page = gr.State(1)
+    shown_signature = gr.State(results_signature())
+
+    view_inputs = [page, pageSize, sortBy, sortDesc, frFilter, searchBox]
+    view_outputs = [full_results, pageLabel, page]
+
+    def show_page(page_number, page_size, sort_by, descending, fr_filter, search):
+        return load_results_page(max(1, int(page_number)), page_size, sort_by, descending, fr_filter, search)
+
+    def first_page(page_size, sort_by, descending, fr_filter, search):
+        return load_results_page(1, page_size, sort_by, descending, fr_filter, search)
+
+    for control in (frFilter, sortBy, sortDesc, pageSize):
+        control.change(
+            fn=first_page,
+            inputs=[pageSize, sortBy, sortDesc, frFilter, searchBox],
+            outputs=view_outputs,
+        )
+    searchBox.change(
+        fn=first_page,
+        inputs=[pageSize, sortBy, sortDesc, frFilter, searchBox],
+        outputs=view_outputs,
+        trigger_mode="always_last",
+    )
+    prevButton.click(
+        fn=lambda p, *args: show_page(p - 1, *args),
+        inputs=view_inputs,
+        outputs=view_outputs,
+    )
+    nextButton.click(
+        fn=lambda p, *args: show_page(p + 1, *args),
+        inputs=view_inputs,
+        outputs=view_outputs,
+    )
+
+    def poll_results(signature, page_number, page_size, sort_by, descending, fr_filter, search):
+        """Re-query the visible page only when results changed since it was shown"""
+        current = results_signature()
+        if tuple(signature or ()) == current:
+            return [gr.update()] * 6
+        df, label, page_number = show_page(page_number, page_size, sort_by, descending, fr_filter, search)
+        choices = fr_filter_choices()
+        fr_update = gr.update(choices=choices, value=fr_filter if fr_filter in choices else ALL_FRS)
+        return [get_summary_stats(), fr_update, df, label, page_number, current]
 
     results_timer = gr.Timer(value=UI_POLL_INTERVAL_SEC)
     results_timer.tick(
         fn=poll_results,
-        inputs=None,
-        outputs=[summary, full_results],
+        inputs=[shown_signature] + view_inputs,
+        outputs=[summary, frFilter, full_results, pageLabel, page, shown_signature],
     )
 
-    return {"summary": summary, "dataframe": full_results}
\ No newline at end of file
+    return {"summary": summary, "dataframe": full_results}
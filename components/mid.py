@@ -1,45 +1,32 @@
 import gradio as gr
 import json
 import pandas as pd
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from core.io import load_step_file
+from core.logbook_index import find_step, list_fr_ids, step_files
+
+# Parsed step tabs keyed by file path, reused while the file's mtime is unchanged
+STEP_DF_CACHE_SIZE = 256
+_step_df_cache: "OrderedDict[str, Tuple[int, Tuple[pd.DataFrame, str]]]" = OrderedDict()
+
 SECTION_TITLE_STYLE = (
     "text-align: center; margin: 0.25rem 0; "
     "font-size: 1.05rem; font-weight: 600; line-height: 1.3;"
 )
 
 def get_available_frs() -> List[str]:
-    """Get list of available FR IDs from the pipeline logbook"""
-    logbook_base = Path("data/pdf_logbook")
-    fr_ids = []
-    
-    if logbook_base.exists():
-        for pdf_dir in logbook_base.iterdir():
-            if pdf_dir.is_dir():
-                for fr_dir in pdf_dir.iterdir():
-                    if fr_dir.is_dir() and fr_dir.name.startswith('FR-'):
-                        if fr_dir.name not in fr_ids:
-                            fr_ids.append(fr_dir.name)
-    
-    return sorted(fr_ids) if fr_ids else ["No FRs available"]
+    """Get list of available FR IDs from the logbook index"""
+    fr_ids = list_fr_ids()
+    return fr_ids if fr_ids else ["No FRs available"]
 
 def find_fr_step_file(fr_id: str, step: int) -> Optional[Path]:
     """Find the step file for a given FR ID and step number"""
-    logbook_base = Path("data/pdf_logbook")
-    
-    if not logbook_base.exists():
-        return None
-    
-    # Search through all PDF directories
-    for pdf_dir in logbook_base.iterdir():
-        if pdf_dir.is_dir():
-            fr_dir = pdf_dir / fr_id
-            if fr_dir.exists():
-                step_file = fr_dir / f"step{step}.json"
-                if step_file.exists():
-                    return step_file
-    
+    step_file = find_step(fr_id, step)
+    if step_file and step_file.exists():
+        return step_file
     return None
 
 def load_step_data(fr_id: str, step: int) -> Tuple[pd.DataFrame, str]:
@@ -53,8 +40,29 @@ def load_step_data(fr_id: str, step: int) -> Tuple[pd.DataFrame, str]:
         return pd.DataFrame([{"Message": f"Step {step} data not found for {fr_id}"}]), f"❌ Step {step} not found"
     
     try:
-        with open(step_file, 'r') as f:
-            data = json.load(f)
+        mtime = step_file.stat().st_mtime_ns
+    except OSError:
+        return pd.DataFrame([{"Message": f"Step {step} data not found for {fr_id}"}]), f"❌ Step {step} not found"
+    
+    key = str(step_file)
+    cached = _step_df_cache.get(key)
+    if cached and cached[0] == mtime:
+        _step_df_cache.move_to_end(key)
+        return cached[1]
+    
+    result = _step_file_to_dataframe(step_file, step)
+    _step_df_cache[key] = (mtime, result)
+    while len(_step_df_cache) > STEP_DF_CACHE_SIZE:
+        _step_df_cache.popitem(last=False)
+    return result
+
+def _step_file_to_dataframe(step_file: Path, step: int) -> Tuple[pd.DataFrame, str]:
+    """Parse one step file into the DataFrame and status shown in its tab"""
+    try:
+        # Handles compact/compressed logbook files transparently
+        data = load_step_file(step_file, resolve=False)
+        if data is None:
+            raise ValueError(f"unreadable step file {step_file.name}")
         
         # Check if we have LLM response data
         if 'llm_response' in data and data['llm_response']:
@@ -160,19 +168,35 @@ def load_step_data(fr_id: str, step: int) -> Tuple[pd.DataFrame, str]:
         error_df = pd.DataFrame([{"Error": f"Failed to load step {step}: {str(e)}"}])
         return error_df, f"❌ Error loading step {step}"
 
+def step_signature(fr_id: str, step: int) -> Tuple:
+    """Identifies what a tab would show: changes when the step file is (re)written"""
+    step_file = find_fr_step_file(fr_id, step) if fr_id else None
+    try:
+        return (fr_id, step, str(step_file), step_file.stat().st_mtime_ns) if step_file else (fr_id, step, None, None)
+    except OSError:
+        return (fr_id, step, None, None)
+
 def get_fr_summary(fr_id: str) -> str:
     """Get summary information about an FR"""
     if fr_id == "No FRs available" or not fr_id:
         return "Select an FR to view details"
     
     # Count completed steps
-    completed_steps = 0
-    for step in range(1, 9):
-        if find_fr_step_file(fr_id, step):
-            completed_steps += 1
+    completed_steps = len({step for _pdf, _fr, step, _path in step_files(fr_id=fr_id)})
     
     return f"📋 **{fr_id}** | Completed Steps: {completed_steps}/8 | Progress: {completed_steps/8*100:.0f}%"
 
+STEP_TABS = [
+    ("Step 1: Atomic Blocks", "Atomic Blocks - Breaking down requirements into testable units"),
+    ("Step 2: Partitions", "Equivalence Partitions - Valid and invalid input categories"),
+    ("Step 3: Boundaries", "Boundary Values - Edge cases and limits"),
+    ("Step 4: Test Values", "Test Values - Concrete examples for each partition"),
+    ("Step 5: Unified List", "Unified List - Combined test values"),
+    ("Step 6: Deduped List", "Deduped List - Cleaned test values"),
+    ("Step 7: Organized Data", "Organized Data - Structured test groups"),
+    ("Step 8: Test Cases", "Final Test Cases - Complete test specifications"),
+]
+
 def mid():
     from config import UI_POLL_INTERVAL_SEC
 
@@ -195,139 +219,90 @@ def mid():
         
     # FR Summary
     frSummary = gr.Markdown(get_fr_summary(initial_fr))
+
+    # Only the open tab is loaded; shown_sigs remembers what each tab displays
+    # (see step_signature) so ticks can skip tabs whose step file has not changed
+    active_step = gr.State(1)
+    shown_sigs = gr.State({1: step_signature(initial_fr, 1)})
+    fr_choices = gr.State(available_frs)
     
-    # Create all step dataframes with initial data
+    step_tabs = []
+    step_outputs = []
     with gr.Tabs():
-        with gr.Tab("Step 1: Atomic Blocks"):
-            step1_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 1)[0],
-                label="Atomic Blocks - Breaking down requirements into testable units",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step1_status = gr.Markdown(load_step_data(initial_fr, 1)[1])
-            
-        with gr.Tab("Step 2: Partitions"):
-            step2_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 2)[0],
-                label="Equivalence Partitions - Valid and invalid input categories",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step2_status = gr.Markdown(load_step_data(initial_fr, 2)[1])
-            
-        with gr.Tab("Step 3: Boundaries"):
-            step3_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 3)[0],
-                label="Boundary Values - Edge cases and limits",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step3_status = gr.Markdown(load_step_data(initial_fr, 3)[1])
-            
-        with gr.Tab("Step 4: Test Values"):
-            step4_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 4)[0],
-                label="Test Values - Concrete examples for each partition",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step4_status = gr.Markdown(load_step_data(initial_fr, 4)[1])
-            
-        with gr.Tab("Step 5: Unified List"):
-            step5_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 5)[0],
-                label="Unified List - Combined test values",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step5_status = gr.Markdown(load_step_data(initial_fr, 5)[1])
-            
-        with gr.Tab("Step 6: Deduped List"):
-            step6_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 6)[0],
-                label="Deduped List - Cleaned test values",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step6_status = gr.Markdown(load_step_data(initial_fr, 6)[1])
-            
-        with gr.Tab("Step 7: Organized Data"):
-            step7_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 7)[0],
-                label="Organized Data - Structured test groups",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step7_status = gr.Markdown(load_step_data(initial_fr, 7)[1])
-            
-        with gr.Tab("Step 8: Test Cases"):
-            step8_df = gr.Dataframe(
-                value=load_step_data(initial_fr, 8)[0],
-                label="Final Test Cases - Complete test specifications",
-                wrap=True,
-                elem_classes=["dect-df"],
-            )
-            step8_status = gr.Markdown(load_step_data(initial_fr, 8)[1])
-    
-    # Function to update all tabs when FR selection changes
-    def update_all_steps(selected_fr):
-        """Update all step dataframes when FR selection changes"""
-        results = []
-        
-        # Update summary
-        summary = get_fr_summary(selected_fr)
-        results.append(summary)
-        
-        # Update all 8 steps
-        for step in range(1, 9):
+        for step, (title, label) in enumerate(STEP_TABS, 1):
+            if step == 1:
+                initial_df, initial_status = load_step_data(initial_fr, 1)
+            else:
+                initial_df, initial_status = pd.DataFrame(), ""
+            with gr.Tab(title) as tab:
+                step_df = gr.Dataframe(
+                    value=initial_df,
+                    label=label,
+                    wrap=True,
+                    elem_classes=["dect-df"],
+                )
+                step_status = gr.Markdown(initial_status)
+            step_tabs.append(tab)
+            step_outputs.extend([step_df, step_status])
+
+    def step_updates(selected_fr, step, sigs):
+        """Updates for all tabs: load `step` if its file changed, no-ops elsewhere"""
+        sigs = dict(sigs or {})
+        results = [gr.update(), gr.update()] * len(STEP_TABS)
+        sig = step_signature(selected_fr, step)
+        if sigs.get(step) != sig:
             df, status = load_step_data(selected_fr, step)
-            results.extend([df, status])  # Add both dataframe and status
-        
-        return results
+            results[2 * (step - 1)] = df
+            results[2 * (step - 1) + 1] = status
+            sigs[step] = sig
+        return results, sigs
+
+    def open_step(step):
+        def handler(selected_fr, sigs):
+            results, sigs = step_updates(selected_fr, step, sigs)
+            return [step, sigs] + results
+        return handler
+
+    for step, tab in enumerate(step_tabs, 1):
+        tab.select(
+            fn=open_step(step),
+            inputs=[selectFr, shown_sigs],
+            outputs=[active_step, shown_sigs] + step_outputs,
+        )
     
-    def poll_fr_view(selected_fr):
-        """Periodic refresh: update FR list and step data; keep current FR if still valid."""
+    def change_fr(selected_fr, step):
+        """Load the open tab for the newly selected FR; other tabs load when opened"""
+        results, sigs = step_updates(selected_fr, step, {})
+        return [get_fr_summary(selected_fr), sigs] + results
+    
+    def poll_fr_view(selected_fr, step, sigs, choices):
+        """Periodic refresh: update FR list and the open tab; keep current FR if still valid."""
         new_frs = get_available_frs()
         if selected_fr in new_frs:
             current = selected_fr
         else:
             current = new_frs[0] if new_frs else "No FRs available"
-        update_results = update_all_steps(current)
-        return [gr.update(choices=new_frs, value=current)] + update_results
+        if new_frs == choices and current == selected_fr:
+            dropdown = gr.update()
+        else:
+            dropdown = gr.update(choices=new_frs, value=current)
+            if current != selected_fr:
+                sigs = {}
+        results, sigs = step_updates(current, step, sigs)
+        return [dropdown, get_fr_summary(current), sigs, new_frs] + results
 
-    # Connect FR selection to update all steps
+    # Connect FR selection to the open tab
     selectFr.change(
-        fn=update_all_steps,
-        inputs=[selectFr],
-        outputs=[
-            frSummary,
-            step1_df, step1_status,
-            step2_df, step2_status,
-            step3_df, step3_status,
-            step4_df, step4_status,
-            step5_df, step5_status,
-            step6_df, step6_status,
-            step7_df, step7_status,
-            step8_df, step8_status
-        ]
+        fn=change_fr,
+        inputs=[selectFr, active_step],
+        outputs=[frSummary, shown_sigs] + step_outputs,
     )
     
     fr_timer = gr.Timer(value=UI_POLL_INTERVAL_SEC)
     fr_timer.tick(
         fn=poll_fr_view,
-        inputs=[selectFr],
-        outputs=[
-            selectFr, frSummary,
-            step1_df, step1_status,
-            step2_df, step2_status,
-            step3_df, step3_status,
-            step4_df, step4_status,
-            step5_df, step5_status,
-            step6_df, step6_status,
-            step7_df, step7_status,
-            step8_df, step8_status,
-        ],
+        inputs=[selectFr, active_step, shown_sigs, fr_choices],
+        outputs=[selectFr, frSummary, shown_sigs, fr_choices] + step_outputs,
     )
 
-    gr.Markdown("---")
\ No newline at end of file
+    gr.Markdown("---")
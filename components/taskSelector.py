@@ -1,211 +1,276 @@
 import gradio as gr
 import json
-import os
+import math
 from pathlib import Path
 
+# Requirements shown per page of the picker (documents can have hundreds of FRs)
+REQUIREMENTS_PAGE_SIZE = 50
+
 class TaskSelector:
     def __init__(self, json_directory="data/extractedFR"):
         self.json_directory = json_directory
         self.json_files = {}
+        # file name -> {requirement id: requirement}, in document order
+        self.requirements_by_id = {}
+        self._mtimes = {}
         self.load_json_files()
-        
+
     def load_json_files(self):
-        """Load all JSON files from the extractedFR directory"""
-        self.json_files = {}
+        """Load JSON files from the extractedFR directory, re-parsing only files whose mtime changed"""
         json_dir = Path(self.json_directory)
-        
+
         if not json_dir.exists():
+            self.json_files, self.requirements_by_id, self._mtimes = {}, {}, {}
             return
-            
+
+        seen = set()
         for json_file in json_dir.glob("*.json"):
+            name = json_file.stem
+            try:
+                mtime = json_file.stat().st_mtime_ns
+            except OSError:
+                continue
+            seen.add(name)
+            if self._mtimes.get(name) == mtime:
+                continue
+            self._mtimes[name] = mtime
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.json_files[json_file.stem] = data
             except Exception as e:
                 print(f"Error loading {json_file}: {e}")
-    
+                self.json_files.pop(name, None)
+                self.requirements_by_id.pop(name, None)
+                continue
+            self.json_files[name] = data
+            self.requirements_by_id[name] = {
+                req.get('id', 'N/A'): req for req in data.get('requirements', [])
+            }
+
+        for name in list(self._mtimes):
+            if name not in seen:
+                self._mtimes.pop(name, None)
+                self.json_files.pop(name, None)
+                self.requirements_by_id.pop(name, None)
+
     def refresh_json_files(self):
         """Refresh the list of JSON files (called after PDF processing)"""
         self.load_json_files()
         return self.get_file_options()
-    
+
     def get_file_options(self):
         """Get list of available JSON files"""
-        return list(self.json_files.keys())
-    
+        return sorted(self.json_files.keys())
+
     def has_files(self):
         """Check if there are any JSON files available"""
         return len(self.json_files) > 0
-    
+
     def is_directory_empty(self):
         """Check if the extractedFR directory is empty or doesn't exist"""
         json_dir = Path(self.json_directory)
         if not json_dir.exists():
             return True
-        return len(list(json_dir.glob("*.json"))) == 0
-    
+        return not any(json_dir.glob("*.json"))
+
+    def _requirement(self, selected_file, selected):
+        """Look up a requirement by id (also accepts legacy "id: text" labels)"""
+        requirements = self.requirements_by_id.get(selected_file, {})
+        if selected in requirements:
+            return selected, requirements[selected]
+        req_id = str(selected).split(':')[0]
+        return req_id, requirements.get(req_id)
+
     def get_requirements_for_file(self, selected_file):
         """Get requirements from selected JSON file"""
         if not selected_file or selected_file not in self.json_files:
             return [], "Please select a valid file"
-            
-        data = self.json_files[selected_file]
-        requirements = data.get('requirements', [])
-        
+
+        requirements = self.requirements_by_id[selected_file]
+
         # Format requirements for display
-        formatted_reqs = []
-        for req in requirements:
-            req_id = req.get('id', 'N/A')
-            req_text = req.get('text', 'No description')
-            formatted_reqs.append(f"{req_id}: {req_text}")
-            
+        formatted_reqs = [
+            f"{req_id}: {req.get('text', 'No description')}" for req_id, req in requirements.items()
+        ]
+
         return formatted_reqs, f"Loaded {len(requirements)} requirements from {selected_file}.json"
-    
+
+    def get_requirement_ids(self, selected_file, query=""):
+        """Requirement ids of a file in document order, or full-text matches for `query`"""
+        requirements = self.requirements_by_id.get(selected_file, {})
+        if not query or not query.strip():
+            return list(requirements)
+        from core.search import search_requirements
+
+        hits = search_requirements(query, doc=selected_file)
+        return [hit['fr_id'] for hit in hits if hit['fr_id'] in requirements]
+
+    def requirement_choices(self, selected_file, req_ids):
+        """(label, id) choices for a CheckboxGroup"""
+        requirements = self.requirements_by_id.get(selected_file, {})
+        return [
+            (f"{req_id}: {requirements[req_id].get('text', 'No description')}", req_id)
+            for req_id in req_ids
+            if req_id in requirements
+        ]
+
     def handle_requirement_selection(self, selected_file, selected_requirements):
         """Handle when user selects specific requirements"""
         if not selected_requirements:
             return "No requirements selected"
-            
+
         result = f"Selected from {selected_file}:\n\n"
-        
-        # Get the original data to extract full details
-        data = self.json_files.get(selected_file, {})
-        requirements = data.get('requirements', [])
-        
+
         for selected in selected_requirements:
-            # Extract the ID from the formatted string
-            req_id = selected.split(':')[0]
-            
-            # Find the full requirement data
-            for req in requirements:
-                if req.get('id') == req_id:
-                    result += f"• {req_id}: {req.get('text', '')}\n\n"
-                    break
-                    
+            req_id, req = self._requirement(selected_file, selected)
+            if req is not None:
+                result += f"• {req_id}: {req.get('text', '')}\n\n"
+
         return result
-    
+
     def format_all_selected_requirements(self, all_files_data):
         """Format all selected requirements from all files for display"""
         if not all_files_data:
             return "No tasks selected"
-        
-        result = "🎯 Currently Selected Tasks:\n\n"
+
+        result = ""
         total_count = 0
-        
+
         for file_name, selected_requirements in all_files_data.items():
             if selected_requirements:
                 result += f"📁 From {file_name}.json:\n"
-                data = self.json_files.get(file_name, {})
-                requirements = data.get('requirements', [])
-                
+
                 for selected in selected_requirements:
-                    # Extract the ID from the formatted string
-                    req_id = selected.split(':')[0]
-                    
-                    # Find the full requirement data
-                    for req in requirements:
-                        if req.get('id') == req_id:
-                            result += f"  • {req_id}: {req.get('text', '')}\n"
-                            total_count += 1
-                            break
+                    req_id, req = self._requirement(file_name, selected)
+                    if req is not None:
+                        result += f"  • {req_id}: {req.get('text', '')}\n"
+                        total_count += 1
                 result += "\n"
-        
+
         if total_count == 0:
             return "No tasks selected"
-        
-        result = f"🎯 Currently Selected Tasks ({total_count} total):\n\n" + result[len("🎯 Currently Selected Tasks:\n\n"):]
-        return result
-    
+
+        return f"🎯 Currently Selected Tasks ({total_count} total):\n\n" + result
+
     def get_selected_requirements_data(self, selected_file, selected_requirements):
         """Get the actual requirement data for selected items"""
         if not selected_requirements or not selected_file:
             return []
-            
-        data = self.json_files.get(selected_file, {})
-        requirements = data.get('requirements', [])
+
         selected_data = []
-        
         for selected in selected_requirements:
-            # Extract the ID from the formatted string
-            req_id = selected.split(':')[0]
-            
-            # Find the full requirement data
-            for req in requirements:
-                if req.get('id') == req_id:
-                    selected_data.append(req)
-                    break
-                    
+            _req_id, req = self._requirement(selected_file, selected)
+            if req is not None:
+                selected_data.append(req)
+
         return selected_data
-    
+
     def create_tasks_json(self, all_files_data, output_dir="data", filename="selected_tasks.json"):
         """Create a JSON file with all selected tasks organized by file name"""
         import os
-        
+
         # Create the start directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
-        
+
         # Build the JSON structure
         tasks_json = {}
-        
+
         for file_name, selected_requirements in all_files_data.items():
             if selected_requirements:
-                # Get the original data
-                data = self.json_files.get(file_name, {})
-                requirements = data.get('requirements', [])
-                
-                # Create an array for this file's requirements
+                # Create an array for this file's requirements (ID as key)
                 file_requirements = []
-                
                 for selected in selected_requirements:
-                    # Extract the ID from the formatted string
-                    req_id = selected.split(':')[0]
-                    
-                    # Find the full requirement data
-                    for req in requirements:
-                        if req.get('id') == req_id:
-                            # Create the requirement object with ID as key
-                            file_requirements.append({
-                                req_id: req.get('text', 'No description')
-                            })
-                            break
-                
+                    req_id, req = self._requirement(file_name, selected)
+                    if req is not None:
+                        file_requirements.append({req_id: req.get('text', 'No description')})
+
                 # Add to the main JSON structure if we have requirements
                 if file_requirements:
                     tasks_json[file_name] = file_requirements
-        
+
         # Write to file
         output_path = os.path.join(output_dir, filename)
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(tasks_json, f, indent=4, ensure_ascii=False)
-        
+
         return output_path, len(tasks_json), sum(len(reqs) for reqs in tasks_json.values())
 
 def create_task_selector():
     """Create and return the task selector component"""
     selector = TaskSelector()
-    
-    # Store selections from all files
+
+    # Selected requirement ids per file (kept across pages and searches; the
+    # tasks JSON written for a run is shared by the app)
     all_selections = {}
-    
-    def update_requirements_list(selected_file):
+
+    def new_view():
+        """Per-session search text, page and last timer render (held in a gr.State)"""
+        return {"query": "", "page": 1, "rendered": None}
+
+    def visible_ids(selected_file, view):
+        """Requirement ids matching the session's search (all pages)"""
+        return selector.get_requirement_ids(selected_file, view["query"])
+
+    def page_ids(selected_file, view):
+        """Ids on the session's page (clamped to the pages there are), total, page, pages"""
+        ids = visible_ids(selected_file, view)
+        pages = max(1, math.ceil(len(ids) / REQUIREMENTS_PAGE_SIZE))
+        page = min(max(1, view["page"]), pages)
+        start = (page - 1) * REQUIREMENTS_PAGE_SIZE
+        return ids[start:start + REQUIREMENTS_PAGE_SIZE], len(ids), page, pages
+
+    def requirements_update(selected_file, view, interactive=True):
+        """CheckboxGroup update for the session's page (the label carries page info),
+        and the view with that page"""
+        if not selected_file:
+            update = gr.update(choices=[], value=[], label="📝 Available Requirements", interactive=interactive)
+            return update, {**view, "page": 1}
+        ids, total, page, pages = page_ids(selected_file, view)
+        selected = set(all_selections.get(selected_file, []))
+        label = f"📝 Available Requirements — page {page}/{pages}, {total} shown, {len(selected)} selected"
+        update = gr.update(
+            choices=selector.requirement_choices(selected_file, ids),
+            value=[req_id for req_id in ids if req_id in selected],
+            label=label,
+            interactive=interactive,
+        )
+        return update, {**view, "page": page}
+
+    def update_requirements_list(selected_file, view):
         """Update the requirements checkboxes based on selected file"""
-        requirements, status = selector.get_requirements_for_file(selected_file)
-        # Restore previous selections for this file if any
-        previous_selection = all_selections.get(selected_file, [])
-        return gr.update(choices=requirements, value=previous_selection), status
-    
-    def select_all_requirements(selected_file):
-        """Select all available requirements"""
-        requirements, _ = selector.get_requirements_for_file(selected_file)
-        return gr.update(value=requirements)
-    
-    def deselect_all_requirements():
-        """Deselect all requirements"""
-        return gr.update(value=[])
-    
-    def _task_selector_ui_state(selected_file):
-        """Build dropdown/requirements/title updates from current disk state."""
+        _, status = selector.get_requirements_for_file(selected_file)
+        update, view = requirements_update(selected_file, {**view, "page": 1})
+        return update, status, view
+
+    def search_requirements(selected_file, query, view):
+        """Filter the requirement list with the full-text index"""
+        return requirements_update(selected_file, {**view, "query": query or "", "page": 1})
+
+    def change_page(delta):
+        def handler(selected_file, view):
+            return requirements_update(selected_file, {**view, "page": view["page"] + delta})
+        return handler
+
+    def select_all_requirements(selected_file, view):
+        """Select every requirement matching the search (all pages), keeping earlier picks"""
+        if selected_file:
+            selected = list(all_selections.get(selected_file, []))
+            known = set(selected)
+            selected += [req_id for req_id in visible_ids(selected_file, view) if req_id not in known]
+            all_selections[selected_file] = selected
+        return requirements_update(selected_file, view)
+
+    def deselect_all_requirements(selected_file, view):
+        """Deselect every requirement matching the search (all pages)"""
+        if selected_file:
+            hidden = set(visible_ids(selected_file, view))
+            all_selections[selected_file] = [
+                req_id for req_id in all_selections.get(selected_file, []) if req_id not in hidden
+            ]
+        return requirements_update(selected_file, view)
+
+    def _task_selector_ui_state(selected_file, view):
+        """Build dropdown/requirements/title updates from current disk state, and the view."""
         is_empty = selector.is_directory_empty()
         has_files = selector.has_files()
         file_options = selector.get_file_options()
@@ -215,12 +280,10 @@ def create_task_selector():
         else:
             active_file = file_options[0] if file_options else None
 
-        requirements = []
-        if active_file:
-            requirements, _ = selector.get_requirements_for_file(active_file)
-
-        preserved = all_selections.get(active_file, []) if active_file else []
-        preserved = [r for r in preserved if r in requirements]
+        # Drop selections whose requirement no longer exists
+        for file_name in list(all_selections):
+            known = selector.requirements_by_id.get(file_name, {})
+            all_selections[file_name] = [r for r in all_selections[file_name] if r in known]
 
         if is_empty:
             title_text = "📋 Task selector ⚠️ (no PDFs processed yet)"
@@ -236,61 +299,81 @@ def create_task_selector():
                 "Please upload and process a PDF first using the '1. Process PDF' button above."
             )
 
-        return [
+        requirements, view = requirements_update(active_file, view, interactive=has_files)
+        updates = [
             gr.update(choices=file_options, value=active_file, interactive=has_files),
-            gr.update(choices=requirements, value=preserved, interactive=has_files),
+            requirements,
             output_message,
             gr.update(interactive=has_files),
             gr.update(interactive=has_files),
             gr.update(value=title_text),
         ]
+        return updates, view
 
-    def sync_task_files(current_file):
-        """Reload JSON from disk; keep selections when possible (used by UI timer)."""
+    def sync_task_files(current_file, view):
+        """Reload changed JSON from disk; keep selections when possible (used by UI timer).
+
+        Returns the six task selector updates and the session's view; a tick
+        that would render what this session last got sends no updates.
+        """
         selector.load_json_files()
-        return _task_selector_ui_state(current_file)
-    
-    def update_selections_and_output(selected_file, selected_requirements):
+        updates, view = _task_selector_ui_state(current_file, view)
+        signature = repr(updates)
+        if view["rendered"] == signature:
+            return [*[gr.update()] * len(updates), view]
+        return [*updates, {**view, "rendered": signature}]
+
+    def reset_task_files(clear_selections=True):
+        """Reload from disk and reset search and paging (after processing / clear).
+
+        Returns the six task selector updates and a fresh view for the session.
+        """
+        if clear_selections:
+            all_selections.clear()
+        selector.load_json_files()
+        updates, view = _task_selector_ui_state(None, new_view())
+        return [*updates, view]
+
+    def update_selections_and_output(selected_file, selected_requirements, view):
         """Update the stored selections and output display"""
-        nonlocal all_selections
-        
         if selected_file:
-            all_selections[selected_file] = selected_requirements or []
-        
+            # The checkboxes only hold the current page: merge with other pages
+            on_page = set(page_ids(selected_file, view)[0])
+            checked = set(selected_requirements or [])
+            previous = all_selections.get(selected_file, [])
+            kept = [r for r in previous if r not in on_page or r in checked]
+            known = set(kept)
+            all_selections[selected_file] = kept + [r for r in selected_requirements or [] if r not in known]
+
         # Check if any requirements are selected across all files
         has_selections = any(selections for selections in all_selections.values())
-        
+
         # Format output display
         output_text = selector.format_all_selected_requirements(all_selections)
-        
+
         return str(has_selections), output_text
-    
+
     def get_all_selections():
         """Get all current selections"""
         return all_selections.copy()
-    
+
     def create_tasks_json_file():
         """Create the tasks.json file with all selected tasks"""
         try:
             if not any(selections for selections in all_selections.values()):
                 return "❌ No tasks selected. Please select at least one task before running.", False
-            
+
             output_path, num_files, num_tasks = selector.create_tasks_json(all_selections)
             return f"✅ Tasks JSON created successfully!\n\nFile: {output_path}\nFiles processed: {num_files}\nTotal tasks: {num_tasks}", True
         except Exception as e:
             return f"❌ Error creating tasks JSON: {str(e)}", False
-    
+
     # Check initial state
     is_empty = selector.is_directory_empty()
     has_files = selector.has_files()
     file_options = selector.get_file_options()
     initial_file = file_options[0] if file_options else None
-    
-    # Get initial requirements
-    initial_requirements = []
-    if initial_file:
-        initial_requirements, _ = selector.get_requirements_for_file(initial_file)
-    
+
     # Determine initial output message
     if is_empty:
         initial_output = "📂 No processed PDFs found.\n\nPlease upload and process a PDF first using the '1. Process PDF' button above."
@@ -298,7 +381,7 @@ def create_task_selector():
         initial_output = "⚠️ No valid task files found.\n\nThe extractedFR folder exists but contains no valid JSON files."
     else:
         initial_output = "No tasks selected"
-    
+
     # Dynamic title based on state
     if is_empty:
         title_text = "📋 Task selector ⚠️ (no PDFs processed yet)"
@@ -306,9 +389,9 @@ def create_task_selector():
         title_text = "📋 Task selector ⚠️ (no valid files)"
     else:
         title_text = "📋 Task selector"
-    
+
     title_markdown = gr.Markdown(title_text)
-    
+
     with gr.Row():
         with gr.Column(scale=3):
             # File selector dropdown
@@ -318,19 +401,30 @@ def create_task_selector():
                 label="📁 Select Processed PDF",
                 interactive=has_files
             )
-            
-            # Requirements selector (checkboxes)
+
+            requirement_search = gr.Textbox(
+                label="🔍 Search requirements",
+                placeholder="e.g. phone number",
+                interactive=has_files,
+            )
+
+            # Requirements selector (checkboxes; values are requirement ids)
+            initial_page, _ = requirements_update(initial_file, new_view(), interactive=has_files)
             requirements_selector = gr.CheckboxGroup(
-                choices=initial_requirements,
-                label="📝 Available Requirements",
+                choices=initial_page["choices"],
+                label=initial_page["label"],
                 interactive=has_files
             )
-            
+
+            with gr.Row():
+                prev_page_btn = gr.Button("◀ Prev page", size="sm")
+                next_page_btn = gr.Button("Next page ▶", size="sm")
+
             # Select/Deselect all buttons
             with gr.Row():
                 select_all_btn = gr.Button("✅ Select All", size="sm", interactive=has_files)
                 deselect_all_btn = gr.Button("❌ Deselect All", size="sm", interactive=has_files)
-        
+
         with gr.Column(scale=2):
             # Output textbox showing all selected tasks
             selected_tasks_output = gr.Textbox(
@@ -340,38 +434,58 @@ def create_task_selector():
                 interactive=False,
                 max_lines=15
             )
-    
+
     # Hidden output for storing selection status (used by parent component)
     selection_status = gr.Textbox(value="False", visible=False)
-    
+
+    # Search, page and last timer render of this browser session
+    view_state = gr.State(new_view())
+
     # Event handlers
     file_dropdown.change(
         fn=update_requirements_list,
-        inputs=[file_dropdown],
-        outputs=[requirements_selector, gr.Textbox(visible=False)]  # Status not shown in integrated version
+        inputs=[file_dropdown, view_state],
+        outputs=[requirements_selector, gr.Textbox(visible=False), view_state]  # Status not shown in integrated version
+    )
+
+    requirement_search.change(
+        fn=search_requirements,
+        inputs=[file_dropdown, requirement_search, view_state],
+        outputs=[requirements_selector, view_state],
+        trigger_mode="always_last",
+    )
+
+    prev_page_btn.click(
+        fn=change_page(-1), inputs=[file_dropdown, view_state], outputs=[requirements_selector, view_state]
     )
-    
+    next_page_btn.click(
+        fn=change_page(1), inputs=[file_dropdown, view_state], outputs=[requirements_selector, view_state]
+    )
+
     select_all_btn.click(
         fn=select_all_requirements,
-        inputs=[file_dropdown],
-        outputs=[requirements_selector]
+        inputs=[file_dropdown, view_state],
+        outputs=[requirements_selector, view_state]
     )
-    
+
     deselect_all_btn.click(
         fn=deselect_all_requirements,
-        outputs=[requirements_selector]
+        inputs=[file_dropdown, view_state],
+        outputs=[requirements_selector, view_state]
     )
-    
+
     # Update selection status and output whenever requirements change
     requirements_selector.change(
         fn=update_selections_and_output,
-        inputs=[file_dropdown, requirements_selector],
+        inputs=[file_dropdown, requirements_selector, view_state],
         outputs=[selection_status, selected_tasks_output]
     )
-    
+
     return {
         'file_dropdown': file_dropdown,
+        'view_state': view_state,
         'sync_task_files': sync_task_files,
+        'reset_task_files': reset_task_files,
         'requirements_selector': requirements_selector,
         'select_all_btn': select_all_btn,
         'deselect_all_btn': deselect_all_btn,
@@ -387,22 +501,22 @@ def create_task_selector():
 if __name__ == "__main__":
     with gr.Blocks(title="Task Selector") as demo:
         task_selector = create_task_selector()
-        
+
         # Test output area
         output_text = gr.Textbox(
             label="🎯 Selection Status",
             lines=3,
             interactive=False
         )
-        
+
         def show_selection_status(selected_file, selected_requirements):
-            selector = TaskSelector()
+            selector = task_selector['selector_instance']
             return selector.handle_requirement_selection(selected_file, selected_requirements)
-        
+
         task_selector['requirements_selector'].change(
             fn=show_selection_status,
             inputs=[task_selector['file_dropdown'], task_selector['requirements_selector']],
             outputs=[output_text]
         )
-    
+
     demo.launch(share=True, server_port=7862)
@@ -4,12 +4,23 @@ from io import StringIO
 from components.taskSelector import create_task_selector
 from components.ui_styles import RESULTS_COLUMN_WIDTHS
 from downloads.dataframe import load_final_output_as_dataframe
-from downloads.ensure import get_csv_download_path, get_json_download_path
+from downloads.ensure import (
+    get_csv_download_path,
+    get_json_download_path,
+    get_jsonl_download_path,
+    get_xlsx_download_path,
+)
 from downloads.paths import results_download_available
+from config import PIPELINE_WARM_WORKER, STOP_GRACE_SEC
+from core.cancel import CANCELLED_EXIT_CODE
+from core.log import PIPELINE_LOG, stream_to_log
+from core.warm_worker import WarmWorker
 from time import sleep
 from pathlib import Path
+import logging
 import threading
 import time
+from collections import deque
 import subprocess
 import signal
 import os
@@ -49,19 +60,27 @@ def isButtonValid(x):
         return gr.update(interactive=False)
 
 
+DOWNLOAD_BUTTON_COUNT = 4  # JSON, CSV, XLSX, JSONL
+
+
 def download_buttons_update(interactive: bool):
-    """Enable or disable both download buttons together."""
+    """Enable or disable all download buttons together."""
     if interactive:
-        return gr.update(interactive=True), gr.update(interactive=True)
-    return gr.update(interactive=False, value=None), gr.update(interactive=False, value=None)
+        return tuple(gr.update(interactive=True) for _ in range(DOWNLOAD_BUTTON_COUNT))
+    return tuple(gr.update(interactive=False, value=None) for _ in range(DOWNLOAD_BUTTON_COUNT))
 
 
-def download_buttons_state() -> tuple:
-    """Download button state and file paths (pre-set value = one-click download)."""
-    proc = current_process.get("process")
-    if proc is not None and proc.poll() is None:
-        return download_buttons_update(False)
+def _path_update(path):
+    return gr.update(interactive=True, value=path) if path else gr.update(interactive=False)
 
+
+def download_buttons_state(exports: bool = True) -> tuple:
+    """Download button state and file paths (pre-set value = one-click download).
+
+    Works mid-run too: finished FRs are combined from result shards on demand.
+    With exports=False the XLSX/JSONL buttons are left as they are (they are
+    regenerated from the whole results store, so mid-run polls skip them).
+    """
     if not results_download_available():
         return download_buttons_update(False)
 
@@ -70,9 +89,16 @@ def download_buttons_state() -> tuple:
     if not json_path:
         return download_buttons_update(False)
 
+    if exports:
+        xlsx_update = _path_update(get_xlsx_download_path())
+        jsonl_update = _path_update(get_jsonl_download_path())
+    else:
+        xlsx_update, jsonl_update = gr.update(), gr.update()
     return (
         gr.update(interactive=True, value=json_path),
-        gr.update(interactive=True, value=csv_path) if csv_path else gr.update(interactive=False),
+        _path_update(csv_path),
+        xlsx_update,
+        jsonl_update,
     )
 
 
@@ -87,14 +113,56 @@ def on_files_uploaded(files):
         return btn, STATUS_READY_SIMPLE, STATUS_READY_LOG
     names = [os.path.basename(f.name) for f in files]
     note_files_uploaded(names)
+    # Models may have unloaded since page load (keep_alive); reload before Process/Run
+    warm_ollama()
     simple, detail = get_status_outputs()
     return btn, simple, detail
 
 # Note: updateRunButton and processPdfAndUpdateButton functions have been replaced 
 # with the inline process_pdf_and_refresh function in the top() function
 
+# Long-lived pre-warmed pipeline process (PIPELINE_WARM_WORKER); started on page load
+_warm_worker = WarmWorker()
+
+
+def prestart_pipeline_worker():
+    if PIPELINE_WARM_WORKER:
+        _warm_worker.prestart()
+    warm_ollama()
+
+
+def warm_ollama():
+    """Load the configured Ollama models in the background (no-op for cloud providers)."""
+    from llm_client import warm_ollama_models
+
+    warm_ollama_models()
+
+
+# Shortest gap between two status renders while a run is going
+RUN_UI_MIN_INTERVAL_SEC = 1.0
+
+
+def _wait_for_progress(process, last_render: float, timeout: float) -> None:
+    """Sleep until the run reports progress (warm worker) or `timeout` passes.
+
+    Never returns sooner than RUN_UI_MIN_INTERVAL_SEC after `last_render`
+    (time.monotonic()) unless the run ended: progress arriving in between is
+    drained, so a burst of FR status changes costs one render.
+    """
+    now = time.monotonic()
+    if not hasattr(process, "wait_progress"):
+        time.sleep(max(0.0, last_render + timeout - now))
+        return
+    process.wait_progress(max(0.0, last_render + timeout - now))
+    while process.poll() is None:
+        remaining = last_render + RUN_UI_MIN_INTERVAL_SEC - time.monotonic()
+        if remaining <= 0:
+            return
+        process.wait_progress(remaining)
+
+
 def _start_pipeline_subprocess(max_parallel: int):
-    """Start pipeline subprocess; caller must poll and call _finish_pipeline_subprocess."""
+    """Start a pipeline run (warm worker or subprocess); caller must poll and call _finish_pipeline_subprocess."""
     import sys
     from core.concurrency import set_max_parallel_frs
     from core.status import set_app_status, append_status_log
@@ -107,9 +175,17 @@ def _start_pipeline_subprocess(max_parallel: int):
         active=True,
         simple=f"🚀 Starting pipeline — {parallel} parallel FR(s)",
     )
-    append_status_log("Subprocess: python -m core.simple_run")
     append_status_log(f"Parallel FR limit: {parallel}")
 
+    if PIPELINE_WARM_WORKER:
+        append_status_log("Pipeline worker: warm process (core.warm_worker)")
+        append_status_log(f"Pipeline log: {PIPELINE_LOG}")
+        process = _warm_worker.start_run(parallel)
+        current_process["process"] = process
+        current_process["type"] = "pipeline"
+        return process
+
+    append_status_log("Subprocess: python -m core.simple_run")
     env = os.environ.copy()
     env["MAX_PARALLEL_FRS"] = str(parallel)
 
@@ -121,6 +197,13 @@ def _start_pipeline_subprocess(max_parallel: int):
         cwd=Path.cwd(),
         env=env,
     )
+    # Read both pipes while the run is going; a full pipe would block the child
+    process.stderr_tail = deque(maxlen=40)
+    process.log_threads = [
+        stream_to_log(process.stdout),
+        stream_to_log(process.stderr, logging.WARNING, tail=process.stderr_tail),
+    ]
+    append_status_log(f"Pipeline log: {PIPELINE_LOG}")
     current_process["process"] = process
     current_process["type"] = "pipeline"
     return process
@@ -130,7 +213,10 @@ def _finish_pipeline_subprocess(process):
     """Wait for pipeline process and return (success, status_message)."""
     from core.status import set_app_status, get_status_ui
 
-    stdout, stderr = process.communicate()
+    process.wait()
+    for thread in getattr(process, "log_threads", ()):
+        thread.join(timeout=2)  # rest of the output, for the error message
+    stderr = getattr(process, "error", "") or "\n".join(getattr(process, "stderr_tail", ()))
     current_process["process"] = None
     current_process["type"] = None
 
@@ -144,6 +230,15 @@ def _finish_pipeline_subprocess(process):
         )
         simple, _detail = get_status_ui()
         return True, f"{simple}\n\n📥 Download JSON + CSV below."
+    if process.returncode == CANCELLED_EXIT_CODE:
+        set_app_status(
+            "idle",
+            "Pipeline stopped",
+            "Stopped by user — finished FRs were combined; the rest resume on the next run",
+            active=False,
+            simple="🛑 Stopped — partial results ready",
+        )
+        return True, "🛑 Pipeline stopped by user — partial results ready for download.\n\nRun again to resume the unfinished FRs."
     if process.returncode in (-signal.SIGTERM, -signal.SIGKILL):
         set_app_status(
             "idle", "Pipeline stopped", "Stopped by user", active=False, simple="🛑 Stopped"
@@ -163,9 +258,21 @@ def checkTaskSelection(selection_status):
     is_selected = selection_status == "True"
     return gr.update(interactive=is_selected)
 
-def stop_current_process():
+def _kill_after_grace(process, grace_sec: float) -> None:
+    """Hard-stop a pipeline that did not finish cancelling within the grace period."""
+    try:
+        process.wait(timeout=grace_sec)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def stop_current_process(force: bool = False):
     """Stop pipeline subprocess or in-thread PDF processing.
 
+    The pipeline is cancelled cooperatively: in-flight LLM requests are
+    aborted, finished steps are kept and a partial output is combined. It is
+    killed if it has not stopped after STOP_GRACE_SEC (or at once with force).
+
     Returns (message, kind) where kind is \"pdf\", \"pipeline\", or None.
     """
     from core.status import (
@@ -192,16 +299,24 @@ def stop_current_process():
             process = current_process["process"]
             process_type = current_process["type"]
 
-            if os.name == "nt":
-                process.terminate()
+            if force:
+                process.kill()
+                process.wait()
+                current_process.clear()
             else:
                 process.terminate()
-                try:
-                    process.wait(timeout=3)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-
-            current_process.clear()
+                threading.Thread(
+                    target=_kill_after_grace, args=(process, STOP_GRACE_SEC), daemon=True
+                ).start()
+                append_status_log(f"{process_type.capitalize()} stop requested — finishing in-flight steps")
+                set_app_status(
+                    "pipeline",
+                    "Stopping…",
+                    "Aborting LLM requests and combining finished FRs",
+                    active=True,
+                    simple="🛑 Stopping — saving finished work…",
+                )
+                return "🛑 Stopping…", process_type
 
             append_status_log(f"{process_type.capitalize()} process stopped by user")
             set_app_status(
@@ -243,7 +358,8 @@ def clear_all_data():
         return "✅ All folders already empty"
 
 def top():
-    from config import MAX_PARALLEL_FRS, UI_POLL_INTERVAL_SEC
+    from config import UI_POLL_INTERVAL_SEC
+    from core.concurrency import default_max_parallel_frs
 
     # Header row with title and clear button
     with gr.Row():
@@ -284,6 +400,8 @@ def top():
                 _downloads_ready = results_download_available()
                 _json_download = get_json_download_path() if _downloads_ready else None
                 _csv_download = get_csv_download_path() if _downloads_ready else None
+                _xlsx_download = get_xlsx_download_path() if _downloads_ready else None
+                _jsonl_download = get_jsonl_download_path() if _downloads_ready else None
                 downloadJsonButton = gr.DownloadButton(
                     "📥 Download JSON",
                     value=_json_download,
@@ -296,6 +414,18 @@ def top():
                     interactive=bool(_csv_download),
                     size="md",
                 )
+                downloadXlsxButton = gr.DownloadButton(
+                    "📥 Download XLSX",
+                    value=_xlsx_download,
+                    interactive=bool(_xlsx_download),
+                    size="md",
+                )
+                downloadJsonlButton = gr.DownloadButton(
+                    "📥 Download JSONL",
+                    value=_jsonl_download,
+                    interactive=bool(_jsonl_download),
+                    size="md",
+                )
 
             with gr.Row():
                 processPdfButton = gr.Button("1. Process PDF", interactive=False)
@@ -306,11 +436,11 @@ def top():
                 minimum=1,
                 maximum=99,
                 step=1,
-                value=MAX_PARALLEL_FRS,
+                value=default_max_parallel_frs(),
                 label="Parallel FRs",
                 info=(
                     "Max FRs running LLM steps at the same time. "
-                    "Cloud API: raise if your quota allows; local/Ollama: try 2–4."
+                    "Defaults to the value measured by `python -m core.calibrate` for this model, if any."
                 ),
             )
 
@@ -413,14 +543,28 @@ def top():
             )
             return
 
+        from core.results import results_version
+
+        seen_version = results_version()
+        last_render = time.monotonic()
         while process.poll() is None:
-            time.sleep(1.0)
+            _wait_for_progress(process, last_render, UI_POLL_INTERVAL_SEC)
+            last_render = time.monotonic()
             simple, detail = get_status_ui()
+            # Only touch the downloads and snippet when a new FR result shard landed
+            version = results_version()
+            if version != seen_version:
+                seen_version = version
+                downloads = download_buttons_state(exports=False)
+                snippet = load_final_output_as_dataframe(limit_rows=5, truncate_for_snippet=True)
+            else:
+                downloads = (gr.update(),) * DOWNLOAD_BUTTON_COUNT
+                snippet = gr.update()
             yield (
-                *download_buttons_update(False),
+                *downloads,
                 simple,
                 detail,
-                load_final_output_as_dataframe(limit_rows=5, truncate_for_snippet=True),
+                snippet,
                 gr.update(interactive=False),
                 gr.update(interactive=True),
                 gr.update(interactive=False),
@@ -449,6 +593,8 @@ def top():
         outputs=[
             downloadJsonButton,
             downloadCsvButton,
+            downloadXlsxButton,
+            downloadJsonlButton,
             statusSimple,
             statusLog,
             resultSnippet,
@@ -468,6 +614,7 @@ def top():
             gr.update(),
             gr.update(),
             gr.update(),
+            gr.update(),
         )
 
     def process_pdf_and_refresh(pdf_files):
@@ -533,26 +680,7 @@ def top():
         finally:
             end_pdf_processing()
 
-        task_selector["selector_instance"].load_json_files()
-        has_files = task_selector["selector_instance"].has_files()
-        file_options = task_selector["selector_instance"].get_file_options()
-        initial_file = file_options[0] if file_options else None
-
-        initial_requirements = []
-        if initial_file:
-            initial_requirements, _ = (
-                task_selector["selector_instance"].get_requirements_for_file(initial_file)
-            )
-
-        if not has_files:
-            output_message = (
-                "📂 No processed PDFs found.\n\n"
-                "Please upload and process a PDF first using the '1. Process PDF' button above."
-            )
-            title_text = "📋 Task selector ⚠️ (no PDFs processed yet)"
-        else:
-            output_message = "No tasks selected"
-            title_text = "📋 Task selector"
+        task_updates = task_selector["reset_task_files"](clear_selections=False)
 
         simple, detail = get_status_ui()
         yield (
@@ -562,12 +690,7 @@ def top():
             format_saved_processed_pdfs(),
             gr.update(interactive=False),
             gr.update(interactive=False),
-            gr.update(choices=file_options, value=initial_file, interactive=has_files),
-            gr.update(choices=initial_requirements, value=[], interactive=has_files),
-            output_message,
-            gr.update(interactive=has_files),
-            gr.update(interactive=has_files),
-            gr.update(value=title_text),
+            *task_updates,
         )
 
     processPdfButton.click(
@@ -586,6 +709,7 @@ def top():
             task_selector["select_all_btn"],
             task_selector["deselect_all_btn"],
             task_selector["title_markdown"],
+            task_selector["view_state"],
         ],
         show_progress="full",
         show_progress_on=[statusSimple, statusLog, processPdfButton],
@@ -614,16 +738,16 @@ def top():
             format_saved_processed_pdfs(),
         )
 
-    def poll_status_tasks_and_results(current_file):
+    def poll_status_tasks_and_results(current_file, task_view):
         """Refresh status, results snippet, and task selector from disk."""
         simple, detail, snippet, saved_pdfs = poll_status_and_results()
-        task_updates = task_selector["sync_task_files"](current_file)
+        task_updates = task_selector["sync_task_files"](current_file, task_view)
         return (simple, detail, snippet, saved_pdfs, *task_updates)
 
     status_timer = gr.Timer(value=UI_POLL_INTERVAL_SEC)
     status_timer.tick(
         fn=poll_status_tasks_and_results,
-        inputs=[task_selector["file_dropdown"]],
+        inputs=[task_selector["file_dropdown"], task_selector["view_state"]],
         outputs=[
             statusSimple,
             statusLog,
@@ -635,14 +759,17 @@ def top():
             task_selector["select_all_btn"],
             task_selector["deselect_all_btn"],
             task_selector["title_markdown"],
+            task_selector["view_state"],
         ],
     )
 
+    gr.Blocks.load(None, fn=prestart_pipeline_worker, inputs=None, outputs=None, show_progress="hidden")
+
     gr.Blocks.load(
         None,
         fn=download_buttons_state,
         inputs=None,
-        outputs=[downloadJsonButton, downloadCsvButton],
+        outputs=[downloadJsonButton, downloadCsvButton, downloadXlsxButton, downloadJsonlButton],
     )
 
     # Clear button functionality - resets everything to initial state
@@ -650,18 +777,18 @@ def top():
         """Clear all data and reset UI to initial state"""
         clear_status = clear_all_data()
         
-        # Reset task selector
-        task_selector['selector_instance'].load_json_files()
-        has_files = task_selector['selector_instance'].has_files()
-        file_options = task_selector['selector_instance'].get_file_options()
-        
         if current_process.get("process"):
-            stop_current_process()
+            stop_current_process(force=True)
         from core.status import clear_app_status, end_pdf_processing
 
         end_pdf_processing()
         clear_app_status()
 
+        # Reset task selector (selections, search and paging)
+        file_update, requirements_update, tasks_output, _, _, title_update, task_view = (
+            task_selector["reset_task_files"]()
+        )
+
         return [
             None,  # Clear uploadFile
             gr.update(interactive=False),  # Disable processPdfButton
@@ -676,10 +803,11 @@ def top():
                 'Test Status (Pass / Fail)', 'Jira Bug Link'
             ]),
             SAVED_PDFS_EMPTY,
-            gr.update(choices=file_options, value=None, interactive=has_files),  # Reset file_dropdown
-            gr.update(choices=[], value=[], interactive=has_files),  # Reset requirements_selector
-            "No tasks selected" if has_files else "📂 No processed PDFs found.\n\nPlease upload and process a PDF first using the '1. Process PDF' button above.",  # Reset selected_tasks_output
-            "📋 Task selector" if has_files else "📋 Task selector ⚠️ (no PDFs processed yet)",
+            file_update,
+            requirements_update,
+            tasks_output,
+            title_update,
+            task_view,
         ]
     
     # Stop button functionality
@@ -699,6 +827,15 @@ def top():
                 status_simple,
                 detail,
             )
+        if kind == "pipeline":
+            # Run is re-enabled by the run loop once the partial results are combined
+            return (
+                gr.update(),
+                gr.update(interactive=False),
+                gr.update(),
+                status_simple,
+                detail,
+            )
         return (
             gr.update(interactive=True),
             gr.update(interactive=False),
@@ -723,6 +860,8 @@ def top():
             stopButton,
             downloadJsonButton,
             downloadCsvButton,
+            downloadXlsxButton,
+            downloadJsonlButton,
             statusSimple,
             statusLog,
             resultSnippet,
@@ -730,7 +869,8 @@ def top():
             task_selector['file_dropdown'],
             task_selector['requirements_selector'],
             task_selector['selected_tasks_output'],
-            task_selector['title_markdown']
+            task_selector['title_markdown'],
+            task_selector['view_state'],
         ]
     )
 
@@ -10,17 +10,136 @@ load_dotenv()
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "")
 LLM_MODEL = os.getenv("LLM_MODEL", "")
 
+# Per-step model routing: STEP{N}_PROVIDER / STEP{N}_MODEL override the above
+# for step N (e.g. a small model for the mechanical steps 5-7)
+STEP_MODELS = {
+    n: (
+        os.getenv(f"STEP{n}_PROVIDER", "") or LLM_PROVIDER,
+        os.getenv(f"STEP{n}_MODEL", "") or LLM_MODEL,
+    )
+    for n in range(1, 9)
+}
+# Cost report prices, USD per 1M input/output tokens: "model=in/out,..."
+# (added to / overriding the list prices in core/cost_report.py)
+LLM_PRICES = os.getenv("LLM_PRICES", "")
+
 # Image model settings
 IMAGE_MODEL_PROVIDER = os.getenv("IMAGE_MODEL_PROVIDER", "")
 IMAGE_MODEL = os.getenv("IMAGE_MODEL", "")
 
+
+def _model_chain(value: str) -> list[tuple[str, str]]:
+    """"provider:model,..." -> [(provider, model), ...] (model may contain ':')."""
+    return [
+        (provider.strip(), model.strip())
+        for provider, _, model in (
+            item.strip().partition(":") for item in value.split(",") if item.strip()
+        )
+    ]
+
+
+# Provider failover: models tried in order after the step's (or image) model
+# when it fails, e.g. LLM_FALLBACKS=openai:gpt-4.1-mini,ollama:llama3.1:8b.
+# A provider that fails LLM_BREAKER_FAILURES calls in a row is skipped for
+# LLM_BREAKER_COOLDOWN_SEC, then the next call re-probes it.
+LLM_FALLBACKS = _model_chain(os.getenv("LLM_FALLBACKS", ""))
+IMAGE_MODEL_FALLBACKS = _model_chain(os.getenv("IMAGE_MODEL_FALLBACKS", ""))
+LLM_BREAKER_FAILURES = max(1, int(os.getenv("LLM_BREAKER_FAILURES", "3")))
+LLM_BREAKER_COOLDOWN_SEC = max(0.0, float(os.getenv("LLM_BREAKER_COOLDOWN_SEC", "60")))
+
 # API keys & hosts
 OPENAI_API_KEY = SecretStr(os.getenv("OPENAI_API_KEY", ""))
 ANTHROPIC_API_KEY = SecretStr(os.getenv("ANTHROPIC_API_KEY", ""))
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "")
+# Ollama tuning: how long the server keeps a model loaded after each request,
+# the context window (0 = sized from the prompt, grown up to OLLAMA_NUM_CTX_MAX)
+# and the server's OLLAMA_NUM_PARALLEL (0 = unknown; else caps MAX_PARALLEL_FRS
+# when every step runs on Ollama)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = max(0, int(os.getenv("OLLAMA_NUM_CTX", "0")))
+OLLAMA_NUM_CTX_MAX = max(2048, int(os.getenv("OLLAMA_NUM_CTX_MAX", "32768")))
+OLLAMA_NUM_PARALLEL = max(0, int(os.getenv("OLLAMA_NUM_PARALLEL", "0")))
 
 # Max concurrent LLM calls when processing multiple FRs in parallel
 MAX_PARALLEL_FRS = max(1, int(os.getenv("MAX_PARALLEL_FRS", "3")))
 
+# Batch scheduling: step-level work queue policy for parallel FRs
+# critical_path | oldest | round_robin | graph (legacy: one LangGraph Send per FR)
+SCHEDULER_POLICY = os.getenv("SCHEDULER_POLICY", "oldest")
+
+# Pipeline executor: threads (in-process) | queue (durable SQLite job queue
+# consumed by `python -m core.worker` processes, see core/jobqueue.py)
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "threads")
+# Workers started by a queue-mode run itself (0 = rely on external workers)
+QUEUE_LOCAL_WORKERS = max(0, int(os.getenv("QUEUE_LOCAL_WORKERS", "1")))
+# Seconds before a crashed worker's leased job is handed to another worker
+JOB_LEASE_SEC = max(10, int(os.getenv("JOB_LEASE_SEC", "300")))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+
+# Run button: 1 = send runs to a long-lived pre-warmed worker process
+# (core/warm_worker.py), 0 = start `python -m core.simple_run` per run
+PIPELINE_WARM_WORKER = os.getenv("PIPELINE_WARM_WORKER", "1") != "0"
+# Stop button: seconds a cancelled run gets to abort its LLM requests, write
+# finished steps and combine partial results before it is killed
+STOP_GRACE_SEC = max(1.0, float(os.getenv("STOP_GRACE_SEC", "30")))
+
+# Pipeline logs: the pipeline process's output is streamed to a rotating file
+# (LOG_DIR/pipeline.log, outside data/ so Clear keeps it). LOG_SAMPLE_RATE keeps
+# INFO step lines for that share of FRs (warnings/errors always); LOG_MUTE is a
+# comma-separated list of loggers to silence below WARNING (e.g. dect.llm_steps)
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = min(1.0, max(0.0, float(os.getenv("LOG_SAMPLE_RATE", "1.0"))))
+LOG_MUTE = [name.strip() for name in os.getenv("LOG_MUTE", "").split(",") if name.strip()]
+LOG_MAX_BYTES = max(1, int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024))))
+LOG_BACKUPS = max(0, int(os.getenv("LOG_BACKUPS", "3")))
+
+# Logbook (data/pdf_logbook) step file format: compact (prompts stored once per
+# hash, inputs referenced by producing step) | pretty (legacy indent=2, inline)
+LOGBOOK_FORMAT = os.getenv("LOGBOOK_FORMAT", "compact")
+# Optional step file compression: "" | gzip | zstd (needs `zstandard`, else gzip)
+LOGBOOK_COMPRESSION = os.getenv("LOGBOOK_COMPRESSION", "")
+
 # Gradio UI auto-refresh interval (status, task list, step viewer, results)
-UI_POLL_INTERVAL_SEC = max(1, int(os.getenv("UI_POLL_INTERVAL_SEC", "3")))
\ No newline at end of file
+UI_POLL_INTERVAL_SEC = max(1, int(os.getenv("UI_POLL_INTERVAL_SEC", "3")))
+
+# Cross-FR request batching: pack up to N FRs waiting on the same step into one
+# LLM call (1 = off). Only steps listed in STEP_BATCH_STEPS are batched.
+STEP_BATCH_SIZE = max(1, int(os.getenv("STEP_BATCH_SIZE", "1")))
+STEP_BATCH_STEPS = [
+    int(s) for s in os.getenv("STEP_BATCH_STEPS", "5,6").split(",") if s.strip()
+]
+# How long the first FR waits for others to join its batch before sending
+STEP_BATCH_WINDOW_SEC = max(0.0, float(os.getenv("STEP_BATCH_WINDOW_SEC", "0.5")))
+
+# Hedged requests: once an LLM call runs past its step's p95 latency, send a
+# duplicate (to HEDGE_PROVIDER/HEDGE_MODEL, default the same model) and keep the
+# first valid answer. HEDGE_BUDGET = max extra calls per call (0.05 = 5%; 0 = off)
+HEDGE_BUDGET = max(0.0, float(os.getenv("HEDGE_BUDGET", "0")))
+HEDGE_PERCENTILE = min(99.9, max(50.0, float(os.getenv("HEDGE_PERCENTILE", "95"))))
+HEDGE_MIN_SAMPLES = max(1, int(os.getenv("HEDGE_MIN_SAMPLES", "20")))
+HEDGE_MIN_DELAY_SEC = max(0.0, float(os.getenv("HEDGE_MIN_DELAY_SEC", "2")))
+HEDGE_PROVIDER = os.getenv("HEDGE_PROVIDER", "")
+HEDGE_MODEL = os.getenv("HEDGE_MODEL", "")
+
+# Pipeline definition overrides (core/steps.py): steps to skip (output = input
+# list, passed on) and steps run by a Python function instead of the LLM, e.g.
+# STEPS_REPLACED=5:core.local_steps.unify_test_values,6:core.local_steps.dedupe_values
+STEPS_DISABLED = [
+    int(s) for s in os.getenv("STEPS_DISABLED", "").split(",") if s.strip()
+]
+STEPS_REPLACED = {
+    int(step): path.strip()
+    for step, _, path in (
+        item.partition(":") for item in os.getenv("STEPS_REPLACED", "").split(",") if item.strip()
+    )
+}
+
+# Intra-FR fan-out: list-shaped steps are split per atomic block (step 8: per
+# organized feature group), sent as parallel sub-calls and merged into one
+# stepN output. At most STEP_FANOUT_MAX_PARTS sub-calls per step (blocks are
+# grouped beyond that). Empty STEP_FANOUT_STEPS = one call per step.
+STEP_FANOUT_STEPS = [
+    int(s) for s in os.getenv("STEP_FANOUT_STEPS", "2,3,4,8").split(",") if s.strip()
+]
+STEP_FANOUT_MAX_PARTS = max(1, int(os.getenv("STEP_FANOUT_MAX_PARTS", "8")))
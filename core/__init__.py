@@ -6,20 +6,38 @@ functional requirements through multiple analysis steps.
 """
 
 from .io import AVAILABLE_STEPS, get_step_prompt
-from .pipeline import (
-    pipeline,
-    run_pipeline_for_pdf,
-    run_single_step,
-    run_steps_range,
-    list_output_files,
-    get_fr_directories,
-    combine_all_step8_files,
-    get_batch_status,
-)
+
+# Pipeline entry points pull in LangGraph and the LLM stack; they are resolved
+# on first attribute access so ``import core.status`` etc. stay light (UI start).
+_PIPELINE_EXPORTS = {
+    'pipeline',
+    'run_pipeline_for_pdf',
+    'run_pipeline_for_pdfs',
+    'run_single_step',
+    'run_steps_range',
+    'list_output_files',
+    'get_fr_directories',
+    'combine_all_step8_files',
+    'get_batch_status',
+}
+
+
+def __getattr__(name):
+    if name in _PIPELINE_EXPORTS:
+        from importlib import import_module
+
+        module = import_module(".pipeline", __name__)
+        # Bind every export (this also rebinds ``pipeline`` from the submodule
+        # to the function, as the eager import used to)
+        globals().update({export: getattr(module, export) for export in _PIPELINE_EXPORTS})
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'pipeline',
     'run_pipeline_for_pdf', 
+    'run_pipeline_for_pdfs',
     'run_single_step',
     'run_steps_range',
     'get_step_prompt',
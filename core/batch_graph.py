@@ -1,37 +1,47 @@
-from langgraph.graph import END, START, StateGraph
-from langgraph.types import Send
+from langchain_core.runnables import RunnableConfig
 from rich import print
 
-from core.fr_graph import get_fr_graph
+from config import SCHEDULER_POLICY
+from core.cancel import CancelToken
+from core.fr_graph import get_fr_graph, run_cancel_token
+from core.hedging import hedger
+from core.logbook_index import resume_point
 from core.state import BatchState, FRState
-from core.status import set_fr_status, write_pipeline_status
+from core.status import peak_rss_mb, set_fr_status, write_pipeline_status
 
 
-def _run_fr_pipeline(state: FRState) -> dict:
+def _run_fr_pipeline(state: FRState, config: RunnableConfig) -> dict:
     """Run one FR subgraph; return only reducer-safe batch updates."""
-    get_fr_graph().invoke(state)
+    get_fr_graph().invoke(state, {"configurable": {"cancel": run_cancel_token(config)}})
     return {"completed_frs": [state["fr_id"]]}
 
 
-def _dispatch_frs(state: BatchState) -> list[Send]:
-    pdf_name = state["pdf_name"]
+def _dispatch_frs(state: BatchState) -> list:
+    from langgraph.types import Send
+
     sends = []
-    for fr in state["frs"]:
-        fr_id = list(fr.keys())[0]
-        fr_text = fr[fr_id]
-        fr_state: FRState = {
-            "pdf_name": pdf_name,
-            "fr_id": fr_id,
-            "fr_text": fr_text,
-            "step_outputs": {},
-            "current_step": 0,
-            "error": None,
-        }
-        sends.append(Send("fr_pipeline", fr_state))
+    start_steps = state.get("start_steps", {})
+    for pdf_name, frs_list in state["tasks"].items():
+        for fr in frs_list:
+            fr_id = list(fr.keys())[0]
+            fr_text = fr[fr_id]
+            fr_state: FRState = {
+                "pdf_name": pdf_name,
+                "fr_id": fr_id,
+                "fr_text": fr_text,
+                "step_outputs": {},
+                "done_steps": [],
+                "current_step": start_steps.get(pdf_name, {}).get(fr_id, 0),
+                "start_step": start_steps.get(pdf_name, {}).get(fr_id, 0),
+                "error": None,
+            }
+            sends.append(Send("fr_pipeline", fr_state))
     return sends
 
 
 def build_batch_graph():
+    from langgraph.graph import END, START, StateGraph
+
     builder = StateGraph(BatchState)
     builder.add_node("fr_pipeline", _run_fr_pipeline)
     builder.add_conditional_edges(START, _dispatch_frs, ["fr_pipeline"])
@@ -51,42 +61,92 @@ def get_batch_graph():
 
 def run_batch_pipeline(pdf_name: str, frs_list: list[dict[str, str]]) -> None:
     """Run all FRs for a PDF in parallel (capped by MAX_PARALLEL_FRS at LLM layer)."""
-    if not frs_list:
+    run_global_batch({pdf_name: frs_list})
+
+
+def _report_hedging() -> None:
+    """Write data/hedge_metrics.json and a one-line summary of this batch's hedges."""
+    metrics = hedger.write_metrics()
+    print(
+        f"Hedging: {metrics['hedges']} of {metrics['calls']} LLM calls hedged, "
+        f"{metrics['hedge_wins']} won by the hedge"
+    )
+
+
+def run_global_batch(
+    tasks: dict[str, list[dict[str, str]]],
+    cancel: CancelToken | None = None,
+) -> None:
+    """Run the FRs of every selected PDF as one batch sharing the concurrency pool.
+
+    Per-FR status still lives under each PDF's own ``.status`` directory. FRs
+    cancelled in an earlier run resume after their last completed step; with
+    `cancel`, FRs still unfinished when it fires are marked cancelled.
+    """
+    tasks = {pdf_name: frs for pdf_name, frs in tasks.items() if frs}
+    if not tasks:
         return
 
-    for fr in frs_list:
-        fr_id = list(fr.keys())[0]
-        set_fr_status(pdf_name, fr_id, 0, "running", "Queued")
+    total_frs = sum(len(frs) for frs in tasks.values())
+    start_steps: dict[str, dict[str, int]] = {}
+    for pdf_name, frs_list in tasks.items():
+        for fr in frs_list:
+            fr_id = list(fr.keys())[0]
+            step = resume_point(pdf_name, fr_id)
+            start_steps.setdefault(pdf_name, {})[fr_id] = step
+            message = f"Queued (resuming after step {step})" if step else "Queued"
+            set_fr_status(pdf_name, fr_id, step, "running", message)
 
     from core.status import set_app_status
 
+    label = next(iter(tasks)) if len(tasks) == 1 else f"{len(tasks)} PDFs"
     set_app_status(
         "pipeline",
-        f"Starting test pipeline for {pdf_name}",
-        f"{len(frs_list)} FR(s) — running in parallel (see MAX_PARALLEL_FRS)",
+        f"Starting test pipeline for {label}",
+        f"{total_frs} FR(s) — running in parallel (see MAX_PARALLEL_FRS)",
         active=True,
-        simple=f"🚀 Starting pipeline — {len(frs_list)} FR(s)",
+        simple=f"🚀 Starting pipeline — {total_frs} FR(s)",
     )
     write_pipeline_status(
-        f"Starting analysis of {pdf_name} with {len(frs_list)} FRs (parallel)"
+        f"Starting analysis of {label} with {total_frs} FRs (parallel)"
     )
-    print(f"\n=== Starting parallel pipeline for {pdf_name} ({len(frs_list)} FRs) ===")
-
-    get_batch_graph().invoke({
-        "pdf_name": pdf_name,
-        "frs": frs_list,
-        "completed_frs": [],
-    })
-
-    print(f"\n=== Completed parallel pipeline for {pdf_name} ===")
-    from core.status import set_app_status
+    print(f"\n=== Starting parallel pipeline for {label} ({total_frs} FRs) ===")
+    hedger.reset_counters()
+
+    if SCHEDULER_POLICY == "graph":
+        get_batch_graph().invoke(
+            {"tasks": tasks, "completed_frs": [], "start_steps": start_steps},
+            {"configurable": {"cancel": cancel}},
+        )
+    else:
+        from core.scheduler import run_scheduled_batch
+
+        run_scheduled_batch(tasks, SCHEDULER_POLICY, cancel=cancel, start_steps=start_steps)
+
+    if hedger.enabled:
+        _report_hedging()
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak memory (RSS): {peak} MB for {total_frs} FR(s)")
+
+    if cancel is not None and cancel.cancelled:
+        print(f"\n=== Cancelled parallel pipeline for {label} ===")
+        set_app_status(
+            "pipeline",
+            f"Pipeline cancelled for {label}",
+            "Finished steps are kept — combining partial results next",
+            active=True,
+        )
+        write_pipeline_status(f"Analysis cancelled for {label}; unfinished FRs resume on the next run")
+        return
 
+    print(f"\n=== Completed parallel pipeline for {label} ===")
     set_app_status(
         "pipeline",
-        f"Pipeline finished for {pdf_name}",
-        f"Processed {len(frs_list)} FR(s) — combining results next",
+        f"Pipeline finished for {label}",
+        f"Processed {total_frs} FR(s) — combining results next",
         active=True,
     )
     write_pipeline_status(
-        f"Analysis complete! Processed {len(frs_list)} FRs for {pdf_name}"
+        f"Analysis complete! Processed {total_frs} FRs for {label}"
     )
@@ -0,0 +1,173 @@
+"""Find the parallel-FR limit a backend handles best (throughput vs. latency).
+
+Runs a fixed synthetic workload (step 1 on a few sample FRs) through
+``invoke_step`` at increasing concurrency and measures throughput and p95
+latency at each level. The recommended ``MAX_PARALLEL_FRS`` is the knee: the
+lowest concurrency reaching KNEE_SHARE of the best throughput. Beyond it, more
+parallel calls mostly queue at the provider and only raise latency. Results
+are stored per ``provider:model`` in data/calibration.json, and the UI's
+Parallel FRs slider defaults to the recommendation for the step-1 model.
+
+This makes real LLM calls (about ``--calls-per-slot`` x concurrency per level).
+
+    python -m core.calibrate                     # levels 1, 2, 4, 8, 16
+    python -m core.calibrate --levels 1,2,3,4,6 --calls-per-slot 2
+    python -m core.calibrate --no-save
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+CALIBRATION_PATH = Path("data/calibration.json")
+DEFAULT_LEVELS = [1, 2, 4, 8, 16]
+KNEE_SHARE = 0.9
+# Step 1 reads only the FR text, so it needs no upstream outputs
+CALIBRATION_STEP = 1
+# Stop raising concurrency once this share of a level's calls fails (throttling)
+MAX_ERROR_RATE = 0.1
+
+SAMPLE_FRS = [
+    "The system shall allow a registered user to reset their password via a "
+    "one-time link sent to the verified e-mail address. The link expires after 30 minutes.",
+    "The system shall reject an order whose quantity is below 1 or above 999 and "
+    "show the message 'Invalid quantity'.",
+    "The administrator shall be able to lock a user account after 5 consecutive "
+    "failed login attempts within 10 minutes.",
+    "The report page shall list invoices between two dates (inclusive), sorted by "
+    "due date, 50 per page.",
+]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def _call(step_number: int, step_prompt: dict, fr_text: str) -> float | None:
+    """Latency of one step call in seconds (None = failed)."""
+    from core.llm_steps import invoke_step
+
+    start = time.perf_counter()
+    try:
+        invoke_step(step_number, step_prompt, {}, fr_text)
+    except Exception as e:
+        print(f"  call failed: {e}", file=sys.stderr)
+        return None
+    return time.perf_counter() - start
+
+
+def measure_level(step_number: int, step_prompt: dict, concurrency: int, calls: int) -> dict:
+    """Run `calls` step calls with `concurrency` in flight; throughput and latency."""
+    from core.concurrency import set_max_parallel_frs
+    from core.status import peak_rss_mb
+
+    concurrency = set_max_parallel_frs(concurrency)
+    texts = [SAMPLE_FRS[i % len(SAMPLE_FRS)] for i in range(calls)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda text: _call(step_number, step_prompt, text), texts))
+    wall = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+    return {
+        "concurrency": concurrency,
+        "calls": calls,
+        "errors": calls - len(latencies),
+        "calls_per_min": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "p50_sec": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_sec": round(_percentile(latencies, 95), 3) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def find_knee(levels: list[dict]) -> int:
+    """Lowest concurrency whose throughput is within KNEE_SHARE of the best."""
+    usable = [level for level in levels if level["errors"] / level["calls"] <= MAX_ERROR_RATE]
+    if not usable:
+        return 1
+    best = max(level["calls_per_min"] for level in usable)
+    return min(level["concurrency"] for level in usable if level["calls_per_min"] >= KNEE_SHARE * best)
+
+
+def calibrate(step_number: int, levels: list[int], calls_per_slot: int) -> dict:
+    from core.io import get_step_prompt
+    from llm_client import model_label
+
+    step_prompt = get_step_prompt(step_number)
+    label = model_label(step_number)
+    print(f"Calibrating {label} on step {step_number}: levels {levels}")
+    # One untimed call first: connection setup, Ollama model load
+    _call(step_number, step_prompt, SAMPLE_FRS[0])
+
+    results: list[dict] = []
+    for concurrency in levels:
+        level = measure_level(step_number, step_prompt, concurrency, max(4, concurrency * calls_per_slot))
+        if results and level["concurrency"] == results[-1]["concurrency"]:
+            break  # capped (OLLAMA_NUM_PARALLEL)
+        results.append(level)
+        print(
+            f"  {level['concurrency']:>3} parallel: {level['calls_per_min']:>8.1f} calls/min, "
+            f"p50 {level['p50_sec']}s, p95 {level['p95_sec']}s, {level['errors']} error(s), "
+            f"peak RSS {level['peak_rss_mb']} MB"
+        )
+        if level["errors"] / level["calls"] > MAX_ERROR_RATE:
+            print("  stopping: too many errors (provider throttling?)")
+            break
+        # Two levels in a row without a 5% throughput gain: past the knee
+        if len(results) >= 3 and all(
+            results[i]["calls_per_min"] < 1.05 * results[i - 1]["calls_per_min"] for i in (-1, -2)
+        ):
+            break
+
+    return {
+        "model": label,
+        "step": step_number,
+        "at": datetime.now(timezone.utc).isoformat(),
+        "recommended": find_knee(results),
+        "levels": results,
+    }
+
+
+def load_calibration() -> dict:
+    """{"provider:model": record} from data/calibration.json ({} if missing)."""
+    try:
+        return json.loads(CALIBRATION_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_calibration(record: dict) -> None:
+    data = load_calibration()
+    data[record["model"]] = record
+    CALIBRATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CALIBRATION_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    tmp.replace(CALIBRATION_PATH)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.calibrate", description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", help="comma-separated concurrency levels (default 1,2,4,8,16)")
+    parser.add_argument("--calls-per-slot", type=int, default=3, help="calls per level = this x concurrency")
+    parser.add_argument("--no-save", action="store_true", help=f"do not write {CALIBRATION_PATH}")
+    args = parser.parse_args(argv)
+
+    from core.log import configure_logging
+
+    configure_logging()
+    levels = sorted({int(n) for n in args.levels.split(",")}) if args.levels else DEFAULT_LEVELS
+    record = calibrate(CALIBRATION_STEP, levels, max(1, args.calls_per_slot))
+    print(f"Recommended MAX_PARALLEL_FRS for {record['model']}: {record['recommended']}")
+    if not args.no_save:
+        save_calibration(record)
+        print(f"Saved to {CALIBRATION_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
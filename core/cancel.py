@@ -0,0 +1,62 @@
+"""Cooperative cancellation for pipeline runs.
+
+A ``CancelToken`` is created per run and passed down through the batch
+(scheduler or LangGraph), each FR step and the LLM call. Cancelling it stops
+new steps from starting, aborts LLM requests still waiting on the network,
+and lets steps whose response already arrived finish writing their files.
+FRs that did not finish are marked ``cancelled`` and pick up after their last
+completed step on the next run.
+"""
+
+import threading
+
+# Exit status of a pipeline process whose run was cancelled (partial output written)
+CANCELLED_EXIT_CODE = 3
+
+
+class RunCancelled(Exception):
+    """Raised inside a step when the run's CancelToken fires."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: dict[int, callable] = {}
+        self._next_id = 0
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "Stopped by user") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RunCancelled(self.reason)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """Run `callback()` when cancelled (now, if already); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+                return lambda: self._callbacks.pop(key, None)
+        callback()
+        return lambda: None
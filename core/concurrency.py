@@ -4,21 +4,49 @@ import threading
 from contextlib import contextmanager
 
 from config import MAX_PARALLEL_FRS as _ENV_DEFAULT
+from config import OLLAMA_NUM_PARALLEL, STEP_MODELS
+
+
+def ollama_parallel_cap() -> int | None:
+    """OLLAMA_NUM_PARALLEL when every step runs on Ollama (more calls only queue there)."""
+    if OLLAMA_NUM_PARALLEL and all(provider == "ollama" for provider, _ in STEP_MODELS.values()):
+        return OLLAMA_NUM_PARALLEL
+    return None
+
+
+def _aligned(n: int) -> int:
+    cap = ollama_parallel_cap()
+    return min(n, cap) if cap else n
+
 
 _lock = threading.Lock()
-_limit = _ENV_DEFAULT
+_limit = _aligned(_ENV_DEFAULT)
 _semaphore = threading.Semaphore(_limit)
 
 
+def default_max_parallel_frs() -> int:
+    """UI default: the calibrated limit for the step-1 model (core.calibrate), else the current one."""
+    from core.calibrate import CALIBRATION_STEP, load_calibration
+
+    provider, model = STEP_MODELS[CALIBRATION_STEP]
+    record = load_calibration().get(f"{provider}:{model}")
+    if record and record.get("recommended"):
+        return _aligned(max(1, min(99, int(record["recommended"]))))
+    return get_max_parallel_frs()
+
+
 def get_max_parallel_frs() -> int:
     with _lock:
         return _limit
 
 
 def set_max_parallel_frs(n: int) -> int:
-    """Set cap for concurrent LLM calls. Call before starting a pipeline run."""
+    """Set cap for concurrent LLM calls. Call before starting a pipeline run.
+
+    Clamped to the Ollama server's OLLAMA_NUM_PARALLEL (ollama_parallel_cap).
+    """
     global _semaphore, _limit
-    n = max(1, min(99, int(n)))
+    n = _aligned(max(1, min(99, int(n))))
     with _lock:
         _limit = n
         _semaphore = threading.Semaphore(n)
@@ -26,9 +54,16 @@ def set_max_parallel_frs(n: int) -> int:
 
 
 @contextmanager
-def llm_slot():
-    _semaphore.acquire()
+def llm_slot(cancel=None):
+    """Hold one LLM call slot; with a CancelToken, never take one (or stop waiting) once it fires."""
+    semaphore = _semaphore
+    if cancel is None:
+        semaphore.acquire()
+    else:
+        cancel.raise_if_cancelled()
+        while not semaphore.acquire(timeout=0.2):
+            cancel.raise_if_cancelled()
     try:
         yield
     finally:
-        _semaphore.release()
+        semaphore.release()
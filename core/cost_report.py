@@ -0,0 +1,110 @@
+"""Token and cost report per pipeline step and model, from the logbook index.
+
+Each step file records the model that ran it (``provider:model``, or
+``local:...`` for replaced steps) and its token usage; this sums them up.
+
+    python -m core.cost_report               # all PDFs in the logbook
+    python -m core.cost_report --pdf spec.pdf
+    python -m core.cost_report --json
+"""
+
+import argparse
+import json
+import sys
+
+from config import LLM_PRICES
+from core.logbook_index import step_usage
+
+# List prices, USD per 1M (input, output) tokens; matched by longest model prefix.
+# Add or override with LLM_PRICES="model=in/out,...". Ollama/local steps are free.
+DEFAULT_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-opus-4": (15.00, 75.00),
+}
+
+
+def parse_prices(spec: str) -> dict[str, tuple[float, float]]:
+    prices = {}
+    for item in spec.split(","):
+        model, _, rates = item.strip().partition("=")
+        if not model or "/" not in rates:
+            continue
+        rate_in, _, rate_out = rates.partition("/")
+        prices[model.strip()] = (float(rate_in), float(rate_out))
+    return prices
+
+
+PRICES = {**DEFAULT_PRICES, **parse_prices(LLM_PRICES)}
+
+
+def price_for(model_label: str) -> tuple[float, float] | None:
+    """(input, output) USD per 1M tokens; (0, 0) for local models, None if unknown."""
+    provider, _, model = model_label.partition(":")
+    if provider in ("ollama", "local"):
+        return (0.0, 0.0)
+    matches = [name for name in PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    return PRICES[max(matches, key=len)]
+
+
+def build_report(pdf_name: str | None = None) -> dict:
+    rows = []
+    total_cost = 0.0
+    unpriced = set()
+    for row in step_usage(pdf_name):
+        price = price_for(row["model"]) if row["model"] else None
+        cost = None
+        if price is not None:
+            cost = (row["input_tokens"] * price[0] + row["output_tokens"] * price[1]) / 1_000_000
+            total_cost += cost
+        elif row["input_tokens"] or row["output_tokens"]:
+            unpriced.add(row["model"] or "(unrecorded)")
+        rows.append({**row, "cost_usd": None if cost is None else round(cost, 6)})
+    return {
+        "pdf": pdf_name,
+        "steps": rows,
+        "input_tokens": sum(r["input_tokens"] for r in rows),
+        "output_tokens": sum(r["output_tokens"] for r in rows),
+        "cost_usd": round(total_cost, 6),
+        "unpriced_models": sorted(unpriced),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.cost_report", description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="only this PDF")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.pdf)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{'step':>4}  {'model':<36} {'runs':>5} {'errors':>6} {'in tok':>10} {'out tok':>10} {'USD':>10}")
+    for row in report["steps"]:
+        cost = "?" if row["cost_usd"] is None else f"{row['cost_usd']:.4f}"
+        print(
+            f"{row['step']:>4}  {row['model'] or '(unrecorded)':<36} {row['runs']:>5} {row['errors']:>6} "
+            f"{row['input_tokens']:>10} {row['output_tokens']:>10} {cost:>10}"
+        )
+    print(
+        f"total: {report['input_tokens']} input + {report['output_tokens']} output tokens, "
+        f"${report['cost_usd']:.4f}"
+    )
+    if report["unpriced_models"]:
+        print(f"no price for: {', '.join(report['unpriced_models'])} (set LLM_PRICES)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
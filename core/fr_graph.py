@@ -1,40 +1,80 @@
 import time
+from typing import Any, Collection
 
-from langgraph.graph import END, START, StateGraph
-from rich import print
+from langchain_core.runnables import RunnableConfig
+
+from llm_client import model_label, served_models
+
+from config import STEP_FANOUT_MAX_PARTS, STEP_FANOUT_STEPS
 
 from core.io import (
-    AVAILABLE_STEPS,
     ensure_logbook_dir,
     get_step_prompt,
-    prepare_step_input,
+    prepare_step_input_with_ref,
     write_step_json,
 )
-from core.llm_steps import invoke_step
-from core.state import FRState
+from core.cancel import CancelToken, RunCancelled
+from core.llm_steps import invoke_step, track_step_usage, validate_step_output
+from core.log import fr_context, get_logger
+from core.results import write_result_shard
+from core.state import FRState, StepPartsState
 from core.status import set_fr_status
+from core.steps import FINAL_STEP, STEP_NUMBERS, get_step, release_outputs, resume_step, step_prompt_for
+
+log = get_logger(__name__)
 
 fr_graph = None
+step_parts_graph = None
 
 
-def _route_after_step(state: FRState) -> str:
-    if state.get("error"):
-        return END
-    step = state.get("current_step", 0)
-    if step >= 8:
-        return END
-    return f"step{step + 1}"
+def execute_step(
+    pdf_name: str,
+    fr_id: str,
+    fr_text: str,
+    step_number: int,
+    cancel: CancelToken | None = None,
+    done: Collection[int] | None = None,
+    mark_fr: bool = True,
+) -> dict:
+    """Run one step; returns state updates (step_outputs, current_step, error).
 
+    ``step_outputs`` holds only this step's output. Callers merge it into what
+    they keep and drop outputs no later step reads (core.steps.release_outputs).
 
-def execute_step(
+    If `cancel` fires before the LLM response arrives, nothing is written and
+    the FR is marked cancelled at its resume point (``cancelled`` is set in
+    the result): the last step with every step before it in `done`, the
+    FR's completed steps (default: read from the logbook index). Once a
+    response is in, the step is written in full. With ``mark_fr=False`` the
+    step only aborts and the FR's status is left to the caller (queue
+    workers: the job may already be running elsewhere).
+    """
+    if cancel is not None and cancel.cancelled:
+        return _cancelled(pdf_name, fr_id, done, mark_fr)
+    with fr_context(pdf_name, fr_id, step_number):
+        return _execute_step(pdf_name, fr_id, fr_text, step_number, cancel, done, mark_fr)
+
+
+def _cancelled(pdf_name: str, fr_id: str, done: Collection[int] | None, mark_fr: bool) -> dict:
+    if done is None:
+        from core.logbook_index import completed_steps
+
+        done = completed_steps(pdf_name, fr_id)
+    if not mark_fr:
+        return {"error": "cancelled", "cancelled": True, "current_step": resume_step(done)}
+    return mark_cancelled(pdf_name, fr_id, resume_step(done))
+
+
+def _execute_step(
     pdf_name: str,
     fr_id: str,
     fr_text: str,
     step_number: int,
-    step_outputs: dict | None = None,
+    cancel: CancelToken | None,
+    done: Collection[int] | None,
+    mark_fr: bool,
 ) -> dict:
-    """Run one step; returns state updates (step_outputs, current_step, error)."""
-    print(f"\nProcessing step {step_number} for {pdf_name} - {fr_id}")
+    log.info("Processing step %d", step_number)
     set_fr_status(
         pdf_name,
         fr_id,
@@ -43,14 +83,28 @@ def execute_step(
         f"Step {step_number}/8",
     )
 
-    step_prompt = get_step_prompt(step_number)
-    step_input_data = prepare_step_input(pdf_name, fr_id, fr_text, step_number)
+    step = get_step(step_number)
+    step_prompt = step_prompt_for(step) or get_step_prompt(step_number)
+    step_input_data, input_ref = prepare_step_input_with_ref(
+        pdf_name, fr_id, fr_text, step_number
+    )
     overall_start = time.time()
+    model = f"local:{step.implementation}" if step.run is not None else model_label(step_number)
 
     try:
-        llm_response = invoke_step(
-            step_number, step_prompt, step_input_data, fr_text
-        )
+        with track_step_usage() as usage, served_models() as served:
+            if step.run is not None:
+                # Local implementation (STEPS_REPLACED / STEPS_DISABLED): no LLM call
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                llm_response = step.run(step_input_data, fr_text)
+            else:
+                llm_response = invoke_step_fanned_out(
+                    step_number, step_prompt, step_input_data, fr_text, cancel
+                )
+        if served:
+            # With LLM_FALLBACKS, the model that actually answered (most calls)
+            model = served.most_common(1)[0][0]
         write_step_json(
             pdf_name,
             fr_id,
@@ -59,11 +113,16 @@ def execute_step(
             step_prompt,
             step_input_data,
             llm_response=llm_response,
+            input_ref=input_ref,
+            model=model,
+            usage=usage.as_dict(),
         )
+        if step_number == FINAL_STEP:
+            write_result_shard(pdf_name, fr_id, llm_response)
         elapsed = time.time() - overall_start
-        print(f"Completed step {step_number} for {fr_id} in {elapsed:.1f}s")
+        log.info("Completed step %d in %.1fs (%s)", step_number, elapsed, model)
 
-        phase = "done" if step_number == 8 else "running"
+        phase = "done" if step_number == FINAL_STEP else "running"
         set_fr_status(
             pdf_name,
             fr_id,
@@ -72,16 +131,17 @@ def execute_step(
             f"Step {step_number}/8 complete",
         )
 
-        outputs = dict(step_outputs or {})
-        outputs[step_number] = llm_response
         return {
-            "step_outputs": outputs,
+            "step_outputs": {step_number: llm_response},
             "current_step": step_number,
             "error": None,
         }
+    except RunCancelled:
+        log.info("Cancelled step %d", step_number)
+        return _cancelled(pdf_name, fr_id, done, mark_fr)
     except Exception as e:
         elapsed = time.time() - overall_start
-        print(f"Error in step {step_number} for {fr_id}: {e} ({elapsed:.1f}s)")
+        log.error("Error in step %d: %s (%.1fs)", step_number, e, elapsed)
         write_step_json(
             pdf_name,
             fr_id,
@@ -90,35 +150,219 @@ def execute_step(
             step_prompt,
             step_input_data,
             error=str(e),
+            input_ref=input_ref,
+            model=model,
         )
         set_fr_status(pdf_name, fr_id, step_number, "error", str(e))
         return {"error": str(e), "current_step": step_number}
 
 
+def mark_cancelled(pdf_name: str, fr_id: str, last_step: int) -> dict:
+    """Record that an FR stopped after `last_step` because its run was cancelled."""
+    message = f"Cancelled after step {last_step}/8" if last_step else "Cancelled before step 1"
+    set_fr_status(pdf_name, fr_id, last_step, "cancelled", message)
+    return {"error": "cancelled", "cancelled": True, "current_step": last_step}
+
+
+def run_cancel_token(config: dict | None) -> CancelToken | None:
+    """The run's CancelToken from a LangGraph config (``configurable.cancel``)."""
+    return ((config or {}).get("configurable") or {}).get("cancel")
+
+
+# ============================================
+# INTRA-FR FAN-OUT (map-reduce per atomic block)
+# ============================================
+
+# step -> (list keys split from the input, list key of the output, grouping field)
+FANOUT_SPECS: dict[int, tuple[tuple[str, ...], str, str]] = {
+    2: (("atomic_blocks",), "partitions", "id"),
+    3: (("partitions",), "boundaries", "atomic_block_id"),
+    4: (("partitions", "boundaries"), "test_values", "atomic_block_id"),
+    8: (("organized_data",), "test_cases", "feature"),
+}
+
+
+def split_step_input(step_number: int, step_input_data: dict) -> list[dict]:
+    """Per-block inputs for a list-shaped step (one item = no fan-out).
+
+    Items of the split keys are grouped by atomic block (step 8: by feature),
+    in first-seen order; groups are packed into at most STEP_FANOUT_MAX_PARTS
+    parts. Other input keys are copied into every part.
+    """
+    spec = FANOUT_SPECS.get(step_number)
+    if step_number not in STEP_FANOUT_STEPS or spec is None or not isinstance(step_input_data, dict):
+        return [step_input_data]
+    keys, _, group_field = spec
+    groups: dict[str, dict[str, list]] = {}
+    for key in keys:
+        items = step_input_data.get(key)
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            group = str(item.get(group_field, "")) if isinstance(item, dict) else ""
+            groups.setdefault(group, {k: [] for k in keys})[key].append(item)
+    if len(groups) < 2:
+        return [step_input_data]
+
+    ordered = list(groups.values())
+    count = min(STEP_FANOUT_MAX_PARTS, len(ordered))
+    parts = []
+    for i in range(count):
+        chunk = ordered[i * len(ordered) // count:(i + 1) * len(ordered) // count]
+        part = dict(step_input_data)
+        for key in keys:
+            if key in step_input_data:
+                part[key] = [item for group in chunk for item in group[key]]
+        parts.append(part)
+    return parts
+
+
+def merge_step_outputs(step_number: int, outputs: list[dict]) -> dict:
+    """Concatenate per-part outputs into the usual single stepN response."""
+    _, output_key, _ = FANOUT_SPECS[step_number]
+    merged: dict[str, Any] = {}
+    items: list = []
+    for index, output in enumerate(outputs, 1):
+        if not validate_step_output(step_number, output):
+            raise ValueError(
+                f"Step {step_number} part {index}/{len(outputs)}: response has no '{output_key}' list"
+            )
+        for key, value in output.items():
+            merged.setdefault(key, value)
+        items.extend(output[output_key])
+    merged[output_key] = items
+    return merged
+
+
+def _dispatch_parts(state: StepPartsState) -> list:
+    from langgraph.types import Send
+
+    return [
+        Send("part", {**state, "part_index": i, "part_input": part})
+        for i, part in enumerate(state["parts"])
+    ]
+
+
+def _run_part(state: StepPartsState, config: RunnableConfig) -> dict:
+    output = invoke_step(
+        state["step_number"],
+        state["step_prompt"],
+        state["part_input"],
+        state["fr_text"],
+        run_cancel_token(config),
+    )
+    return {"part_outputs": [(state["part_index"], output)]}
+
+
+def _merge_parts(state: StepPartsState) -> dict:
+    outputs = [output for _, output in sorted(state.get("part_outputs", []), key=lambda p: p[0])]
+    return {"merged": merge_step_outputs(state["step_number"], outputs)}
+
+
+def build_step_parts_graph():
+    from langgraph.graph import END, START, StateGraph
+
+    builder = StateGraph(StepPartsState)
+    builder.add_node("part", _run_part)
+    builder.add_node("merge", _merge_parts)
+    builder.add_conditional_edges(START, _dispatch_parts, ["part"])
+    builder.add_edge("part", "merge")
+    builder.add_edge("merge", END)
+    return builder.compile()
+
+
+def get_step_parts_graph():
+    global step_parts_graph
+    if step_parts_graph is None:
+        step_parts_graph = build_step_parts_graph()
+    return step_parts_graph
+
+
+def invoke_step_fanned_out(
+    step_number: int,
+    step_prompt: dict,
+    step_input_data: dict,
+    fr_text: str,
+    cancel: CancelToken | None = None,
+) -> dict:
+    """invoke_step, split into parallel per-block sub-calls where the step allows it.
+
+    The sub-calls run as LangGraph ``Send`` branches (each still takes an LLM
+    slot) and are merged back into one response, so the step takes as long as
+    its slowest block rather than one long generation for all blocks.
+    """
+    parts = split_step_input(step_number, step_input_data)
+    if len(parts) == 1:
+        return invoke_step(step_number, step_prompt, step_input_data, fr_text, cancel)
+    log.info("Step %d: fanning out %d parts", step_number, len(parts))
+    result = get_step_parts_graph().invoke(
+        {
+            "step_number": step_number,
+            "fr_text": fr_text,
+            "step_prompt": step_prompt,
+            "parts": parts,
+            "part_outputs": [],
+        },
+        {"configurable": {"cancel": cancel}, "max_concurrency": len(parts)},
+    )
+    return result["merged"]
+
+
+def _graph_done_steps(state: FRState) -> set[int]:
+    """Steps of the FR completed so far: this run's plus those it resumed after."""
+    start_step = state.get("start_step", 0)
+    return {*state.get("done_steps", ()), *(n for n in STEP_NUMBERS if n <= start_step)}
+
+
 def _make_step_node(step_number: int):
-    def node(state: FRState) -> dict:
-        if state.get("error"):
+    def node(state: FRState, config: RunnableConfig) -> dict:
+        # After an error the remaining nodes are no-ops; resumed FRs skip done steps
+        if state.get("error") or step_number <= state.get("start_step", 0):
             return {}
-        return execute_step(
+        result = execute_step(
             state["pdf_name"],
             state["fr_id"],
             state["fr_text"],
             step_number,
-            state.get("step_outputs"),
+            run_cancel_token(config),
+            _graph_done_steps(state),
         )
+        if result.get("error") or result.get("cancelled"):
+            return result
+        # Outputs no later step reads are dropped from the state (None = drop)
+        held = dict.fromkeys(state.get("step_outputs") or {}, True)
+        held[step_number] = True
+        done = {*state.get("done_steps", ()), step_number}
+        updates = result["step_outputs"]
+        for n in release_outputs(held, done):
+            updates[n] = None
+        return {**result, "done_steps": [step_number]}
 
     return node
 
 
 def build_fr_graph():
+    # LangGraph is only needed by the graph executor; the scheduler never builds it
+    from langgraph.graph import END, START, StateGraph
+
+    # Edges follow the data dependencies declared in core.steps: a step starts
+    # once all steps it reads from are done; independent steps run concurrently
     builder = StateGraph(FRState)
-    for n in AVAILABLE_STEPS:
+    for n in STEP_NUMBERS:
         builder.add_node(f"step{n}", _make_step_node(n))
-
-    builder.add_edge(START, "step1")
-    for n in range(1, 8):
-        builder.add_conditional_edges(f"step{n}", _route_after_step)
-    builder.add_edge("step8", END)
+    consumed = set()
+    for n in STEP_NUMBERS:
+        depends_on = get_step(n).depends_on
+        consumed.update(depends_on)
+        if not depends_on:
+            builder.add_edge(START, f"step{n}")
+        elif len(depends_on) == 1:
+            builder.add_edge(f"step{depends_on[0]}", f"step{n}")
+        else:
+            builder.add_edge([f"step{d}" for d in depends_on], f"step{n}")
+    for n in STEP_NUMBERS:
+        if n not in consumed:
+            builder.add_edge(f"step{n}", END)
 
     return builder.compile()
 
@@ -136,27 +380,30 @@ def run_fr_pipeline(pdf_name: str, fr: dict[str, str], steps: list[int] | None =
     fr_text = fr[fr_id]
     ensure_logbook_dir(pdf_name, fr_id)
 
-    if steps is None or steps == AVAILABLE_STEPS:
+    if steps is None or steps == STEP_NUMBERS:
         initial: FRState = {
             "pdf_name": pdf_name,
             "fr_id": fr_id,
             "fr_text": fr_text,
             "step_outputs": {},
             "current_step": 0,
+            "start_step": 0,
+            "done_steps": [],
             "error": None,
         }
         return get_fr_graph().invoke(initial)
 
     step_outputs: dict = {}
+    done: set[int] = set()
     error = None
     for step_num in steps:
-        if step_num not in AVAILABLE_STEPS:
-            print(f"Warning: Step {step_num} is not available. Skipping.")
+        if step_num not in STEP_NUMBERS:
+            log.warning("Step %d is not available. Skipping.", step_num)
             continue
-        result = execute_step(
-            pdf_name, fr_id, fr_text, step_num, step_outputs
-        )
-        step_outputs = result.get("step_outputs", step_outputs)
+        result = execute_step(pdf_name, fr_id, fr_text, step_num, done=done)
+        step_outputs.update(result.get("step_outputs", {}))
+        done.add(step_num)
+        release_outputs(step_outputs, done)
         error = result.get("error")
         if error:
             break
@@ -0,0 +1,138 @@
+"""Hedged LLM requests: bound the tail latency of slow step calls.
+
+Per step, the latency of recent LLM calls is tracked. When a call runs past
+that step's p95 (HEDGE_PERCENTILE, at least HEDGE_MIN_DELAY_SEC), a duplicate
+request is sent, to the same model or to HEDGE_PROVIDER / HEDGE_MODEL. The
+first one to return valid JSON wins, and the other one is cancelled (the
+racing itself lives in core.llm_steps). Hedges are budgeted: at most
+HEDGE_BUDGET extra calls per primary call over the run (0.05 = 5%; 0 = off).
+
+Counters are written to data/hedge_metrics.json at the end of each batch. The
+per-step p95 stored there seeds the next process, so a fresh pipeline process
+can hedge before it has HEDGE_MIN_SAMPLES calls of its own.
+"""
+
+import json
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+
+from config import (
+    HEDGE_BUDGET,
+    HEDGE_MIN_DELAY_SEC,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MODEL,
+    HEDGE_PERCENTILE,
+    HEDGE_PROVIDER,
+)
+
+METRICS_PATH = Path("data/hedge_metrics.json")
+SAMPLE_WINDOW = 200
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Hedger:
+    def __init__(self, budget: float = HEDGE_BUDGET):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._samples: dict[int, deque] = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))
+        self._seed_p95: dict[int, float] = {}
+        self._loaded = False
+        self.reset_counters()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def reset_counters(self) -> None:
+        """Start a new run's counters (latency samples are kept)."""
+        with self._lock:
+            self.calls: dict[int, int] = defaultdict(int)
+            self.hedges: dict[int, int] = defaultdict(int)
+            self.hedge_wins: dict[int, int] = defaultdict(int)
+            self.over_budget: dict[int, int] = defaultdict(int)
+
+    def _load_seed(self) -> None:
+        self._loaded = True
+        try:
+            data = json.loads(METRICS_PATH.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        for step, stats in (data.get("steps") or {}).items():
+            if stats.get("p95_sec"):
+                self._seed_p95[int(step)] = float(stats["p95_sec"])
+
+    def p95(self, step: int) -> float | None:
+        with self._lock:
+            if not self._loaded:
+                self._load_seed()
+            samples = list(self._samples[step])
+            if len(samples) >= HEDGE_MIN_SAMPLES:
+                return _percentile(samples, HEDGE_PERCENTILE)
+            return self._seed_p95.get(step)
+
+    def delay(self, step: int) -> float | None:
+        """Seconds to wait before hedging a call of `step` (None = do not hedge)."""
+        if not self.enabled:
+            return None
+        p95 = self.p95(step)
+        return None if p95 is None else max(HEDGE_MIN_DELAY_SEC, p95)
+
+    def try_hedge(self, step: int) -> bool:
+        """Take one hedge from the budget; False (and counted) if it is used up."""
+        with self._lock:
+            total_calls = sum(self.calls.values())
+            total_hedges = sum(self.hedges.values())
+            if total_hedges + 1 > self.budget * max(1, total_calls):
+                self.over_budget[step] += 1
+                return False
+            self.hedges[step] += 1
+            return True
+
+    def record(self, step: int, seconds: float, hedge_won: bool = False) -> None:
+        """A call of `step` finished after `seconds` (including any hedge)."""
+        with self._lock:
+            self.calls[step] += 1
+            self._samples[step].append(seconds)
+            if hedge_won:
+                self.hedge_wins[step] += 1
+
+    def snapshot(self) -> dict:
+        steps = {}
+        for step in sorted(set(self.calls) | set(self.hedges)):
+            p95 = self.p95(step)
+            steps[str(step)] = {
+                "calls": self.calls[step],
+                "hedges": self.hedges[step],
+                "hedge_wins": self.hedge_wins[step],
+                "over_budget": self.over_budget[step],
+                "p95_sec": None if p95 is None else round(p95, 3),
+            }
+        return {
+            "budget": self.budget,
+            "hedge_target": (
+                f"{HEDGE_PROVIDER or '(step provider)'}:{HEDGE_MODEL or '(step model)'}"
+                if HEDGE_PROVIDER or HEDGE_MODEL
+                else "same model"
+            ),
+            "calls": sum(self.calls.values()),
+            "hedges": sum(self.hedges.values()),
+            "hedge_wins": sum(self.hedge_wins.values()),
+            "steps": steps,
+        }
+
+    def write_metrics(self) -> dict:
+        snapshot = self.snapshot()
+        METRICS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = METRICS_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+        tmp.replace(METRICS_PATH)
+        return snapshot
+
+
+hedger = Hedger()
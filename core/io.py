@@ -1,21 +1,66 @@
+import gzip
+import hashlib
 import json
+import os
+import threading
 from pathlib import Path
 
 import utils.prompts as prompts
+from config import LOGBOOK_COMPRESSION, LOGBOOK_FORMAT
 
 AVAILABLE_STEPS = [1, 2, 3, 4, 5, 6, 7, 8]
 
+LOGBOOK_BASE = Path("data/pdf_logbook")
+PROMPT_STORE_DIR = LOGBOOK_BASE / ".prompts"
+# Compact step files: prompts stored once per hash, inputs referenced by producing step
+# (with the hash of the producer's response, so a later rerun of it is detected)
+COMPACT_FORMAT_VERSION = 2
+STEP_FILE_SUFFIXES = (".json", ".json.gz", ".json.zst")
+
+_prompt_cache: dict[str, dict] = {}
+_prompt_lock = threading.Lock()
+
 
 def pdf_stem(pdf_name: str) -> str:
     return Path(pdf_name).stem
 
 
 def logbook_dir(pdf_name: str, fr_id: str) -> Path:
-    return Path(f"data/pdf_logbook/{pdf_stem(pdf_name)}/{fr_id}")
+    return LOGBOOK_BASE / pdf_stem(pdf_name) / fr_id
+
+
+def _zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _step_file_suffix() -> str:
+    if LOGBOOK_COMPRESSION == "zstd" and _zstd_available():
+        return ".json.zst"
+    if LOGBOOK_COMPRESSION in ("gzip", "zstd"):
+        return ".json.gz"
+    return ".json"
 
 
 def step_file_path(pdf_name: str, fr_id: str, step_number: int) -> Path:
-    return logbook_dir(pdf_name, fr_id) / f"step{step_number}.json"
+    """Path a new step file is written to (suffix follows LOGBOOK_COMPRESSION)."""
+    return logbook_dir(pdf_name, fr_id) / f"step{step_number}{_step_file_suffix()}"
+
+
+def find_step_file(pdf_name: str, fr_id: str, step_number: int) -> Path | None:
+    """Existing step file in any supported format (plain, gzip, zstd)."""
+    return find_step_file_in(logbook_dir(pdf_name, fr_id), step_number)
+
+
+def find_step_file_in(fr_dir: Path, step_number: int) -> Path | None:
+    for suffix in STEP_FILE_SUFFIXES:
+        path = fr_dir / f"step{step_number}{suffix}"
+        if path.exists():
+            return path
+    return None
 
 
 def ensure_logbook_dir(pdf_name: str, fr_id: str) -> Path:
@@ -24,30 +69,213 @@ def ensure_logbook_dir(pdf_name: str, fr_id: str) -> Path:
     return directory
 
 
-def read_step_json(pdf_name: str, fr_id: str, step_number: int) -> dict | None:
-    path = step_file_path(pdf_name, fr_id, step_number)
-    if not path.exists():
-        return None
+# ============================================
+# ENCODING
+# ============================================
+
+def _encode(path: Path, text: str) -> bytes:
+    data = text.encode("utf-8")
+    if path.name.endswith(".gz"):
+        return gzip.compress(data)
+    if path.name.endswith(".zst"):
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decode(path: Path) -> str:
+    data = path.read_bytes()
+    if path.name.endswith(".gz"):
+        data = gzip.decompress(data)
+    elif path.name.endswith(".zst"):
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data.decode("utf-8")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write via a temp file + rename so readers never see a half-written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# ============================================
+# PROMPT STORE
+# ============================================
+
+def prompt_hash(step_prompt: dict) -> str:
+    return content_hash(step_prompt)
+
+
+def content_hash(obj) -> str:
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def store_prompt(step_prompt: dict) -> str:
+    """Store a prompt once per content hash; returns its id."""
+    prompt_id = prompt_hash(step_prompt)
+    path = PROMPT_STORE_DIR / f"{prompt_id}.json"
+    with _prompt_lock:
+        # Long-lived processes (core.warm_worker) outlive "Clear all": re-check the file
+        if prompt_id in _prompt_cache and path.exists():
+            return prompt_id
+        if not path.exists():
+            atomic_write_bytes(path, json.dumps(step_prompt, ensure_ascii=False).encode("utf-8"))
+        _prompt_cache[prompt_id] = step_prompt
+    return prompt_id
+
+
+def load_prompt(prompt_id: str) -> dict | None:
+    with _prompt_lock:
+        if prompt_id in _prompt_cache:
+            return _prompt_cache[prompt_id]
     try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
+        prompt = json.loads((PROMPT_STORE_DIR / f"{prompt_id}.json").read_text(encoding="utf-8"))
     except (json.JSONDecodeError, OSError):
         return None
+    with _prompt_lock:
+        _prompt_cache[prompt_id] = prompt
+    return prompt
 
 
-def prepare_step_input(pdf_name: str, fr_id: str, fr_text: str, step_number: int) -> dict:
-    """Prepare input data for a step from the previous step output on disk."""
-    if step_number == 1:
-        return {"requirement_text": fr_text}
+# ============================================
+# STEP FILES
+# ============================================
+
+def load_step_file(path: Path, resolve: bool = True) -> dict | None:
+    """Read a step file; with resolve=True compact refs are expanded to the legacy
+    shape (``prompt`` and ``input_data`` keys) so readers need not care."""
+    try:
+        data = json.loads(_decode(path))
+    except (json.JSONDecodeError, OSError, EOFError, ValueError):
+        return None
+    if not resolve or not isinstance(data, dict):
+        return data
+
+    if "prompt_ref" in data and "prompt" not in data:
+        data["prompt"] = load_prompt(data["prompt_ref"])
+    if "input_ref" in data and "input_data" not in data:
+        data["input_data"] = _resolve_input_ref(path.parent, data, data["input_ref"])
+    return data
+
+
+def _producer_response(fr_dir: Path, step: int) -> dict | None:
+    source = find_step_file_in(fr_dir, step)
+    if source is None:
+        return None
+    producer = load_step_file(source, resolve=False) or {}
+    return producer.get("llm_response")
+
+
+def _ref_hashes(ref: dict) -> dict[int, str]:
+    """{producer step: response hash} recorded in an input ref ({} for refs without hashes)."""
+    if "steps" in ref:
+        return dict(zip((int(step) for step in ref["steps"]), ref.get("hashes") or []))
+    if ref.get("hash"):
+        return {int(ref["step"]): ref["hash"]}
+    return {}
 
-    prev_data = read_step_json(pdf_name, fr_id, step_number - 1)
-    if prev_data:
-        if "llm_response" in prev_data:
-            return prev_data["llm_response"]
-        if "input_data" in prev_data:
-            return prev_data["input_data"]
 
-    return {"requirement_text": fr_text}
+def _resolve_input_ref(fr_dir: Path, data: dict, ref: dict) -> dict | None:
+    """The input a ref points to; None if a producer was rerun since (its hash changed)."""
+    if ref.get("fr_text"):
+        return {"requirement_text": data.get("fr_text", "")}
+    hashes = _ref_hashes(ref)
+    steps = [int(step) for step in ref["steps"]] if "steps" in ref else [int(ref.get("step", 0))]
+    merged: dict = {}
+    for step in steps:
+        response = _producer_response(fr_dir, step)
+        if step in hashes and content_hash(response) != hashes[step]:
+            return None
+        if len(steps) == 1:
+            return response
+        merged.update(response or {})
+    return merged
+
+
+def _ref_is_current(fr_dir: Path, ref: dict) -> bool:
+    return all(
+        content_hash(_producer_response(fr_dir, step)) == expected
+        for step, expected in _ref_hashes(ref).items()
+    )
+
+
+def _inline_referencing_inputs(fr_dir: Path, step_number: int, response: dict | None) -> None:
+    """Before a step file is replaced, inline its old response into the step files
+    that reference it, so they keep the input they actually ran with."""
+    from core.steps import dependents
+
+    new_hash = content_hash(response)
+    for dependent in dependents(step_number):
+        path = find_step_file_in(fr_dir, dependent)
+        data = load_step_file(path, resolve=False) if path is not None else None
+        if not isinstance(data, dict) or "input_ref" not in data or "input_data" in data:
+            continue
+        old_hash = _ref_hashes(data["input_ref"]).get(step_number)
+        if old_hash is None or old_hash == new_hash:
+            continue
+        input_data = _resolve_input_ref(fr_dir, data, data["input_ref"])
+        if input_data is None:
+            continue
+        del data["input_ref"]
+        data["input_data"] = input_data
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        atomic_write_bytes(path, _encode(path, text))
+
+
+def read_step_json(pdf_name: str, fr_id: str, step_number: int, resolve: bool = True) -> dict | None:
+    path = find_step_file(pdf_name, fr_id, step_number)
+    if path is None:
+        return None
+    return load_step_file(path, resolve=resolve)
+
+
+def prepare_step_input_with_ref(
+    pdf_name: str, fr_id: str, fr_text: str, step_number: int
+) -> tuple[dict, dict | None]:
+    """Step input plus a compact reference to where it came from (None = inline).
+
+    The input is the response of each step this one depends on (core.steps),
+    merged in step order; with several producers the ref lists them all.
+    """
+    from core.steps import get_step
+
+    producers = get_step(step_number).depends_on
+    if not producers:
+        return {"requirement_text": fr_text}, {"fr_text": True}
+
+    merged: dict = {}
+    hashes: list[str] = []
+    inline = False
+    for producer in producers:
+        prev_data = read_step_json(pdf_name, fr_id, producer, resolve=False)
+        if prev_data and "llm_response" in prev_data:
+            merged.update(prev_data["llm_response"] or {})
+            hashes.append(content_hash(prev_data["llm_response"]))
+            continue
+        if prev_data:
+            prev_data = read_step_json(pdf_name, fr_id, producer)
+            if prev_data and prev_data.get("input_data") is not None:
+                merged.update(prev_data["input_data"])
+                inline = True
+                continue
+        return {"requirement_text": fr_text}, {"fr_text": True}
+
+    if inline:
+        return merged, None
+    if len(producers) == 1:
+        return merged, {"step": producers[0], "hash": hashes[0]}
+    return merged, {"steps": list(producers), "hashes": hashes}
+
+
+def prepare_step_input(pdf_name: str, fr_id: str, fr_text: str, step_number: int) -> dict:
+    """Prepare input data for a step from the previous step output on disk."""
+    return prepare_step_input_with_ref(pdf_name, fr_id, fr_text, step_number)[0]
 
 
 def write_step_json(
@@ -59,22 +287,60 @@ def write_step_json(
     step_input_data: dict,
     llm_response: dict | None = None,
     error: str | None = None,
+    input_ref: dict | None = None,
+    model: str | None = None,
+    usage: dict | None = None,
 ) -> Path:
-    ensure_logbook_dir(pdf_name, fr_id)
+    fr_dir = ensure_logbook_dir(pdf_name, fr_id)
     path = step_file_path(pdf_name, fr_id, step_number)
-    output_data: dict = {
-        "prompt": step_prompt,
-        "input_data": step_input_data,
+    if find_step_file_in(fr_dir, step_number) is not None:
+        # Rerun of a step: later steps' files must not silently point at the new output
+        _inline_referencing_inputs(fr_dir, step_number, None if error else llm_response)
+    if input_ref is not None and not _ref_is_current(fr_dir, input_ref):
+        input_ref = None  # a producer was rerun since the input was read
+    if LOGBOOK_FORMAT == "pretty":
+        output_data: dict = {
+            "prompt": step_prompt,
+            "input_data": step_input_data,
+        }
+    else:
+        output_data = {
+            "format": COMPACT_FORMAT_VERSION,
+            "prompt_ref": store_prompt(step_prompt),
+        }
+        if input_ref is not None:
+            output_data["input_ref"] = input_ref
+        else:
+            output_data["input_data"] = step_input_data
+    output_data.update({
         "fr_id": fr_id,
         "fr_text": fr_text,
         "step_number": step_number,
-    }
+    })
+    if model:
+        output_data["model"] = model
+    if usage:
+        output_data["usage"] = usage
     if error:
         output_data["error"] = error
     else:
         output_data["llm_response"] = llm_response
 
-    path.write_text(json.dumps(output_data, indent=2), encoding="utf-8")
+    if LOGBOOK_FORMAT == "pretty":
+        text = json.dumps(output_data, indent=2)
+    else:
+        text = json.dumps(output_data, separators=(",", ":"), ensure_ascii=False)
+    atomic_write_bytes(path, _encode(path, text))
+
+    # Drop copies of this step in another format so readers never see stale data
+    for suffix in STEP_FILE_SUFFIXES:
+        other = path.with_name(f"step{step_number}{suffix}")
+        if other != path:
+            other.unlink(missing_ok=True)
+
+    from core.logbook_index import record_step
+
+    record_step(pdf_name, fr_id, step_number, path, error, model, usage)
     return path
 
 
@@ -0,0 +1,298 @@
+"""Durable FR-step job queue in SQLite.
+
+One row per (run, PDF, FR, step). Workers lease a job, run the step and either
+complete it (which enqueues the FR's steps that became ready) or fail it (retried until
+JOB_MAX_ATTEMPTS). A crashed worker only loses its leased job: once the lease
+expires another worker picks it up again. A cancelled worker releases its job
+without using up an attempt, and cancelling a run marks its remaining jobs
+``cancelled`` (never claimed again; the FRs resume in a later run). The database lives on the data
+volume, so workers on other machines sharing it can consume the same queue.
+"""
+
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import JOB_LEASE_SEC, JOB_MAX_ATTEMPTS
+from core.steps import STEP_NUMBERS, dependents, get_step, ready_steps
+
+QUEUE_DB = Path("data/jobs.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    pdf_name TEXT NOT NULL,
+    fr_id TEXT NOT NULL,
+    fr_text TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (run_id, pdf_name, fr_id, step)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at, id);
+CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id, status);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    run_id: str
+    pdf_name: str
+    fr_id: str
+    fr_text: str
+    step: int
+    attempts: int
+    lease_owner: str
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _done_steps(conn: sqlite3.Connection, job: Job) -> set[int]:
+    rows = conn.execute(
+        "SELECT step FROM jobs WHERE run_id = ? AND pdf_name = ? AND fr_id = ? AND status = 'done'",
+        (job.run_id, job.pdf_name, job.fr_id),
+    )
+    return {row["step"] for row in rows}
+
+
+class JobQueue:
+    def __init__(self, path: Path = QUEUE_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Rollback journal (not WAL) so the file stays safe on shared volumes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # ---- producers ----
+
+    def enqueue_fr(
+        self,
+        run_id: str,
+        pdf_name: str,
+        fr_id: str,
+        fr_text: str,
+        step: int | None = None,
+        start_step: int = 0,
+    ) -> None:
+        """Queue `step` of an FR, or (default) the steps that need no other step.
+
+        With `start_step` (resuming a cancelled FR), steps up to it are recorded
+        as done and the steps they unblock are queued.
+        """
+        now = time.time()
+        done = {n for n in STEP_NUMBERS if n <= start_step}
+        with self._transaction() as conn:
+            for n in sorted(done):
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs "
+                    "(run_id, pdf_name, fr_id, fr_text, step, status, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'done', ?, ?, ?)",
+                    (run_id, pdf_name, fr_id, fr_text, n, now, now, now),
+                )
+            for first in [step] if step is not None else ready_steps(done):
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs "
+                    "(run_id, pdf_name, fr_id, fr_text, step, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, pdf_name, fr_id, fr_text, first, now, now, now),
+                )
+
+    def enqueue_tasks(
+        self,
+        run_id: str,
+        tasks: dict[str, list[dict[str, str]]],
+        start_steps: dict[str, dict[str, int]] | None = None,
+    ) -> int:
+        count = 0
+        for pdf_name, frs_list in tasks.items():
+            for fr in frs_list:
+                fr_id = list(fr.keys())[0]
+                start_step = (start_steps or {}).get(pdf_name, {}).get(fr_id, 0)
+                self.enqueue_fr(run_id, pdf_name, fr_id, fr[fr_id], start_step=start_step)
+                count += 1
+        return count
+
+    # ---- consumers ----
+
+    def claim(self, worker_id: str, run_id: str | None = None) -> Job | None:
+        """Lease the oldest runnable job (queued, or leased with an expired lease)."""
+        now = time.time()
+        run_filter = " AND run_id = ?" if run_id else ""
+        run_params = (run_id,) if run_id else ()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), "
+                "updated_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, JOB_MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE attempts < ? AND ("
+                "(status = 'queued' AND available_at <= ?) OR "
+                "(status = 'leased' AND lease_expires < ?))" + run_filter +
+                " ORDER BY id LIMIT 1",
+                (JOB_MAX_ATTEMPTS, now, now, *run_params),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + JOB_LEASE_SEC, now, row["id"]),
+            )
+        return Job(
+            id=row["id"],
+            run_id=row["run_id"],
+            pdf_name=row["pdf_name"],
+            fr_id=row["fr_id"],
+            fr_text=row["fr_text"],
+            step=row["step"],
+            attempts=row["attempts"] + 1,
+            lease_owner=worker_id,
+        )
+
+    def heartbeat(self, job: Job) -> bool:
+        """Extend the lease; False if another worker has taken the job over."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + JOB_LEASE_SEC, now, job.id, job.lease_owner),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job: Job) -> None:
+        """Mark done and, in the same transaction, enqueue the FR's steps that became ready."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now, job.id, job.lease_owner),
+            )
+            if cur.rowcount != 1 or not dependents(job.step):
+                return
+            done = _done_steps(conn, job)
+            for step in dependents(job.step):
+                if not set(get_step(step).depends_on) <= done:
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs "
+                    "(run_id, pdf_name, fr_id, fr_text, step, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.run_id, job.pdf_name, job.fr_id, job.fr_text, step, now, now, now),
+                )
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried."""
+        now = time.time()
+        retry = job.attempts < JOB_MAX_ATTEMPTS
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, "
+                "available_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (
+                    "queued" if retry else "failed",
+                    error[:2000],
+                    now + min(60.0, 2.0 ** job.attempts),
+                    now,
+                    job.id,
+                    job.lease_owner,
+                ),
+            )
+        return retry
+
+    def release(self, job: Job) -> None:
+        """Give a leased job back without counting the attempt (its worker was cancelled)."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1, available_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now, now, job.id, job.lease_owner),
+            )
+
+    def cancel_run(self, run_id: str) -> int:
+        """Mark the run's queued and leased jobs cancelled; returns how many.
+
+        Workers still holding a lease see it on their next heartbeat and stop.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', lease_owner = NULL, updated_at = ? "
+                "WHERE run_id = ? AND status IN ('queued', 'leased')",
+                (now, run_id),
+            )
+            return cur.rowcount
+
+    def done_steps(self, job: Job) -> set[int]:
+        """Steps of the job's FR already done in its run."""
+        with closing(self._connect()) as conn:
+            return _done_steps(conn, job)
+
+    # ---- progress ----
+
+    def counts(self, run_id: str | None = None) -> dict[str, int]:
+        query = "SELECT status, COUNT(*) AS n FROM jobs"
+        params: tuple = ()
+        if run_id:
+            query += " WHERE run_id = ?"
+            params = (run_id,)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " GROUP BY status", params).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def fr_steps(self, run_id: str) -> dict[tuple[str, str], dict[int, str]]:
+        """{(pdf_name, fr_id): {step: status}} for every job of a run."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT pdf_name, fr_id, step, status FROM jobs WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        steps: dict[tuple[str, str], dict[int, str]] = {}
+        for row in rows:
+            steps.setdefault((row["pdf_name"], row["fr_id"]), {})[row["step"]] = row["status"]
+        return steps
+
+    def is_drained(self, run_id: str | None = None) -> bool:
+        counts = self.counts(run_id)
+        return not counts.get("queued") and not counts.get("leased")
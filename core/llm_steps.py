@@ -1,25 +1,89 @@
+import asyncio
+import contextvars
 import json
+import threading
 import time
-from typing import Any
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
 
+from langchain_core.callbacks import UsageMetadataCallbackHandler
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from rich import print
 
+import utils.schema as schema
+from config import HEDGE_MODEL, HEDGE_PROVIDER, STEP_BATCH_SIZE, STEP_BATCH_STEPS, STEP_BATCH_WINDOW_SEC
+from core.cancel import CancelToken, RunCancelled
 from core.concurrency import llm_slot
-from llm_client import get_llm
+from core.hedging import hedger
+from core.log import get_logger
+from core.steps import FR_TEXT_KEY, PIPELINE
+from llm_client import get_chat_model, get_llm, run_async, step_model
 
-# (input_data_key, template_placeholder_name in utils.prompts user_prompt)
+# (input_data_key, template_placeholder_name in utils.prompts user_prompt), from
+# each step's declared inputs (core.steps)
 STEP_FORMAT_KEYS: dict[int, list[tuple[str, str]]] = {
-    2: [("atomic_blocks", "atomic_blocks")],
-    3: [("partitions", "partitions")],
-    4: [("partitions", "partitions"), ("boundaries", "boundaries")],
-    5: [("test_values", "test_values")],
-    6: [("values", "unified_values")],
-    7: [("deduped_values", "deduped_values")],
-    8: [("organized_data", "organized_data")],
+    n: list(step.inputs.items())
+    for n, step in PIPELINE.items()
+    if FR_TEXT_KEY not in step.inputs
 }
 
+log = get_logger(__name__)
+
+
+# ============================================
+# TOKEN USAGE
+# ============================================
+
+@dataclass
+class StepUsage:
+    """Tokens used by one step (all its sub-calls), for the logbook and cost report."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    calls: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, input_tokens: int, output_tokens: int, calls: int = 1) -> None:
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.calls += calls
+
+    def as_dict(self) -> dict | None:
+        if not self.calls:
+            return None
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "calls": self.calls,
+        }
+
+
+_step_usage: contextvars.ContextVar[StepUsage | None] = contextvars.ContextVar(
+    "dect_step_usage", default=None
+)
+
+
+@contextmanager
+def track_step_usage():
+    """Collect the token usage of every LLM call made inside the block (threads included)."""
+    usage = StepUsage()
+    token = _step_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _step_usage.reset(token)
+
+
+def _tokens(handler: UsageMetadataCallbackHandler) -> tuple[int, int]:
+    metadata = handler.usage_metadata.values()
+    return (
+        sum(m.get("input_tokens", 0) for m in metadata),
+        sum(m.get("output_tokens", 0) for m in metadata),
+    )
+
 
 def _json_for_prompt(obj: Any) -> str:
     """JSON text safe to embed in a ChatPromptTemplate message (brace-escaped)."""
@@ -39,25 +103,142 @@ def _build_user_prompt(step_number: int, step_prompt: dict, step_input_data: dic
     return user_text
 
 
+def validate_step_output(step_number: int, result: Any) -> bool:
+    """Cheap shape check against utils.schema (required keys + array types)."""
+    step_schema = getattr(schema, f"step{step_number}_schema", None)
+    if not isinstance(result, dict):
+        return False
+    if not step_schema:
+        return True
+    properties = step_schema.get("properties", {})
+    for key in step_schema.get("required", []):
+        if key not in result:
+            return False
+        if properties.get(key, {}).get("type") == "array" and not isinstance(result[key], list):
+            return False
+    return True
+
+
 def invoke_step(
     step_number: int,
     step_prompt: dict,
     step_input_data: dict,
     fr_text: str,
+    cancel: CancelToken | None = None,
+) -> dict:
+    """Run one pipeline step via LLM and return parsed JSON.
+
+    When cross-FR batching is enabled for this step (STEP_BATCH_SIZE > 1), the
+    call is coalesced with other FRs waiting on the same step; FRs whose batched
+    sub-result fails validation fall back to a single call. With a `cancel`
+    token, RunCancelled is raised as soon as it fires (the request is aborted).
+    """
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    if STEP_BATCH_SIZE > 1 and step_number in STEP_BATCH_STEPS:
+        result = _batcher.submit(step_number, step_prompt, step_input_data, fr_text, cancel)
+        if result is not None:
+            return result
+    return _invoke_single(step_number, step_prompt, step_input_data, fr_text, cancel)
+
+
+def _cancel_tasks(tasks: set) -> None:
+    for task in tasks:
+        task.cancel()
+
+
+async def _ainvoke_racing(
+    chain,
+    config: dict,
+    cancel: CancelToken | None,
+    step_number: int | None = None,
+    hedge_chain=None,
+) -> tuple[Any, bool]:
+    """Await chain.ainvoke, hedged after the step's p95 (core.hedging); abort on cancel.
+
+    Returns (result, hedge_won). The first task to return parsed JSON wins and
+    the other is cancelled (its HTTP request is closed).
+    """
+    loop = asyncio.get_running_loop()
+    primary = asyncio.ensure_future(chain.ainvoke({}, config))
+    tasks = {primary}
+    unregister = (
+        cancel.on_cancel(lambda: loop.call_soon_threadsafe(_cancel_tasks, tasks))
+        if cancel is not None
+        else (lambda: None)
+    )
+    try:
+        delay = hedger.delay(step_number) if hedge_chain is not None else None
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done and hedger.try_hedge(step_number):
+                log.info("Step %d: no answer after %.2fs (p95), sending a hedged request", step_number, delay)
+                tasks.add(asyncio.ensure_future(hedge_chain.ainvoke({}, config)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    _cancel_tasks(pending)
+                    return task.result(), task is not primary
+                error = error or task.exception()
+        if cancel is not None and cancel.cancelled:
+            raise RunCancelled(cancel.reason)
+        raise error
+    finally:
+        unregister()
+
+
+def _invoke_chain(
+    chain,
+    cancel: CancelToken | None,
+    step_number: int | None = None,
+    hedge_chain=None,
+):
+    """chain.invoke({}), or an async call that is aborted (connection closed) on
+    cancel and, with `hedge_chain`, hedged once it runs past the step's p95.
+
+    Token usage is added to the current step's StepUsage (track_step_usage).
+    """
+    handler = UsageMetadataCallbackHandler()
+    config = {"callbacks": [handler]}
+    start = time.monotonic()
+    if cancel is None and hedge_chain is None:
+        result, hedge_won = chain.invoke({}, config), False
+    else:
+        # On the shared loop (llm_client.run_async), never a loop per call
+        result, hedge_won = run_async(
+            _ainvoke_racing(chain, config, cancel, step_number, hedge_chain)
+        )
+    if step_number is not None:
+        hedger.record(step_number, time.monotonic() - start, hedge_won)
+    usage = _step_usage.get()
+    if usage is not None:
+        usage.add(*_tokens(handler))
+    return result
+
+
+def _invoke_single(
+    step_number: int,
+    step_prompt: dict,
+    step_input_data: dict,
+    fr_text: str,
+    cancel: CancelToken | None = None,
 ) -> dict:
-    """Run one pipeline step via LLM and return parsed JSON."""
     from core.status import append_status_log
 
     append_status_log(f"LLM step {step_number}: preparing prompt")
-    print(f"  Preparing prompt for step {step_number}...")
+    log.debug("Preparing prompt for step %d", step_number)
     start_time = time.time()
 
-    with llm_slot():
+    with llm_slot(cancel):
         append_status_log(f"LLM step {step_number}: waiting for API slot")
-        llm = get_llm()
+        llm = get_llm(step_number)
 
         if step_number == 1:
-            print(f"  Step 1: FR text ({len(fr_text)} chars)")
+            log.debug("Step 1: FR text (%d chars)", len(fr_text))
             prompt = ChatPromptTemplate.from_messages([
                 {"role": "system", "content": step_prompt["system_prompt"]},
                 {"role": "user", "content": step_prompt["user_prompt"]},
@@ -67,19 +248,243 @@ def invoke_step(
             user_content = _build_user_prompt(step_number, step_prompt, step_input_data)
             for data_key, _ in STEP_FORMAT_KEYS[step_number]:
                 count = len(step_input_data.get(data_key, []))
-                print(f"  Step {step_number}: {data_key} count={count}")
-            print(f"  User prompt length: {len(user_content)} chars")
+                log.debug("Step %d: %s count=%d", step_number, data_key, count)
+            log.debug("User prompt length: %d chars", len(user_content))
             prompt = ChatPromptTemplate.from_messages([
                 {"role": "system", "content": step_prompt["system_prompt"]},
                 {"role": "user", "content": user_content},
             ])
 
         chain = prompt | llm | JsonOutputParser()
+        hedge_chain = None
+        if hedger.enabled:
+            hedge_llm = llm
+            if HEDGE_PROVIDER or HEDGE_MODEL:
+                provider, model = step_model(step_number)
+                hedge_llm = get_chat_model(HEDGE_PROVIDER or provider, HEDGE_MODEL or model)
+            hedge_chain = prompt | hedge_llm | JsonOutputParser()
         append_status_log(f"LLM step {step_number}: calling model")
-        print(f"  Invoking LLM for step {step_number}...")
-        result = chain.invoke({})
+        log.debug("Invoking LLM for step %d", step_number)
+        result = _invoke_chain(chain, cancel, step_number, hedge_chain)
 
     elapsed = time.time() - start_time
     append_status_log(f"LLM step {step_number}: done ({elapsed:.1f}s)")
-    print(f"  Step {step_number} LLM call completed in {elapsed:.1f}s")
+    log.info("Step %d LLM call completed in %.1fs", step_number, elapsed)
     return result
+
+
+# ============================================
+# CROSS-FR BATCHING
+# ============================================
+
+BATCH_INSTRUCTIONS = """
+You will receive several independent inputs, each introduced by a line "### <key>".
+Apply the instructions above to each input separately and return one JSON object:
+{{"results": {{"<key>": <output for that input, following the schema>}}}}
+Include every key exactly once. Never mix data between inputs.
+"""
+
+
+@dataclass
+class _BatchItem:
+    step_prompt: dict
+    step_input_data: dict
+    fr_text: str
+    cancel: CancelToken | None = None
+    future: Future = field(default_factory=Future)
+    taken: bool = False
+    # Usage of the submitting FR's step (the batch's tokens are split evenly)
+    usage: StepUsage | None = field(default_factory=_step_usage.get)
+
+
+def _escape_braces(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _batch_item_text(step_number: int, item: _BatchItem) -> str:
+    if step_number == 1:
+        return _escape_braces(item.fr_text)
+    return _build_user_prompt(step_number, item.step_prompt, item.step_input_data)
+
+
+def _batch_cancel(items: list[_BatchItem]) -> tuple[CancelToken | None, Callable[[], None]]:
+    """Token that fires once every item's FR is cancelled, and its unregister function.
+
+    None if some item has no token (the batch is then never aborted).
+    """
+    if any(item.cancel is None for item in items):
+        return None, lambda: None
+    token = CancelToken()
+    remaining = [len(items)]
+    lock = threading.Lock()
+
+    def item_cancelled(item: _BatchItem) -> None:
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            token.cancel(item.cancel.reason)
+
+    unregisters = [item.cancel.on_cancel(lambda item=item: item_cancelled(item)) for item in items]
+
+    def unregister_all() -> None:
+        for unregister in unregisters:
+            unregister()
+
+    return token, unregister_all
+
+
+def _invoke_batch(step_number: int, items: list[_BatchItem]) -> list[dict | None]:
+    """One LLM call for several FRs; returns per-item results (None = fall back).
+
+    The slot wait and the request are aborted once every item's FR is cancelled.
+    """
+    from core.status import append_status_log
+
+    keys = [f"item-{i}" for i in range(1, len(items) + 1)]
+    step_prompt = items[0].step_prompt
+    sections = [
+        f"### {key}\n{_batch_item_text(step_number, item)}"
+        for key, item in zip(keys, items)
+    ]
+    user_messages = []
+    if step_number == 1:
+        user_messages.append({"role": "user", "content": step_prompt["user_prompt"]})
+    user_messages.append({"role": "user", "content": "\n\n".join(sections)})
+
+    append_status_log(f"LLM step {step_number}: batched call for {len(items)} FR(s)")
+    log.info("Step %d: batching %d FR(s) into one request", step_number, len(items))
+    start_time = time.time()
+
+    cancel, unregister = _batch_cancel(items)
+    try:
+        with llm_slot(cancel):
+            prompt = ChatPromptTemplate.from_messages([
+                {
+                    "role": "system",
+                    "content": step_prompt["system_prompt"] + BATCH_INSTRUCTIONS,
+                },
+                *user_messages,
+            ])
+            chain = prompt | get_llm(step_number) | JsonOutputParser()
+            handler = UsageMetadataCallbackHandler()
+            config = {"callbacks": [handler]}
+            if cancel is None:
+                response = chain.invoke({}, config)
+            else:
+                response, _ = run_async(_ainvoke_racing(chain, config, cancel))
+    except RunCancelled:
+        return [None] * len(items)
+    except Exception as e:
+        log.warning("Step %d batched call failed, falling back: %s", step_number, e)
+        return [None] * len(items)
+    finally:
+        unregister()
+
+    input_tokens, output_tokens = _tokens(handler)
+    for item in items:
+        if item.usage is not None:
+            item.usage.add(input_tokens // len(items), output_tokens // len(items))
+
+    sub_results = response.get("results", {}) if isinstance(response, dict) else {}
+    results: list[dict | None] = []
+    for key in keys:
+        sub = sub_results.get(key) if isinstance(sub_results, dict) else None
+        results.append(sub if validate_step_output(step_number, sub) else None)
+
+    fallbacks = sum(1 for r in results if r is None)
+    elapsed = time.time() - start_time
+    append_status_log(
+        f"LLM step {step_number}: batch done ({elapsed:.1f}s, {fallbacks} fallback(s))"
+    )
+    log.info(
+        "Step %d batched call completed in %.1fs (%d/%d valid)",
+        step_number,
+        elapsed,
+        len(items) - fallbacks,
+        len(items),
+    )
+    return results
+
+
+class _StepBatcher:
+    """Coalesce FRs waiting on the same step into groups of STEP_BATCH_SIZE.
+
+    The first FR to arrive waits up to STEP_BATCH_WINDOW_SEC for others; the FR
+    that fills a group sends it immediately. Each caller blocks on its own future.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: dict[int, list[_BatchItem]] = {}
+
+    def _take(self, step_number: int) -> list[_BatchItem]:
+        group = self._pending.pop(step_number, [])
+        for item in group:
+            item.taken = True
+        self._cond.notify_all()
+        return group
+
+    @staticmethod
+    def _resolve(item: _BatchItem, result: dict | None) -> None:
+        if item.cancel is not None and item.cancel.cancelled:
+            item.future.set_exception(RunCancelled(item.cancel.reason))
+        else:
+            item.future.set_result(result)
+
+    def _run(self, step_number: int, group: list[_BatchItem]) -> None:
+        # FRs cancelled while waiting for the group are not sent
+        live = []
+        for item in group:
+            if item.cancel is not None and item.cancel.cancelled:
+                self._resolve(item, None)
+            else:
+                live.append(item)
+        if len(live) == 1:
+            live[0].future.set_result(None)
+        elif live:
+            for item, result in zip(live, _invoke_batch(step_number, live)):
+                self._resolve(item, result)
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def submit(
+        self,
+        step_number: int,
+        step_prompt: dict,
+        step_input_data: dict,
+        fr_text: str,
+        cancel: CancelToken | None = None,
+    ) -> dict | None:
+        """Batched result for this FR, or None to fall back to a single call.
+
+        Raises RunCancelled if `cancel` fires before the FR's batch is sent.
+        """
+        item = _BatchItem(step_prompt, step_input_data, fr_text, cancel)
+        group: list[_BatchItem] = []
+        # The first FR stops waiting for others as soon as it is cancelled
+        unregister = cancel.on_cancel(self._wake) if cancel is not None else (lambda: None)
+        try:
+            with self._cond:
+                queue = self._pending.setdefault(step_number, [])
+                queue.append(item)
+                if len(queue) >= STEP_BATCH_SIZE:
+                    group = self._take(step_number)
+                elif len(queue) == 1:
+                    self._cond.wait_for(
+                        lambda: item.taken or (cancel is not None and cancel.cancelled),
+                        timeout=STEP_BATCH_WINDOW_SEC,
+                    )
+                    if not item.taken:
+                        group = self._take(step_number)
+        finally:
+            unregister()
+
+        if group:
+            self._run(step_number, group)
+        return item.future.result()
+
+
+_batcher = _StepBatcher()
@@ -0,0 +1,26 @@
+"""Deterministic replacements for LLM steps (see STEPS_REPLACED in core/steps.py).
+
+Steps 5 and 6 only flatten and de-duplicate lists; doing that in Python saves
+two LLM round trips per FR.
+"""
+
+
+def unify_test_values(input_data: dict, fr_text: str) -> dict:
+    """Step 5: the ``value`` of every step 4 test value, in order."""
+    values = []
+    for item in input_data.get("test_values") or []:
+        value = item.get("value") if isinstance(item, dict) else item
+        if value is not None:
+            values.append(str(value))
+    return {"fr_id": input_data.get("fr_id", ""), "values": values}
+
+
+def dedupe_values(input_data: dict, fr_text: str) -> dict:
+    """Step 6: drop exact duplicates, keeping the first occurrence."""
+    seen = set()
+    deduped = []
+    for value in input_data.get("values") or []:
+        if value not in seen:
+            seen.add(value)
+            deduped.append(value)
+    return {"fr_id": input_data.get("fr_id", ""), "deduped_values": deduped}
@@ -0,0 +1,150 @@
+"""Structured pipeline logging.
+
+Pipeline code logs through ``get_logger(__name__)`` instead of printing.
+Every record carries an FR tag (``<pdf>/<FR>#<step>``) from the surrounding
+``fr_context`` block, so the interleaved output of parallel FRs can be told
+apart and grepped. Noise is controlled in .env:
+
+- ``LOG_LEVEL``: minimum level written (default INFO)
+- ``LOG_SAMPLE_RATE``: share of FRs whose INFO/DEBUG step lines are kept
+  (1.0 = all). Warnings and errors are always kept. Sampling is per FR, so a
+  sampled FR keeps all of its lines.
+- ``LOG_MUTE``: comma-separated logger names to silence below WARNING
+  (e.g. ``dect.llm_steps``)
+
+The pipeline process logs to stdout as ``LEVEL [tag] logger: message`` lines.
+The UI reads that output on background threads (``stream_to_log``) and writes
+it to a rotating file, ``logs/pipeline.log``. Reading it continuously means the
+child never blocks on a full pipe.
+"""
+
+import contextvars
+import logging
+import re
+import sys
+import threading
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from config import LOG_BACKUPS, LOG_DIR, LOG_LEVEL, LOG_MAX_BYTES, LOG_MUTE, LOG_SAMPLE_RATE
+
+PIPELINE_LOG = Path(LOG_DIR) / "pipeline.log"
+ROOT = "dect"
+
+_fr_tag: contextvars.ContextVar[str] = contextvars.ContextVar("dect_fr_tag", default="-")
+_configured = False
+_config_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the ``dect`` namespace (``core.fr_graph`` -> ``dect.fr_graph``)."""
+    short = name.rsplit(".", 1)[-1] if name.startswith("core.") else name
+    return logging.getLogger(f"{ROOT}.{short}")
+
+
+@contextmanager
+def fr_context(pdf_name: str, fr_id: str, step: int | None = None):
+    """Tag every record logged inside the block with the FR (and step)."""
+    from core.io import pdf_stem
+
+    tag = f"{pdf_stem(pdf_name)}/{fr_id}" + (f"#{step}" if step else "")
+    token = _fr_tag.set(tag)
+    try:
+        yield
+    finally:
+        _fr_tag.reset(token)
+
+
+class _FRTagFilter(logging.Filter):
+    """Adds ``record.fr``; applies LOG_MUTE and per-FR LOG_SAMPLE_RATE below WARNING."""
+
+    def __init__(self, sample_rate: float, muted: list[str]):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.muted = muted
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.fr = getattr(record, "fr", None) or _fr_tag.get()
+        if record.levelno >= logging.WARNING:
+            return True
+        if any(record.name == m or record.name.startswith(m + ".") for m in self.muted):
+            return False
+        if self.sample_rate >= 1.0 or record.fr == "-":
+            return True
+        fr = record.fr.split("#", 1)[0]
+        return zlib.crc32(fr.encode("utf-8")) % 1000 < self.sample_rate * 1000
+
+
+def configure_logging(stream=None) -> None:
+    """Set up the ``dect`` loggers for a pipeline process (idempotent)."""
+    global _configured
+    with _config_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(logging.Formatter("%(levelname)s [%(fr)s] %(name)s: %(message)s"))
+        handler.addFilter(_FRTagFilter(LOG_SAMPLE_RATE, LOG_MUTE))
+        root = logging.getLogger(ROOT)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(handler)
+        root.propagate = False
+        _configured = True
+
+
+# ============================================
+# CHILD OUTPUT -> ROTATING FILE (UI side)
+# ============================================
+
+_LEVEL_PREFIX = re.compile(r"^(DEBUG|INFO|WARNING|ERROR|CRITICAL) (.*)$")
+_file_logger: logging.Logger | None = None
+
+
+def _pipeline_file_logger() -> logging.Logger:
+    global _file_logger
+    with _config_lock:
+        if _file_logger is None:
+            PIPELINE_LOG.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                PIPELINE_LOG, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(message)s"))
+            console = logging.StreamHandler(sys.stderr)
+            console.setLevel(logging.WARNING)
+            console.setFormatter(logging.Formatter("pipeline %(levelname)s %(message)s"))
+            _file_logger = logging.getLogger("dect-ui.pipeline")
+            _file_logger.setLevel(logging.DEBUG)
+            _file_logger.addHandler(handler)
+            _file_logger.addHandler(console)
+            _file_logger.propagate = False
+    return _file_logger
+
+
+def stream_to_log(stream, default_level: int = logging.INFO, tail: deque | None = None) -> threading.Thread:
+    """Drain a child's stdout/stderr into logs/pipeline.log on a daemon thread.
+
+    Warnings and errors are echoed to the UI's console as well.
+
+    Lines already formatted by ``configure_logging`` keep their level; other
+    lines (plain prints, tracebacks) get `default_level`. The last lines can be
+    kept in `tail` (e.g. for an error message).
+    """
+    logger = _pipeline_file_logger()
+
+    def pump():
+        with stream:
+            for line in stream:
+                line = line.rstrip("\n")
+                if tail is not None:
+                    tail.append(line)
+                match = _LEVEL_PREFIX.match(line)
+                if match:
+                    logger.log(getattr(logging, match.group(1)), match.group(2))
+                elif line.strip():
+                    logger.log(default_level, line)
+
+    thread = threading.Thread(target=pump, name="dect-log-pump", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,320 @@
+"""SQLite index of the logbook so lookups do not walk data/pdf_logbook.
+
+Writers (``core.io.write_step_json`` and ``core.status.set_fr_status``) record
+every step file and FR status change here; the UI, combiner and download
+checks query it instead of listing directories. The index file lives inside
+the logbook, so clearing the logbook clears the index with it. If the file is
+missing it is rebuilt from disk on first use; rebuild by hand with:
+
+    python -m core.reindex
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from core.io import AVAILABLE_STEPS, LOGBOOK_BASE, find_step_file_in, load_step_file, pdf_stem
+from core.steps import resume_step
+
+INDEX_PATH = LOGBOOK_BASE / ".index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    pdf TEXT NOT NULL,
+    fr_id TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    mtime REAL,
+    size INTEGER,
+    error TEXT,
+    model TEXT,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    PRIMARY KEY (pdf, fr_id, step)
+);
+CREATE INDEX IF NOT EXISTS steps_fr ON steps (fr_id, step);
+CREATE INDEX IF NOT EXISTS steps_step ON steps (step);
+CREATE TABLE IF NOT EXISTS frs (
+    pdf TEXT NOT NULL,
+    fr_id TEXT NOT NULL,
+    step INTEGER NOT NULL DEFAULT 0,
+    phase TEXT,
+    message TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (pdf, fr_id)
+);
+CREATE INDEX IF NOT EXISTS frs_phase ON frs (phase);
+"""
+
+# Columns added after the first release (index files created before get them on open)
+_ADDED_STEP_COLUMNS = {"model": "TEXT", "input_tokens": "INTEGER", "output_tokens": "INTEGER"}
+_STEP_COLUMNS = "pdf, fr_id, step, path, mtime, size, error, model, input_tokens, output_tokens"
+
+_init_lock = threading.Lock()
+_migrated = False
+
+
+def _connect() -> sqlite3.Connection:
+    # Rollback journal (not WAL), same as the job queue, for shared data volumes
+    conn = sqlite3.connect(INDEX_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ensure_index() -> None:
+    """Create the index (and fill it from disk) if it does not exist yet."""
+    global _migrated
+    if INDEX_PATH.exists():
+        if not _migrated:
+            with _init_lock, closing(_connect()) as conn:
+                _add_missing_columns(conn)
+                _migrated = True
+        return
+    with _init_lock:
+        if INDEX_PATH.exists():
+            return
+        INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with closing(_connect()) as conn:
+            conn.executescript(_SCHEMA)
+        _migrated = True
+        rebuild()
+
+
+def _add_missing_columns(conn: sqlite3.Connection) -> None:
+    present = {row["name"] for row in conn.execute("PRAGMA table_info(steps)")}
+    for column, kind in _ADDED_STEP_COLUMNS.items():
+        if column not in present:
+            conn.execute(f"ALTER TABLE steps ADD COLUMN {column} {kind}")
+
+
+@contextmanager
+def _transaction():
+    _ensure_index()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _query(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+    _ensure_index()
+    with closing(_connect()) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+# ============================================
+# WRITERS
+# ============================================
+
+def _step_row(
+    pdf: str,
+    fr_id: str,
+    step: int,
+    path: Path,
+    error: str | None,
+    model: str | None = None,
+    usage: dict | None = None,
+) -> tuple:
+    try:
+        stat = path.stat()
+        mtime, size = stat.st_mtime, stat.st_size
+    except OSError:
+        mtime, size = None, None
+    usage = usage or {}
+    return (
+        pdf, fr_id, step, str(path), mtime, size, error,
+        model, usage.get("input_tokens"), usage.get("output_tokens"),
+    )
+
+
+def record_step(
+    pdf_name: str,
+    fr_id: str,
+    step: int,
+    path: Path,
+    error: str | None = None,
+    model: str | None = None,
+    usage: dict | None = None,
+) -> None:
+    row = _step_row(pdf_stem(pdf_name), fr_id, step, Path(path), error, model, usage)
+    with _transaction() as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO steps ({_STEP_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+        )
+
+
+def record_status(
+    pdf_name: str, fr_id: str, step: int, phase: str, message: str = "", updated_at: str = ""
+) -> None:
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO frs VALUES (?, ?, ?, ?, ?, ?)",
+            (pdf_stem(pdf_name), fr_id, step, phase, message, updated_at),
+        )
+
+
+def rebuild() -> tuple[int, int]:
+    """Re-index the logbook from disk; returns (FRs, step files) indexed."""
+    step_rows, status_rows = [], []
+    if LOGBOOK_BASE.is_dir():
+        for pdf_dir in LOGBOOK_BASE.iterdir():
+            if not pdf_dir.is_dir() or pdf_dir.name.startswith("."):
+                continue
+            for fr_dir in pdf_dir.iterdir():
+                if not fr_dir.is_dir() or not fr_dir.name.startswith("FR-"):
+                    continue
+                for step in AVAILABLE_STEPS:
+                    path = find_step_file_in(fr_dir, step)
+                    if path is None:
+                        continue
+                    data = load_step_file(path, resolve=False) or {}
+                    step_rows.append(_step_row(
+                        pdf_dir.name, fr_dir.name, step, path,
+                        data.get("error"), data.get("model"), data.get("usage"),
+                    ))
+            for status_file in (pdf_dir / ".status").glob("*.json"):
+                try:
+                    st = json.loads(status_file.read_text(encoding="utf-8"))
+                except (json.JSONDecodeError, OSError):
+                    continue
+                status_rows.append((
+                    pdf_dir.name,
+                    st.get("fr_id", status_file.stem),
+                    int(st.get("step", 0)),
+                    st.get("phase"),
+                    st.get("message", ""),
+                    st.get("updated_at", ""),
+                ))
+
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = _connect()
+    try:
+        conn.executescript(_SCHEMA)
+        _add_missing_columns(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM steps")
+        conn.execute("DELETE FROM frs")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO steps ({_STEP_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", step_rows
+        )
+        conn.executemany("INSERT OR REPLACE INTO frs VALUES (?, ?, ?, ?, ?, ?)", status_rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    fr_count = len({(row[0], row[1]) for row in step_rows} | {(row[0], row[1]) for row in status_rows})
+    return fr_count, len(step_rows)
+
+
+# ============================================
+# QUERIES
+# ============================================
+
+def list_fr_ids(pdf_name: str | None = None) -> list[str]:
+    """Distinct FR ids with a step file or status, optionally for one PDF."""
+    where = " WHERE pdf = ?" if pdf_name else ""
+    params = (pdf_stem(pdf_name),) * 2 if pdf_name else ()
+    rows = _query(
+        f"SELECT fr_id FROM steps{where} UNION SELECT fr_id FROM frs{where} ORDER BY fr_id",
+        params,
+    )
+    return [row["fr_id"] for row in rows]
+
+
+def step_files(
+    pdf_name: str | None = None,
+    fr_id: str | None = None,
+    step: int | None = None,
+) -> list[tuple[str, str, int, Path]]:
+    """(pdf, fr_id, step, path) for indexed step files matching the filters."""
+    clauses, params = [], []
+    if pdf_name:
+        clauses.append("pdf = ?")
+        params.append(pdf_stem(pdf_name))
+    if fr_id:
+        clauses.append("fr_id = ?")
+        params.append(fr_id)
+    if step is not None:
+        clauses.append("step = ?")
+        params.append(step)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _query(f"SELECT pdf, fr_id, step, path FROM steps{where} ORDER BY pdf, fr_id, step", tuple(params))
+    return [(row["pdf"], row["fr_id"], row["step"], Path(row["path"])) for row in rows]
+
+
+def find_step(fr_id: str, step: int, pdf_name: str | None = None) -> Path | None:
+    """Most recently written step file for an FR (any PDF unless one is given)."""
+    where, params = "fr_id = ? AND step = ?", [fr_id, step]
+    if pdf_name:
+        where += " AND pdf = ?"
+        params.append(pdf_stem(pdf_name))
+    rows = _query(f"SELECT path FROM steps WHERE {where} ORDER BY mtime DESC LIMIT 1", tuple(params))
+    return Path(rows[0]["path"]) if rows else None
+
+
+def has_step(step: int) -> bool:
+    return bool(_query("SELECT 1 FROM steps WHERE step = ? LIMIT 1", (step,)))
+
+
+def running_fr() -> tuple[str, str, int, str] | None:
+    """(pdf, fr_id, step, message) of a currently running FR, if any."""
+    rows = _query(
+        "SELECT pdf, fr_id, step, message FROM frs WHERE phase = 'running' "
+        "ORDER BY pdf, fr_id LIMIT 1"
+    )
+    if not rows:
+        return None
+    row = rows[0]
+    return row["pdf"], row["fr_id"], int(row["step"] or 0), row["message"] or ""
+
+
+def fr_statuses(pdf_name: str) -> list[dict]:
+    rows = _query(
+        "SELECT fr_id, step, phase, message, updated_at FROM frs WHERE pdf = ?",
+        (pdf_stem(pdf_name),),
+    )
+    return [dict(row) for row in rows]
+
+
+def step_usage(pdf_name: str | None = None) -> list[dict]:
+    """Per (step, model): step files, FRs with an error, input/output tokens."""
+    where, params = ("WHERE pdf = ?", (pdf_stem(pdf_name),)) if pdf_name else ("", ())
+    rows = _query(
+        "SELECT step, COALESCE(model, '') AS model, COUNT(*) AS runs, "
+        "SUM(error IS NOT NULL) AS errors, "
+        "COALESCE(SUM(input_tokens), 0) AS input_tokens, "
+        "COALESCE(SUM(output_tokens), 0) AS output_tokens "
+        f"FROM steps {where} GROUP BY step, model ORDER BY step, model",
+        params,
+    )
+    return [dict(row) for row in rows]
+
+
+def resume_point(pdf_name: str, fr_id: str) -> int:
+    """Where a cancelled FR resumes: its last step completed without error (0 = start over).
+
+    FRs that were not cancelled always start over.
+    """
+    rows = _query("SELECT phase FROM frs WHERE pdf = ? AND fr_id = ?", (pdf_stem(pdf_name), fr_id))
+    if not rows or rows[0]["phase"] != "cancelled":
+        return 0
+    return resume_step(completed_steps(pdf_name, fr_id))
+
+
+def completed_steps(pdf_name: str, fr_id: str) -> set[int]:
+    """Steps of an FR whose logbook file has no error."""
+    rows = _query(
+        "SELECT step FROM steps WHERE pdf = ? AND fr_id = ? AND error IS NULL",
+        (pdf_stem(pdf_name), fr_id),
+    )
+    return {row["step"] for row in rows}
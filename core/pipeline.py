@@ -3,27 +3,35 @@
 from pathlib import Path
 import json
 
-import pandas as pd
 from rich import print
 
-from core.batch_graph import run_batch_pipeline
+from core.batch_graph import run_global_batch
 from core.fr_graph import execute_step, run_fr_pipeline
 from core.io import (
     AVAILABLE_STEPS,
     ensure_logbook_dir,
     get_step_prompt,
-    pdf_stem,
+    load_step_file,
+)
+from core.logbook_index import list_fr_ids, step_files
+from core.results import (
+    combine_result_shards,
+    shard_path,
+    write_csv,
+    write_result_shard,
 )
 from core.status import (
     get_batch_status,
     set_fr_status,
     write_pipeline_status,
 )
+from downloads.paths import FINAL_CSV_PATH
 
 __all__ = [
     "AVAILABLE_STEPS",
     "pipeline",
     "run_pipeline_for_pdf",
+    "run_pipeline_for_pdfs",
     "run_single_step",
     "run_steps_range",
     "get_step_prompt",
@@ -40,30 +48,7 @@ def generate_csv_from_final_output(final_output, outputs_dir):
     """Generate CSV file from final output data structure."""
     try:
         csv_path = outputs_dir / "final_output.csv"
-        rows = []
-        document_id = final_output.get("document_id", "Unknown Document")
-
-        for test_suite in final_output.get("test_suite", []):
-            fr_id = test_suite.get("fr_id", "Unknown")
-            for i, test_case in enumerate(test_suite.get("test_cases", []), 1):
-                rows.append({
-                    "Document": document_id,
-                    "FR ID": fr_id,
-                    "Test #": i,
-                    "Test Case": test_case.get("title", ""),
-                    "Precondition": test_case.get("precondition", ""),
-                    "Steps": test_case.get("steps", ""),
-                    "Test Data": test_case.get("test_data", ""),
-                    "Expected Result": test_case.get("expected_result", ""),
-                    "Environment": test_case.get("environment", ""),
-                    "Actual Result": test_case.get("actual_result", ""),
-                    "Status": test_case.get("status", ""),
-                    "Jira Bug Link": test_case.get("jira_bug_link", ""),
-                })
-
-        if rows:
-            df = pd.DataFrame(rows)
-            df.to_csv(csv_path, index=False, encoding="utf-8")
+        if write_csv(final_output):
             return True, f"CSV saved to: {csv_path}"
         return False, "No test cases found to export"
     except Exception as e:
@@ -105,130 +90,107 @@ def run_steps_range(pdf_name, fr, start_step, end_step):
 
 
 def list_output_files(pdf_name, fr_id=None):
-    base_dir = Path(f"data/pdf_logbook/{pdf_stem(pdf_name)}")
-    if not base_dir.exists():
-        return []
-
-    step_files = []
-    if fr_id:
-        fr_dir = base_dir / fr_id
-        if fr_dir.exists():
-            for step_num in AVAILABLE_STEPS:
-                step_file = fr_dir / f"step{step_num}.json"
-                if step_file.exists():
-                    step_files.append(step_file)
-    else:
-        for fr_dir in base_dir.iterdir():
-            if fr_dir.is_dir() and fr_dir.name.startswith("FR-"):
-                for step_num in AVAILABLE_STEPS:
-                    step_file = fr_dir / f"step{step_num}.json"
-                    if step_file.exists():
-                        step_files.append(step_file)
-    return step_files
+    return [path for _pdf, _fr, _step, path in step_files(pdf_name, fr_id)]
 
 
 def get_fr_directories(pdf_name):
-    base_dir = Path(f"data/pdf_logbook/{pdf_stem(pdf_name)}")
-    if not base_dir.exists():
-        return []
-    return sorted(
-        fr_dir.name
-        for fr_dir in base_dir.iterdir()
-        if fr_dir.is_dir() and fr_dir.name.startswith("FR-")
-    )
+    return list_fr_ids(pdf_name)
 
 
 def run_pipeline_for_pdf(pdf_name, frs_list):
     """Run all FRs for a PDF in parallel, then print a summary."""
-    print(f"\n=== Starting pipeline for {pdf_name} ===")
-    print(f"Found {len(frs_list)} functional requirements")
-    fr_ids = [list(fr.keys())[0] for fr in frs_list]
+    run_pipeline_for_pdfs({pdf_name: frs_list})
+
+
+def run_pipeline_for_pdfs(selected_tasks, cancel=None):
+    """Run every selected PDF's FRs as one batch, then print per-PDF summaries.
 
-    run_batch_pipeline(pdf_name, frs_list)
+    `cancel` (core.cancel.CancelToken) stops the batch early; see run_global_batch.
+    """
+    for pdf_name, frs_list in selected_tasks.items():
+        print(f"\n=== Starting pipeline for {pdf_name} ===")
+        print(f"Found {len(frs_list)} functional requirements")
 
-    for fr_id in fr_ids:
-        files = list_output_files(pdf_name, fr_id)
-        print(f"{fr_id}: {len(files)} step files generated")
+    run_global_batch(selected_tasks, cancel)
 
-    summary = get_batch_status(pdf_name, fr_ids)
-    if summary:
-        write_pipeline_status(summary)
+    for pdf_name, frs_list in selected_tasks.items():
+        fr_ids = [list(fr.keys())[0] for fr in frs_list]
+        for fr_id in fr_ids:
+            files = list_output_files(pdf_name, fr_id)
+            print(f"{pdf_name} {fr_id}: {len(files)} step files generated")
+
+        summary = get_batch_status(pdf_name, fr_ids)
+        if summary:
+            write_pipeline_status(f"{pdf_name}: {summary}")
 
 
 def combine_all_step8_files():
-    """Scan logbooks and combine step8 outputs into final_output.json + CSV."""
+    """Bring outputs/final_output.json + CSV up to date from per-FR result shards.
+
+    Shards are written as each FR reaches step 8 (core.results), so this only
+    backfills step8 logbooks that have no shard yet and folds in changed shards.
+    """
     from utils.mockData import fakeFinalOutput
 
     outputs_dir = Path("outputs")
     outputs_dir.mkdir(exist_ok=True)
 
-    logbook_base = Path("data/pdf_logbook")
-    step8_files = []
-
-    if logbook_base.exists():
-        for pdf_dir in logbook_base.iterdir():
-            if pdf_dir.is_dir() and pdf_dir.name != ".status":
-                for fr_dir in pdf_dir.iterdir():
-                    if fr_dir.is_dir() and fr_dir.name.startswith("FR-"):
-                        step8_file = fr_dir / "step8.json"
-                        if step8_file.exists():
-                            step8_files.append({
-                                "pdf_name": pdf_dir.name,
-                                "fr_id": fr_dir.name,
-                                "file_path": step8_file,
-                            })
-
-    print(f"Found {len(step8_files)} step8 files to combine:")
-    for file_info in step8_files:
-        print(f"  {file_info['pdf_name']} - {file_info['fr_id']}")
-
-    if step8_files:
-        test_suites = []
-        for file_info in step8_files:
-            processed = process_step8_file(file_info["file_path"])
-            if processed:
-                test_suites.append(processed)
-        if test_suites:
-            pdf_name = step8_files[0]["pdf_name"]
-            final_output = create_final_output_structure(test_suites, pdf_name)
-        else:
-            print("Warning: No valid step8 data found, using fallback fake data")
-            final_output = fakeFinalOutput
-    else:
-        print("Warning: No step8 files found, using fallback fake data")
-        final_output = fakeFinalOutput
+    backfilled = backfill_result_shards()
+    summary = combine_result_shards()
+    fr_count = summary["suites"] if summary else 0
+    print(f"Combined {fr_count} FR result shard(s) ({backfilled} backfilled from step8 logbooks)")
 
     final_output_path = outputs_dir / "final_output.json"
-    with open(final_output_path, "w", encoding="utf-8") as f:
-        json.dump(final_output, f, indent=2)
+    if summary is None:
+        print("Warning: No step8 files found, using fallback fake data")
+        final_output = fakeFinalOutput
+        with open(final_output_path, "w", encoding="utf-8") as f:
+            json.dump(final_output, f, indent=2)
+    elif backfilled or not FINAL_CSV_PATH.exists():
+        final_output = json.loads(final_output_path.read_text(encoding="utf-8"))
 
     print(f"\nFinal output saved to: {final_output_path}")
 
-    csv_success, csv_message = generate_csv_from_final_output(final_output, outputs_dir)
-    if csv_success:
-        print(f"CSV export: {csv_message}")
-    else:
-        print(f"CSV export failed: {csv_message}")
+    if backfilled or not FINAL_CSV_PATH.exists():
+        csv_success, csv_message = generate_csv_from_final_output(final_output, outputs_dir)
+        if csv_success:
+            print(f"CSV export: {csv_message}")
+        else:
+            print(f"CSV export failed: {csv_message}")
 
     from core.status import set_app_status
 
     write_pipeline_status(
-        f"Final results ready! Generated test cases from {len(step8_files)} FRs"
+        f"Final results ready! Generated test cases from {fr_count} FRs"
     )
     set_app_status(
         "idle",
         "Results ready for download",
-        f"Combined {len(step8_files)} FR(s) into outputs/final_output.json + CSV",
+        f"Combined {fr_count} FR(s) into outputs/final_output.json + CSV",
         active=False,
         simple="📥 Results ready for download",
     )
     return final_output_path
 
 
+def backfill_result_shards() -> int:
+    """Create result shards for step8 logbooks written before shards existed."""
+    count = 0
+    for pdf, fr_id, _step, step8_file in step_files(step=8):
+        if shard_path(pdf, fr_id).exists():
+            continue
+        processed = process_step8_file(step8_file)
+        if processed:
+            write_result_shard(pdf, fr_id, processed)
+            count += 1
+    return count
+
+
 def process_step8_file(file_path):
     try:
-        with open(file_path, encoding="utf-8") as f:
-            step8_data = json.load(f)
+        step8_data = load_step_file(Path(file_path), resolve=False)
+        if step8_data is None:
+            raise json.JSONDecodeError("unreadable step file", str(file_path), 0)
 
         if step8_data.get("llm_response"):
             llm_response = step8_data["llm_response"]
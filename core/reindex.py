@@ -0,0 +1,25 @@
+"""Rebuild the logbook index (core.logbook_index) from data/pdf_logbook.
+
+    python -m core.reindex           # rebuild
+    python -m core.reindex --stats   # only show what is indexed
+"""
+
+import argparse
+
+from core.logbook_index import INDEX_PATH, list_fr_ids, rebuild, step_files
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m core.reindex", description=__doc__.splitlines()[0])
+    parser.add_argument("--stats", action="store_true", help="print index contents without rebuilding")
+    args = parser.parse_args(argv)
+
+    if not args.stats:
+        fr_count, step_count = rebuild()
+        print(f"Indexed {step_count} step file(s) across {fr_count} FR(s) into {INDEX_PATH}")
+        return
+    print(f"{INDEX_PATH}: {len(step_files())} step file(s), {len(list_fr_ids())} FR id(s)")
+
+
+if __name__ == "__main__":
+    main()
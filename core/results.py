@@ -0,0 +1,265 @@
+"""Incremental results: per-FR shards written at step 8, combined lazily.
+
+Each FR that finishes step 8 gets ``outputs/shards/<pdf>/<FR>.json`` and its
+test cases are appended to ``outputs/final_output.csv`` straight away, so
+results are downloadable mid-run. ``final_output.json`` is regenerated from
+shards on demand, re-reading only shards that changed since the last combine.
+
+Queue workers (core.worker) write shards from separate processes, so writes
+to the shards, the manifest and the CSV hold ``results_lock`` (a thread lock
+plus an OS file lock on ``outputs/shards/.lock``).
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.io import pdf_stem
+from core.results_index import index_suite, remove_suites
+from downloads.paths import FINAL_CSV_PATH, FINAL_JSON_PATH, SHARDS_DIR, ensure_outputs_dir
+
+MANIFEST_PATH = SHARDS_DIR / "manifest.json"
+VERSION_PATH = SHARDS_DIR / ".version"
+LOCK_PATH = SHARDS_DIR / ".lock"
+
+CSV_COLUMNS = [
+    "Document",
+    "FR ID",
+    "Test #",
+    "Test Case",
+    "Precondition",
+    "Steps",
+    "Test Data",
+    "Expected Result",
+    "Environment",
+    "Actual Result",
+    "Status",
+    "Jira Bug Link",
+]
+
+_lock = threading.Lock()
+
+try:
+    import fcntl
+
+    def _lock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(f) -> None:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                time.sleep(0.1)  # LK_LOCK gives up after ~10s; keep waiting
+
+    def _unlock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def results_lock():
+    """Exclusive access to the shards, manifest and CSV, across threads and processes."""
+    with _lock:
+        LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_PATH, "a+b") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def shard_path(pdf_name: str, fr_id: str) -> Path:
+    return SHARDS_DIR / pdf_stem(pdf_name) / f"{fr_id}.json"
+
+
+def suite_csv_rows(suite: dict, document: str | None = None) -> list[dict]:
+    document = suite.get("document", document or "Unknown Document")
+    fr_id = suite.get("fr_id", "Unknown")
+    rows = []
+    for i, test_case in enumerate(suite.get("test_cases", []), 1):
+        rows.append({
+            "Document": document,
+            "FR ID": fr_id,
+            "Test #": i,
+            "Test Case": test_case.get("title", ""),
+            "Precondition": test_case.get("precondition", ""),
+            "Steps": test_case.get("steps", ""),
+            "Test Data": test_case.get("test_data", ""),
+            "Expected Result": test_case.get("expected_result", ""),
+            "Environment": test_case.get("environment", ""),
+            "Actual Result": test_case.get("actual_result", ""),
+            "Status": test_case.get("status", ""),
+            "Jira Bug Link": test_case.get("jira_bug_link", ""),
+        })
+    return rows
+
+
+def results_version() -> int:
+    """Changes whenever a shard is written (cheap poll for the UI)."""
+    try:
+        return VERSION_PATH.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def write_result_shard(pdf_name: str, fr_id: str, llm_response: dict) -> Path:
+    """Persist one FR's step-8 test cases and stream its rows into the CSV."""
+    suite = {
+        "document": f"{pdf_stem(pdf_name)}.pdf",
+        "fr_id": fr_id,
+        "test_cases": llm_response.get("test_cases", []),
+    }
+    path = shard_path(pdf_name, fr_id)
+    with results_lock():
+        rerun = path.exists()
+        _atomic_write_text(path, json.dumps(suite, ensure_ascii=False))
+        if rerun:
+            # Rows for this FR are already in the CSV; rebuild it from JSON later
+            FINAL_CSV_PATH.unlink(missing_ok=True)
+        else:
+            _append_csv_rows(suite_csv_rows(suite))
+        VERSION_PATH.write_text(str(os.getpid()), encoding="utf-8")
+        index_suite(suite)
+    return path
+
+
+def _append_csv_rows(rows: list[dict]) -> None:
+    if not rows:
+        return
+    ensure_outputs_dir()
+    new_file = not FINAL_CSV_PATH.exists() or FINAL_CSV_PATH.stat().st_size == 0
+    with open(FINAL_CSV_PATH, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_csv(final_output: dict) -> int:
+    """Rewrite final_output.csv from a combined final output; returns row count."""
+    ensure_outputs_dir()
+    document_id = final_output.get("document_id", "Unknown Document")
+    rows = []
+    for suite in final_output.get("test_suite", []):
+        rows.extend(suite_csv_rows(suite, document_id))
+    with results_lock():
+        tmp = FINAL_CSV_PATH.with_name(f".{FINAL_CSV_PATH.name}.tmp")
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, FINAL_CSV_PATH)
+    return len(rows)
+
+
+def list_result_shards() -> list[Path]:
+    if not SHARDS_DIR.is_dir():
+        return []
+    return sorted(SHARDS_DIR.glob("*/*.json"))
+
+
+def _load_json(path: Path, default):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def _manifest_mtime(entry) -> int | None:
+    # Entries are [mtime_ns, test case count]; older manifests stored the mtime only
+    return entry[0] if isinstance(entry, list) else None
+
+
+def _summary(manifest: dict) -> dict:
+    counts = [entry[1] for entry in manifest.values() if isinstance(entry, list) and entry[1] is not None]
+    return {"suites": len(counts), "test_cases": sum(counts)}
+
+
+def combine_result_shards() -> dict | None:
+    """Bring final_output.json up to date with the shards; None if there are none.
+
+    Returns {"suites": n, "test_cases": n} for the combined output. The
+    manifest records each shard's mtime and test case count, so when no shard
+    changed neither final_output.json nor any shard is read. Otherwise only
+    changed shards are parsed; suites of other FRs are kept from the previous
+    final_output.json.
+    """
+    shards = list_result_shards()
+    if not shards:
+        return None
+    mtimes = {f"{path.parent.name}/{path.stem}": path.stat().st_mtime_ns for path in shards}
+
+    with results_lock():
+        manifest: dict = _load_json(MANIFEST_PATH, {})
+        if (
+            manifest.keys() == mtimes.keys()
+            and all(_manifest_mtime(manifest[key]) == mtime for key, mtime in mtimes.items())
+            and FINAL_JSON_PATH.exists()
+        ):
+            return _summary(manifest)
+
+        final_output = _load_json(FINAL_JSON_PATH, None) if manifest else None
+        if not isinstance(final_output, dict):
+            final_output, manifest = {"test_suite": []}, {}
+
+        suites = final_output.get("test_suite", [])
+        index = {(s.get("document"), s.get("fr_id")): i for i, s in enumerate(suites)}
+        for path in shards:
+            key = f"{path.parent.name}/{path.stem}"
+            mtime = mtimes[key]
+            if _manifest_mtime(manifest.get(key)) == mtime:
+                continue
+            suite = _load_json(path, None)
+            if not isinstance(suite, dict):
+                # Recorded (without a count) so it is not re-read until it changes
+                manifest[key] = [mtime, None]
+                continue
+            suite_key = (suite.get("document"), suite.get("fr_id"))
+            if suite_key in index:
+                suites[index[suite_key]] = suite
+            else:
+                index[suite_key] = len(suites)
+                suites.append(suite)
+            index_suite(suite)
+            manifest[key] = [mtime, len(suite.get("test_cases") or [])]
+
+        removed = set(manifest) - set(mtimes)
+        if removed:
+            gone = {
+                (f"{key.split('/', 1)[0]}.pdf", key.split("/", 1)[1]) for key in removed
+            }
+            suites = [s for s in suites if (s.get("document"), s.get("fr_id")) not in gone]
+            remove_suites(gone)
+            for key in removed:
+                manifest.pop(key, None)
+
+        first_document = suites[0].get("document") if suites else "Unknown Document"
+        final_output = {
+            "document_id": final_output.get("document_id") or first_document,
+            "test_suite": suites,
+        }
+        ensure_outputs_dir()
+        _atomic_write_text(FINAL_JSON_PATH, json.dumps(final_output, indent=2, ensure_ascii=False))
+        _atomic_write_text(MANIFEST_PATH, json.dumps(manifest))
+        return _summary(manifest)
@@ -0,0 +1,274 @@
+"""Queryable test-case table behind the results view (SQLite).
+
+``core.results.write_result_shard`` / ``combine_result_shards`` keep it in
+step with the shards, so the UI can ask for one sorted, filtered page and for
+summary counts without reading final_output.json. Before any shard exists
+(e.g. an older final_output.json or the fallback data) it mirrors
+final_output.json instead, re-indexed whenever that file changes.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+from downloads.paths import FINAL_JSON_PATH, SHARDS_DIR
+
+RESULTS_DB = SHARDS_DIR / "results.sqlite"
+
+# Display column -> table column, in results-table order
+COLUMNS = {
+    "Document": "document",
+    "FR ID": "fr_id",
+    "Test #": "test_no",
+    "Test Case": "title",
+    "Precondition": "precondition",
+    "Steps": "steps",
+    "Test Data": "test_data",
+    "Expected Result": "expected_result",
+    "Environment": "environment",
+    "Actual Result": "actual_result",
+    "Status": "status",
+    "Jira Bug Link": "jira_bug_link",
+}
+_TEST_CASE_KEYS = [
+    "title", "precondition", "steps", "test_data", "expected_result",
+    "environment", "actual_result", "status", "jira_bug_link",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_cases (
+    document TEXT NOT NULL,
+    fr_id TEXT NOT NULL,
+    test_no INTEGER NOT NULL,
+    title TEXT, precondition TEXT, steps TEXT, test_data TEXT,
+    expected_result TEXT, environment TEXT, actual_result TEXT,
+    status TEXT, jira_bug_link TEXT,
+    PRIMARY KEY (document, fr_id, test_no)
+);
+CREATE INDEX IF NOT EXISTS test_cases_fr ON test_cases (fr_id, test_no);
+CREATE TABLE IF NOT EXISTS suites (
+    document TEXT NOT NULL,
+    fr_id TEXT NOT NULL,
+    test_count INTEGER NOT NULL,
+    PRIMARY KEY (document, fr_id)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS test_cases_fts USING fts5(
+    document, fr_id, title, precondition, steps, test_data, expected_result,
+    content = 'test_cases', content_rowid = 'rowid'
+);
+CREATE TRIGGER IF NOT EXISTS test_cases_fts_insert AFTER INSERT ON test_cases BEGIN
+    INSERT INTO test_cases_fts (rowid, document, fr_id, title, precondition, steps, test_data, expected_result)
+    VALUES (new.rowid, new.document, new.fr_id, new.title, new.precondition, new.steps, new.test_data, new.expected_result);
+END;
+CREATE TRIGGER IF NOT EXISTS test_cases_fts_delete AFTER DELETE ON test_cases BEGIN
+    INSERT INTO test_cases_fts (test_cases_fts, rowid, document, fr_id, title, precondition, steps, test_data, expected_result)
+    VALUES ('delete', old.rowid, old.document, old.fr_id, old.title, old.precondition, old.steps, old.test_data, old.expected_result);
+END;
+"""
+# Bump when the schema changes so existing databases are rebuilt
+SCHEMA_VERSION = "2"
+
+_init_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(RESULTS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # INSERT OR REPLACE must fire the delete trigger that keeps the FTS table in step
+    conn.execute("PRAGMA recursive_triggers = ON")
+    return conn
+
+
+@contextmanager
+def _transaction():
+    conn = _connect()
+    try:
+        conn.executescript(_SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _final_json_mtime() -> str:
+    try:
+        return str(FINAL_JSON_PATH.stat().st_mtime_ns)
+    except OSError:
+        return ""
+
+
+def _put_suite(conn: sqlite3.Connection, suite: dict, document: str) -> None:
+    document = suite.get("document", document)
+    fr_id = suite.get("fr_id", "Unknown")
+    test_cases = suite.get("test_cases", [])
+    conn.execute("DELETE FROM test_cases WHERE document = ? AND fr_id = ?", (document, fr_id))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO test_cases VALUES ({', '.join(['?'] * len(COLUMNS))})",
+        [
+            (document, fr_id, i, *(str(tc.get(key, "") or "") for key in _TEST_CASE_KEYS))
+            for i, tc in enumerate(test_cases, 1)
+        ],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO suites VALUES (?, ?, ?)", (document, fr_id, len(test_cases))
+    )
+
+
+# ============================================
+# WRITERS
+# ============================================
+
+def index_suite(suite: dict) -> None:
+    """Replace one FR's test cases (called whenever its shard is written)."""
+    _ensure_index()
+    with _transaction() as conn:
+        _put_suite(conn, suite, "Unknown Document")
+
+
+def remove_suites(keys: set[tuple[str, str]]) -> None:
+    """Drop (document, fr_id) suites whose shards were deleted."""
+    if not keys:
+        return
+    with _transaction() as conn:
+        for document, fr_id in keys:
+            conn.execute("DELETE FROM test_cases WHERE document = ? AND fr_id = ?", (document, fr_id))
+            conn.execute("DELETE FROM suites WHERE document = ? AND fr_id = ?", (document, fr_id))
+
+
+def reindex() -> int:
+    """Rebuild the table from the shards (or final_output.json); returns suite count."""
+    from core.results import VERSION_PATH, list_result_shards
+
+    document_id = "Unknown Document"
+    if VERSION_PATH.exists():
+        source = "shards"
+        suites = []
+        for path in list_result_shards():
+            try:
+                suites.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, json.JSONDecodeError):
+                continue
+    else:
+        source = "final_json"
+        try:
+            data = json.loads(FINAL_JSON_PATH.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        suites = data.get("test_suite", [])
+        document_id = data.get("document_id", document_id)
+
+    SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+    with _transaction() as conn:
+        conn.execute("DELETE FROM test_cases")
+        conn.execute("DELETE FROM suites")
+        for suite in suites:
+            if isinstance(suite, dict):
+                _put_suite(conn, suite, document_id)
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [
+                ("source", source),
+                ("final_json_mtime", _final_json_mtime()),
+                ("schema", SCHEMA_VERSION),
+            ],
+        )
+    return len(suites)
+
+
+def _ensure_index() -> None:
+    """Build the table if missing or built from another source; without shards,
+    follow final_output.json changes."""
+    from core.results import VERSION_PATH
+
+    with _init_lock:
+        meta = {}
+        if RESULTS_DB.exists():
+            with closing(_connect()) as conn:
+                conn.executescript(_SCHEMA)
+                meta = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM meta")}
+        if meta.get("schema") != SCHEMA_VERSION:
+            # Older layout: start from an empty file so the FTS table is built cleanly
+            RESULTS_DB.unlink(missing_ok=True)
+            stale = True
+        elif VERSION_PATH.exists():
+            stale = meta.get("source") != "shards"
+        else:
+            stale = (
+                meta.get("source") != "final_json"
+                or meta.get("final_json_mtime") != _final_json_mtime()
+            )
+        if stale:
+            reindex()
+
+
+# ============================================
+# QUERIES
+# ============================================
+
+def query_page(
+    page: int = 1,
+    page_size: int = 50,
+    sort_by: str = "FR ID",
+    descending: bool = False,
+    fr_filter: str | None = None,
+    search: str | None = None,
+) -> tuple[list[dict], int]:
+    """One page of test cases as display rows, plus the filtered row count.
+
+    `search` is free text matched against the full-text index (core.search).
+    """
+    from core.search import fts_query
+
+    _ensure_index()
+    column = COLUMNS.get(sort_by, "fr_id")
+    direction = "DESC" if descending else "ASC"
+    clauses, params = [], []
+    if fr_filter:
+        clauses.append("fr_id = ?")
+        params.append(fr_filter)
+    match = fts_query(search) if search else ""
+    if match:
+        clauses.append("rowid IN (SELECT rowid FROM test_cases_fts WHERE test_cases_fts MATCH ?)")
+        params.append(match)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    page = max(1, int(page))
+    page_size = max(1, int(page_size))
+    with closing(_connect()) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM test_cases{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM test_cases{where} "
+            f"ORDER BY {column} {direction}, document, fr_id, test_no LIMIT ? OFFSET ?",
+            (*params, page_size, (page - 1) * page_size),
+        ).fetchall()
+    display = [
+        {name: row[col] for name, col in COLUMNS.items()}
+        for row in rows
+    ]
+    return display, total
+
+
+def summary_stats() -> dict:
+    """Document, FR and test-case counts from the per-suite table."""
+    _ensure_index()
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT COUNT(DISTINCT document) AS documents, COUNT(*) AS frs, "
+            "COALESCE(SUM(test_count), 0) AS test_cases, MIN(document) AS first_document "
+            "FROM suites"
+        ).fetchone()
+    return dict(row)
+
+
+def list_result_frs() -> list[str]:
+    _ensure_index()
+    with closing(_connect()) as conn:
+        rows = conn.execute("SELECT DISTINCT fr_id FROM suites ORDER BY fr_id").fetchall()
+    return [row["fr_id"] for row in rows]
@@ -0,0 +1,192 @@
+"""Columnar results store: one Arrow IPC file per PDF under outputs/store/.
+
+Each partition is rebuilt from that PDF's result shards when the shard
+directory changes, and is read through memory maps so readers only touch
+the record batches they use. Exports (CSV, XLSX, JSON Lines) stream batch by
+batch instead of building a DataFrame of the whole suite. pyarrow is
+optional: without it (or before any shard exists) the same exports stream
+suite by suite from final_output.json.
+"""
+
+import csv
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from core.results import CSV_COLUMNS, suite_csv_rows
+from downloads.paths import FINAL_JSON_PATH, SHARDS_DIR, STORE_DIR
+
+BATCH_ROWS = 1000
+
+_lock = threading.Lock()
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def openpyxl_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def partition_path(pdf: str) -> Path:
+    return STORE_DIR / f"{pdf}.arrow"
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [(name, pa.int64() if name == "Test #" else pa.string()) for name in CSV_COLUMNS]
+    )
+
+
+def _write_partition(shard_dir: Path, part: Path) -> None:
+    import pyarrow as pa
+
+    # Stamp the partition with the shard dir mtime seen *before* reading, so a
+    # shard landing mid-build leaves the partition stale rather than lost
+    source_mtime = shard_dir.stat().st_mtime_ns
+    schema = _schema()
+    part.parent.mkdir(parents=True, exist_ok=True)
+    tmp = part.with_name(f".{part.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        rows: list[dict] = []
+        for shard in sorted(shard_dir.glob("*.json")):
+            try:
+                suite = json.loads(shard.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+            rows.extend(suite_csv_rows(suite))
+            if len(rows) >= BATCH_ROWS:
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                rows = []
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+    os.utime(tmp, ns=(source_mtime, source_mtime))
+    os.replace(tmp, part)
+
+
+def sync_store() -> bool:
+    """Bring partitions up to date with the shards; False if the store is unusable."""
+    if not pyarrow_available() or not SHARDS_DIR.is_dir():
+        return False
+    with _lock:
+        shard_dirs = {d.name: d for d in SHARDS_DIR.iterdir() if d.is_dir()}
+        if not shard_dirs:
+            return False
+        for pdf, shard_dir in shard_dirs.items():
+            part = partition_path(pdf)
+            try:
+                fresh = part.stat().st_mtime_ns == shard_dir.stat().st_mtime_ns
+            except OSError:
+                fresh = False
+            if not fresh:
+                _write_partition(shard_dir, part)
+        for part in STORE_DIR.glob("*.arrow"):
+            if part.stem not in shard_dirs:
+                part.unlink(missing_ok=True)
+    return True
+
+
+def store_version() -> int:
+    """Newest partition mtime (0 if there is no store)."""
+    return max((p.stat().st_mtime_ns for p in STORE_DIR.glob("*.arrow")), default=0)
+
+
+def iter_batches(columns: list[str] | None = None):
+    """Memory-mapped record batches across all partitions (PDF order)."""
+    import pyarrow as pa
+
+    for part in sorted(STORE_DIR.glob("*.arrow")):
+        with pa.memory_map(str(part), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                yield batch.select(columns) if columns else batch
+
+
+def read_table(columns: list[str] | None = None):
+    """All results as one pyarrow Table backed by the memory-mapped partitions."""
+    import pyarrow as pa
+
+    batches = list(iter_batches(columns))
+    if not batches:
+        schema = _schema()
+        return schema.empty_table().select(columns) if columns else schema.empty_table()
+    return pa.Table.from_batches(batches)
+
+
+def iter_row_chunks() -> Iterator[list[dict]]:
+    """Result rows (CSV_COLUMNS keys) in chunks, from the store when possible."""
+    if sync_store():
+        for batch in iter_batches():
+            yield batch.to_pylist()
+        return
+    try:
+        data = json.loads(FINAL_JSON_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return
+    document_id = data.get("document_id", "Unknown Document")
+    for suite in data.get("test_suite", []):
+        rows = suite_csv_rows(suite, document_id)
+        if rows:
+            yield rows
+
+
+# ============================================
+# STREAMING EXPORTS
+# ============================================
+
+def _tmp_for(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def export_csv(path: Path) -> int:
+    tmp, count = _tmp_for(path), 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for rows in iter_row_chunks():
+            writer.writerows(rows)
+            count += len(rows)
+    os.replace(tmp, path)
+    return count
+
+
+def export_jsonl(path: Path) -> int:
+    tmp, count = _tmp_for(path), 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rows in iter_row_chunks():
+            f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    os.replace(tmp, path)
+    return count
+
+
+def export_xlsx(path: Path) -> int:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Test Cases")
+    sheet.append(CSV_COLUMNS)
+    count = 0
+    for rows in iter_row_chunks():
+        for row in rows:
+            sheet.append([row.get(name, "") for name in CSV_COLUMNS])
+        count += len(rows)
+    tmp = _tmp_for(path)
+    workbook.save(tmp)
+    os.replace(tmp, path)
+    return count
@@ -0,0 +1,242 @@
+"""Global step-level work queue for batch runs (replaces per-FR graph fan-out).
+
+Every FR contributes its ready steps (those whose inputs are done, see
+core.steps; one at a time for the default linear pipeline). A fixed pool of
+workers (MAX_PARALLEL_FRS) pulls jobs in policy order:
+
+- ``critical_path``: FR with the most estimated remaining work first
+- ``oldest``: FR admitted first goes first, so finished FRs stream out early
+- ``round_robin``: rotate across PDFs, oldest FR first within each PDF
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+
+from core.cancel import CancelToken
+from core.concurrency import get_max_parallel_frs
+from core.fr_graph import execute_step, mark_cancelled
+from core.log import fr_context, get_logger
+from core.status import append_status_log, set_fr_status
+from core.steps import STEP_NUMBERS, ready_steps, release_outputs, resume_step
+
+POLICIES = ("critical_path", "oldest", "round_robin")
+
+log = get_logger(__name__)
+
+
+@dataclass(eq=False)
+class FRJob:
+    pdf_name: str
+    fr_id: str
+    fr_text: str
+    seq: int
+    step: int = 0  # last step with all steps before it completed (resume point)
+    step_outputs: dict = field(default_factory=dict)
+    error: str | None = None
+    done: set[int] = field(default_factory=set)
+    running: set[int] = field(default_factory=set)
+
+    def finished(self) -> bool:
+        return not self.running and (self.error is not None or len(self.done) == len(STEP_NUMBERS))
+
+
+class StepScheduler:
+    def __init__(
+        self,
+        policy: str = "oldest",
+        workers: int | None = None,
+        cancel: CancelToken | None = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduler policy: {policy} (expected one of {POLICIES})")
+        self.policy = policy
+        self.workers = workers or get_max_parallel_frs()
+        self.cancel = cancel
+        self.completed: list[FRJob] = []
+        self._cond = threading.Condition()
+        self._lanes: dict[str, list] = {}
+        self._lane_order: list[str] = []
+        self._rr_index = 0
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._tiebreak = itertools.count()
+        self._durations: dict[int, tuple[float, int]] = {}
+
+    # ---- queue ----
+
+    def add_fr(self, pdf_name: str, fr_id: str, fr_text: str, start_step: int = 0) -> None:
+        """Queue an FR; `start_step` = steps already completed (resume)."""
+        job = FRJob(pdf_name, fr_id, fr_text, seq=next(self._seq), step=start_step)
+        job.done = {n for n in STEP_NUMBERS if n <= start_step}
+        with self._cond:
+            self._push_ready(job)
+
+    def _mean_duration(self, step: int) -> float:
+        total, count = self._durations.get(step, (0.0, 0))
+        return total / count if count else 1.0
+
+    def _priority(self, job: FRJob, step: int) -> tuple:
+        if self.policy == "critical_path":
+            remaining = sum(
+                self._mean_duration(n) for n in STEP_NUMBERS if n not in job.done
+            )
+            return (-remaining, job.seq, step)
+        return (job.seq, step)
+
+    def _waiting(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def _push_ready(self, job: FRJob) -> None:
+        """Queue every step of `job` whose inputs are done and that is not queued yet."""
+        lane = job.pdf_name if self.policy == "round_robin" else ""
+        if lane not in self._lanes:
+            self._lanes[lane] = []
+            self._lane_order.append(lane)
+        for step in ready_steps(job.done, job.running):
+            job.running.add(step)  # queued or in flight
+            heapq.heappush(
+                self._lanes[lane], (*self._priority(job, step), next(self._tiebreak), job, step)
+            )
+        self._cond.notify_all()
+
+    def _pop(self) -> tuple[FRJob, int] | None:
+        count = len(self._lane_order)
+        for offset in range(count):
+            index = (self._rr_index + offset) % count
+            lane = self._lanes[self._lane_order[index]]
+            if lane:
+                self._rr_index = index + 1
+                *_, job, step = heapq.heappop(lane)
+                return job, step
+        return None
+
+    # ---- workers ----
+
+    def _cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.cancelled
+
+    def _wake_all(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self) -> list[FRJob]:
+        """Process every queued FR to completion (or error); blocks until done.
+
+        On cancel, no further steps are dispatched; steps in flight finish or
+        abort, and every FR still queued is marked cancelled.
+        """
+        append_status_log(
+            f"Queue: {self._waiting()} FR(s), policy={self.policy}, workers={self.workers}"
+        )
+        unregister = self.cancel.on_cancel(self._wake_all) if self.cancel else (lambda: None)
+        threads = [
+            threading.Thread(target=self._worker, name=f"dect-step-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        unregister()
+
+        with self._cond:
+            queued = list({id(job): job for lane in self._lanes.values() for *_, job, _ in lane}.values())
+            for lane in self._lanes.values():
+                lane.clear()
+        leftover = [job for job in queued if job.error is None]
+        for job in queued:
+            job.running.clear()
+            if job.error is None:
+                mark_cancelled(job.pdf_name, job.fr_id, job.step)
+                job.error = "cancelled"
+            self._finish_if_done(job)
+        if leftover:
+            append_status_log(f"Queue: cancelled — {len(leftover)} FR(s) not dispatched")
+        return self.completed
+
+    def _next_job(self) -> tuple[FRJob, int] | None:
+        with self._cond:
+            while True:
+                if self._cancelled():
+                    return None
+                entry = self._pop()
+                if entry is not None:
+                    job, step = entry
+                    if job.error is not None:
+                        # A sibling step of this FR failed after this one was queued
+                        job.running.discard(step)
+                        self._finish_if_done(job)
+                        continue
+                    self._in_flight += 1
+                    waiting = self._waiting()
+                    break
+                if self._in_flight == 0:
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait()
+        append_status_log(
+            f"Queue: {job.fr_id} step {step} dispatched "
+            f"({self.policy}, {waiting} waiting)"
+        )
+        return job, step
+
+    def _finish_if_done(self, job: FRJob) -> None:
+        if job.finished() and job not in self.completed:
+            # Outputs are in the logbook; finished FRs keep no step data in memory
+            job.step_outputs.clear()
+            self.completed.append(job)
+
+    def _worker(self) -> None:
+        while True:
+            entry = self._next_job()
+            if entry is None:
+                return
+            job, step = entry
+            start = time.time()
+            try:
+                # job.done is only read (membership) while other steps complete
+                result = execute_step(
+                    job.pdf_name, job.fr_id, job.fr_text, step, self.cancel, job.done
+                )
+            except Exception as e:
+                with fr_context(job.pdf_name, job.fr_id, step):
+                    log.exception("Scheduler: step %d raised: %s", step, e)
+                set_fr_status(job.pdf_name, job.fr_id, step, "error", str(e))
+                result = {"error": str(e), "current_step": step}
+            elapsed = time.time() - start
+
+            with self._cond:
+                self._in_flight -= 1
+                total, count = self._durations.get(step, (0.0, 0))
+                self._durations[step] = (total + elapsed, count + 1)
+                job.running.discard(step)
+                job.step_outputs.update(result.get("step_outputs", {}))
+                if result.get("error"):
+                    job.error = job.error or result["error"]
+                else:
+                    job.done.add(step)
+                    release_outputs(job.step_outputs, job.done)
+                    job.step = resume_step(job.done)
+                    if job.error is None:
+                        self._push_ready(job)
+                self._finish_if_done(job)
+                self._cond.notify_all()
+
+
+def run_scheduled_batch(
+    tasks: dict[str, list[dict[str, str]]],
+    policy: str = "oldest",
+    cancel: CancelToken | None = None,
+    start_steps: dict[str, dict[str, int]] | None = None,
+) -> list[FRJob]:
+    """Run the FRs of all given PDFs (pdf_name -> FR list) through one scheduler."""
+    scheduler = StepScheduler(policy, cancel=cancel)
+    start_steps = start_steps or {}
+    for pdf_name, frs_list in tasks.items():
+        for fr in frs_list:
+            fr_id = list(fr.keys())[0]
+            scheduler.add_fr(pdf_name, fr_id, fr[fr_id], start_steps.get(pdf_name, {}).get(fr_id, 0))
+    return scheduler.run()
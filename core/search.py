@@ -0,0 +1,117 @@
+"""Full-text search (SQLite FTS5) over requirements and generated test cases.
+
+Requirements from ``data/extractedFR/*.json`` are indexed in
+``data/search.sqlite`` and re-indexed per file when its mtime changes.
+Test cases are searched through the FTS table that ``core.results_index``
+keeps in step with the results table by triggers, so new results are
+searchable as soon as their shard is written.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+SEARCH_DB = Path("data/search.sqlite")
+EXTRACTED_FR_DIR = Path("data/extractedFR")
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5(
+    doc UNINDEXED, fr_id, text, tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS requirement_sources (doc TEXT PRIMARY KEY, mtime INTEGER NOT NULL);
+"""
+
+_lock = threading.Lock()
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, the last
+    one as a prefix (so results narrow while typing)."""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _connect() -> sqlite3.Connection:
+    SEARCH_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SEARCH_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def sync_requirements() -> int:
+    """Re-index extractedFR files that changed since last time; returns files indexed."""
+    files = {p.stem: p for p in EXTRACTED_FR_DIR.glob("*.json")} if EXTRACTED_FR_DIR.is_dir() else {}
+    indexed = 0
+    with _lock, closing(_connect()) as conn:
+        known = {row["doc"]: row["mtime"] for row in conn.execute("SELECT doc, mtime FROM requirement_sources")}
+        current = {}
+        for doc, path in files.items():
+            try:
+                current[doc] = path.stat().st_mtime_ns
+            except OSError:
+                continue
+        changed = [doc for doc, mtime in current.items() if known.get(doc) != mtime]
+        removed = [doc for doc in known if doc not in current]
+        if not changed and not removed:
+            return 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc in removed + changed:
+                conn.execute("DELETE FROM requirements_fts WHERE doc = ?", (doc,))
+                conn.execute("DELETE FROM requirement_sources WHERE doc = ?", (doc,))
+            for doc in changed:
+                try:
+                    data = json.loads(files[doc].read_text(encoding="utf-8"))
+                except (OSError, json.JSONDecodeError):
+                    continue
+                conn.executemany(
+                    "INSERT INTO requirements_fts (doc, fr_id, text) VALUES (?, ?, ?)",
+                    [
+                        (doc, str(req.get("id", "")), str(req.get("text", "")))
+                        for req in data.get("requirements", [])
+                        if isinstance(req, dict)
+                    ],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO requirement_sources VALUES (?, ?)", (doc, current[doc])
+                )
+                indexed += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return indexed
+
+
+def search_requirements(query: str, doc: str | None = None, limit: int = 500) -> list[dict]:
+    """Requirements matching `query` (best match first): doc, fr_id, text."""
+    match = fts_query(query)
+    if not match:
+        return []
+    sync_requirements()
+    where, params = "requirements_fts MATCH ?", [match]
+    if doc:
+        where += " AND doc = ?"
+        params.append(doc)
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f"SELECT doc, fr_id, text FROM requirements_fts WHERE {where} ORDER BY rank LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def search_test_cases(query: str, page: int = 1, page_size: int = 50, fr_filter: str | None = None):
+    """One page of test cases matching `query`; see core.results_index.query_page."""
+    from core.results_index import query_page
+
+    return query_page(page, page_size, fr_filter=fr_filter, search=query)
@@ -1,15 +1,26 @@
-from .pipeline import run_pipeline_for_pdf, combine_all_step8_files
+from .pipeline import run_pipeline_for_pdfs, combine_all_step8_files
 import json
+import signal
+import sys
 
+from config import PIPELINE_EXECUTOR, QUEUE_LOCAL_WORKERS
+from core.cancel import CANCELLED_EXIT_CODE, CancelToken
+from core.log import configure_logging
 
-def main():
+
+def main(cancel: CancelToken | None = None):
     with open("data/selected_tasks.json", encoding="utf-8") as f:
         selected_tasks = json.load(f)
 
-    for pdf_name in selected_tasks:
-        frs_list = selected_tasks[pdf_name]
-        run_pipeline_for_pdf(pdf_name, frs_list)
+    if PIPELINE_EXECUTOR == "queue":
+        from core.worker import run_tasks_via_queue
+
+        run_tasks_via_queue(selected_tasks, QUEUE_LOCAL_WORKERS, cancel=cancel)
+    else:
+        # One global batch across PDFs so no concurrency slot idles between documents
+        run_pipeline_for_pdfs(selected_tasks, cancel=cancel)
 
+    # Also after a cancel: finished FRs are combined into a partial output
     print("\n" + "=" * 50)
     print("COMBINING ALL STEP8 FILES INTO FINAL OUTPUT")
     print("=" * 50)
@@ -18,4 +29,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    configure_logging()
+    # SIGTERM (Stop in the UI) cancels cooperatively instead of killing mid-write
+    token = CancelToken()
+    signal.signal(signal.SIGTERM, lambda *_: token.cancel("Stopped by user"))
+    main(token)
+    if token.cancelled:
+        sys.exit(CANCELLED_EXIT_CODE)
@@ -0,0 +1,137 @@
+"""Cold-start benchmark for the two entry points (UI and pipeline subprocess).
+
+Each run starts a fresh interpreter with ``-X importtime`` and parses its
+report, so the numbers are import cost only (no server, no LLM calls).
+Results are appended to data/startup_bench.jsonl to track regressions.
+
+    python -m core.startup_bench                 # 3 runs per entry point
+    python -m core.startup_bench --runs 5 --top 15
+    python -m core.startup_bench --budget-ms 4000  # exit 1 if slower
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+HISTORY_PATH = Path("data/startup_bench.jsonl")
+
+# Entry point -> code the real process runs before doing any work
+ENTRY_POINTS = {
+    "app": "import app",
+    "pipeline": "import core.simple_run",
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for each ``import time:`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def measure(code: str) -> dict:
+    """One cold interpreter run: wall time, total import time, per-package self time."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    packages: dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    return {
+        "wall_ms": wall_ms,
+        "import_ms": sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000,
+        "packages_ms": {name: us / 1000 for name, us in packages.items()},
+    }
+
+
+def bench(entry: str, runs: int, top: int) -> dict:
+    samples = [measure(ENTRY_POINTS[entry]) for _ in range(runs)]
+    packages: dict[str, list[float]] = defaultdict(list)
+    for sample in samples:
+        for name, ms in sample["packages_ms"].items():
+            packages[name].append(ms)
+    heaviest = sorted(
+        ((name, statistics.median(values)) for name, values in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "entry": entry,
+        "runs": runs,
+        "wall_ms": round(statistics.median(s["wall_ms"] for s in samples), 1),
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "top_packages_ms": {name: round(ms, 1) for name, ms in heaviest},
+    }
+
+
+def _previous(entry: str) -> dict | None:
+    if not HISTORY_PATH.exists():
+        return None
+    last = None
+    for line in HISTORY_PATH.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("entry") == entry:
+            last = record
+    return last
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.startup_bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="cold runs per entry point (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to list")
+    parser.add_argument("--entry", choices=sorted(ENTRY_POINTS), action="append", help="only this entry point")
+    parser.add_argument("--budget-ms", type=float, help="fail if any entry point imports slower than this")
+    parser.add_argument("--no-save", action="store_true", help="do not append to the history file")
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for entry in args.entry or list(ENTRY_POINTS):
+        previous = _previous(entry)
+        record = bench(entry, max(1, args.runs), args.top)
+        delta = ""
+        if previous:
+            delta = f" ({record['import_ms'] - previous['import_ms']:+.0f} ms vs {previous['at'][:19]})"
+        print(f"{entry}: imports {record['import_ms']:.0f} ms, wall {record['wall_ms']:.0f} ms{delta}")
+        for name, ms in record["top_packages_ms"].items():
+            print(f"  {ms:8.1f} ms  {name}")
+        if args.budget_ms is not None and record["import_ms"] > args.budget_ms:
+            print(f"  over budget ({args.budget_ms:.0f} ms)")
+            over_budget = True
+        if not args.no_save:
+            HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
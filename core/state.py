@@ -2,16 +2,50 @@ import operator
 from typing import Annotated, Any, NotRequired, TypedDict
 
 
+def _merge_step_outputs(left: dict | None, right: dict | None) -> dict:
+    # A None value drops that step's output (core.steps.release_outputs)
+    merged = {**(left or {}), **(right or {})}
+    return {step: output for step, output in merged.items() if output is not None}
+
+
+def _max_step(left: int | None, right: int | None) -> int:
+    return max(left or 0, right or 0)
+
+
+def _first_error(left: str | None, right: str | None) -> str | None:
+    return left or right
+
+
 class FRState(TypedDict):
     pdf_name: str
     fr_id: str
     fr_text: str
-    step_outputs: NotRequired[dict[int, dict[str, Any]]]
-    current_step: NotRequired[int]
-    error: NotRequired[str | None]
+    # Reducers: independent steps of the step DAG (core.steps) update these concurrently
+    step_outputs: NotRequired[Annotated[dict[int, dict[str, Any]], _merge_step_outputs]]
+    current_step: NotRequired[Annotated[int, _max_step]]
+    error: NotRequired[Annotated[str | None, _first_error]]
+    # Finished steps; outputs of steps whose consumers all finished are dropped
+    done_steps: NotRequired[Annotated[list[int], operator.add]]
+    # Steps up to here are already done (resume of a cancelled FR)
+    start_step: NotRequired[int]
 
 
 class BatchState(TypedDict):
-    pdf_name: str
-    frs: list[dict[str, str]]
+    # pdf_name -> [{fr_id: fr_text}, ...]; all PDFs share one batch
+    tasks: dict[str, list[dict[str, str]]]
     completed_frs: NotRequired[Annotated[list[str], operator.add]]
+    # pdf_name -> fr_id -> last completed step of a cancelled FR (resume point)
+    start_steps: NotRequired[dict[str, dict[str, int]]]
+
+
+class StepPartsState(TypedDict):
+    # One list-shaped step split into per-atomic-block parts (fr_graph fan-out)
+    step_number: int
+    fr_text: str
+    step_prompt: dict[str, Any]
+    parts: list[dict[str, Any]]
+    part_outputs: NotRequired[Annotated[list[tuple[int, dict[str, Any]]], operator.add]]
+    merged: NotRequired[dict[str, Any]]
+    # Set on each Send: the part this sub-call handles
+    part_index: NotRequired[int]
+    part_input: NotRequired[dict[str, Any]]
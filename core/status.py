@@ -1,10 +1,12 @@
 import json
 import re
+import sys
 import threading
 from datetime import datetime, timezone
 from pathlib import Path
 
 from core.io import pdf_stem
+from core.logbook_index import fr_statuses, record_status, running_fr
 
 _pdf_cancel_event = threading.Event()
 _pdf_processing_active = False
@@ -13,6 +15,9 @@ APP_STATUS_FILE = Path("data/app_status.json")
 PIPELINE_STATUS_FILE = Path("pipeline_status.txt")
 MAX_LOG_LINES = 30
 
+# Callbacks told about every FR status change in this process (core.warm_worker)
+_fr_status_listeners: list = []
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -56,24 +61,7 @@ def format_detail_log(data: dict | None = None) -> str:
 
 def _find_running_fr() -> tuple[str, str, int, str] | None:
     """Return (pdf_name, fr_id, step, message) for a currently running FR, if any."""
-    logbook_base = Path("data/pdf_logbook")
-    if not logbook_base.exists():
-        return None
-    for pdf_dir in sorted(logbook_base.iterdir()):
-        if not pdf_dir.is_dir() or pdf_dir.name.startswith("."):
-            continue
-        for fr_dir in sorted(pdf_dir.iterdir()):
-            if not fr_dir.is_dir() or not fr_dir.name.startswith("FR-"):
-                continue
-            st = read_fr_status(pdf_dir.name, fr_dir.name)
-            if st and st.get("phase") == "running":
-                return (
-                    pdf_dir.name,
-                    fr_dir.name,
-                    int(st.get("step", 0)),
-                    st.get("message", ""),
-                )
-    return None
+    return running_fr()
 
 
 def format_simple_status(data: dict | None = None) -> str:
@@ -309,6 +297,11 @@ def status_dir(pdf_name: str) -> Path:
     return Path(f"data/pdf_logbook/{pdf_stem(pdf_name)}/.status")
 
 
+def add_fr_status_listener(callback) -> None:
+    """Call `callback(event)` with pdf/fr_id/step/phase/message on every set_fr_status."""
+    _fr_status_listeners.append(callback)
+
+
 def set_fr_status(
     pdf_name: str,
     fr_id: str,
@@ -329,6 +322,12 @@ def set_fr_status(
     (directory / f"{fr_id}.json").write_text(
         json.dumps(payload, indent=2), encoding="utf-8"
     )
+    record_status(pdf_name, fr_id, step, phase, message, payload["updated_at"])
+    for callback in _fr_status_listeners:
+        try:
+            callback({"pdf": pdf_name, **payload})
+        except Exception:
+            pass  # a listener going away must never break the pipeline
 
     if phase == "running" and step:
         simple = f"🧪 Running {fr_id} — step {step}/8"
@@ -336,6 +335,8 @@ def set_fr_status(
         simple = f"✅ {fr_id} complete"
     elif phase == "error":
         simple = f"❌ {fr_id} failed"
+    elif phase == "cancelled":
+        simple = f"🛑 {fr_id} cancelled"
     else:
         simple = f"🧪 Running {fr_id}"
 
@@ -367,15 +368,7 @@ def get_batch_status(pdf_name: str, fr_ids: list[str] | None = None) -> str:
         statuses = [read_fr_status(pdf_name, fr_id) for fr_id in fr_ids]
         statuses = [s for s in statuses if s]
     else:
-        directory = status_dir(pdf_name)
-        statuses = []
-        if directory.exists():
-            for path in directory.glob("*.json"):
-                try:
-                    with open(path, encoding="utf-8") as f:
-                        statuses.append(json.load(f))
-                except (json.JSONDecodeError, OSError):
-                    pass
+        statuses = fr_statuses(pdf_name)
 
     if not statuses:
         return ""
@@ -383,14 +376,16 @@ def get_batch_status(pdf_name: str, fr_ids: list[str] | None = None) -> str:
     total = len(statuses)
     done = sum(1 for s in statuses if s.get("phase") == "done")
     errors = sum(1 for s in statuses if s.get("phase") == "error")
+    cancelled = sum(1 for s in statuses if s.get("phase") == "cancelled")
     running = [s for s in statuses if s.get("phase") == "running"]
 
     if done == total:
         return f"Completed {done}/{total} FRs"
+    msg = f"{done}/{total} FRs done"
     if errors:
-        msg = f"{done}/{total} FRs done, {errors} error(s)"
-    else:
-        msg = f"{done}/{total} FRs done"
+        msg += f", {errors} error(s)"
+    if cancelled:
+        msg += f", {cancelled} cancelled"
 
     if running:
         parts = []
@@ -419,6 +414,17 @@ def write_pipeline_status(message: str) -> None:
         pass
 
 
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process in MB (None where unsupported, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
 def get_combined_status_display() -> str:
     """Backward-compatible single string (simple line only)."""
     return get_status_ui()[0]
@@ -0,0 +1,171 @@
+"""Pipeline definition: the steps of an FR and the data each one consumes.
+
+Each step declares the keys it reads (and the prompt placeholder each key
+fills) and the list key it produces. The producer of an input is the closest
+earlier step that outputs that key, so the dependency graph (and with it the
+LangGraph edges, the scheduler's ready steps and the job queue's follow-up
+jobs) is derived from the declarations instead of a fixed 1 -> 8 chain. Steps
+whose inputs are ready run at the same time.
+
+A deployment can change the pipeline in .env without touching this file:
+
+- ``STEPS_REPLACED=5:core.local_steps.unify_test_values,...`` runs a Python
+  function ``(input_data, fr_text) -> dict`` instead of the step's LLM call
+- ``STEPS_DISABLED=6`` skips a step's work: its first input list is passed on
+  unchanged as its output (only for list-to-list steps, never the last step)
+
+Replaced and disabled steps still write their stepN file, so the logbook,
+resume and the step viewer work the same.
+"""
+
+import importlib
+from dataclasses import dataclass, field
+from typing import Callable
+
+from config import STEPS_DISABLED, STEPS_REPLACED
+
+FR_TEXT_KEY = "requirement_text"
+
+
+@dataclass(frozen=True)
+class StepDef:
+    number: int
+    name: str
+    # input key -> placeholder it fills in the step's user prompt
+    inputs: dict[str, str]
+    output: str
+    # Local implementation (input_data, fr_text) -> response; None = LLM call
+    run: Callable[[dict, str], dict] | None = None
+    implementation: str = "llm"
+    depends_on: tuple[int, ...] = field(default=())
+
+
+# Default pipeline (prompts in utils/prompts.py). Step 4 reads partitions from
+# step 2 as well as boundaries from step 3.
+DEFAULT_STEPS: list[StepDef] = [
+    StepDef(1, "Atomic blocks", {FR_TEXT_KEY: FR_TEXT_KEY}, "atomic_blocks"),
+    StepDef(2, "Partitions", {"atomic_blocks": "atomic_blocks"}, "partitions"),
+    StepDef(3, "Boundaries", {"partitions": "partitions"}, "boundaries"),
+    StepDef(4, "Test values", {"partitions": "partitions", "boundaries": "boundaries"}, "test_values"),
+    StepDef(5, "Unified values", {"test_values": "test_values"}, "values"),
+    StepDef(6, "Deduped values", {"values": "unified_values"}, "deduped_values"),
+    StepDef(7, "Organized data", {"deduped_values": "deduped_values"}, "organized_data"),
+    StepDef(8, "Test cases", {"organized_data": "organized_data"}, "test_cases"),
+]
+
+
+def _load_callable(path: str) -> Callable[[dict, str], dict]:
+    module_name, _, attr = path.replace(":", ".").rpartition(".")
+    if not module_name:
+        raise ValueError(f"STEPS_REPLACED: '{path}' is not a module.function path")
+    function = getattr(importlib.import_module(module_name), attr, None)
+    if not callable(function):
+        raise ValueError(f"STEPS_REPLACED: '{path}' is not a function")
+    return function
+
+
+def _passthrough(step: StepDef) -> Callable[[dict, str], dict]:
+    source = next(iter(step.inputs))
+
+    def run(input_data: dict, fr_text: str) -> dict:
+        result = {step.output: list(input_data.get(source) or [])}
+        if "fr_id" in input_data:
+            result["fr_id"] = input_data["fr_id"]
+        return result
+
+    return run
+
+
+def build_pipeline(
+    steps: list[StepDef],
+    disabled: list[int] | None = None,
+    replaced: dict[int, str] | None = None,
+) -> dict[int, StepDef]:
+    """Apply disable/replace overrides and resolve each step's producers."""
+    disabled = disabled or []
+    replaced = replaced or {}
+    numbers = [step.number for step in steps]
+    unknown = [n for n in [*disabled, *replaced] if n not in numbers]
+    if unknown:
+        raise ValueError(f"Unknown step(s) in STEPS_DISABLED/STEPS_REPLACED: {unknown}")
+
+    pipeline: dict[int, StepDef] = {}
+    producers: dict[str, int] = {}
+    for step in sorted(steps, key=lambda s: s.number):
+        depends_on = []
+        for key in step.inputs:
+            if key == FR_TEXT_KEY:
+                continue
+            if key not in producers:
+                raise ValueError(f"Step {step.number} reads '{key}', which no earlier step produces")
+            depends_on.append(producers[key])
+        run, implementation = step.run, step.implementation
+        if step.number in replaced:
+            run, implementation = _load_callable(replaced[step.number]), replaced[step.number]
+        elif step.number in disabled:
+            if step.number == numbers[-1] or FR_TEXT_KEY in step.inputs:
+                raise ValueError(f"Step {step.number} cannot be disabled")
+            run, implementation = _passthrough(step), "disabled"
+        pipeline[step.number] = StepDef(
+            step.number,
+            step.name,
+            step.inputs,
+            step.output,
+            run,
+            implementation,
+            tuple(sorted(set(depends_on))),
+        )
+        producers[step.output] = step.number
+    return pipeline
+
+
+PIPELINE = build_pipeline(DEFAULT_STEPS, STEPS_DISABLED, STEPS_REPLACED)
+STEP_NUMBERS = sorted(PIPELINE)
+FINAL_STEP = STEP_NUMBERS[-1]
+
+
+def get_step(step_number: int) -> StepDef:
+    return PIPELINE[step_number]
+
+
+def dependents(step_number: int) -> list[int]:
+    """Steps that read an output of `step_number`."""
+    return [n for n in STEP_NUMBERS if step_number in PIPELINE[n].depends_on]
+
+
+def release_outputs(outputs: dict, done: set[int]) -> list[int]:
+    """Drop (in place) the outputs whose consumers have all run; returns their steps.
+
+    Every output is also in the step's logbook file, so nothing is lost: this
+    only bounds what a running FR keeps in memory (a sink step's output, e.g.
+    step 8, is dropped as soon as it is written).
+    """
+    released = [n for n in outputs if n in done and all(d in done for d in dependents(n))]
+    for n in released:
+        del outputs[n]
+    return released
+
+
+def resume_step(done: set[int]) -> int:
+    """Last step with every step up to it done: where an interrupted FR resumes (0 = start over)."""
+    step = 0
+    for n in STEP_NUMBERS:
+        if n not in done:
+            break
+        step = n
+    return step
+
+
+def ready_steps(done: set[int], running: set[int] = frozenset()) -> list[int]:
+    """Steps not yet done or running whose dependencies are all done."""
+    return [
+        n for n in STEP_NUMBERS
+        if n not in done and n not in running and set(PIPELINE[n].depends_on) <= done
+    ]
+
+
+def step_prompt_for(step: StepDef) -> dict | None:
+    """What the logbook records as the 'prompt' of a local step (None = LLM prompt)."""
+    if step.run is None:
+        return None
+    return {"implementation": step.implementation, "name": step.name}
@@ -0,0 +1,388 @@
+"""Pre-warmed pipeline worker: one long-lived process that runs Run requests.
+
+The UI used to start ``python -m core.simple_run`` for every Run, paying
+interpreter start, imports, graph compilation and LLM client setup each time.
+Instead it starts this worker once (``WarmWorker``); the worker imports and
+warms the pipeline, then waits for requests on a local
+``multiprocessing.connection`` pipe (Unix socket / Windows named pipe,
+authenticated with a random key). Runs still happen in a separate process, so
+a crash in the pipeline cannot take the UI down.
+
+Messages are dicts. UI -> worker: ``{"type": "run", "max_parallel": n}``,
+``{"type": "cancel"}``, ``{"type": "shutdown"}``. Worker -> UI: ``ready``,
+``progress`` (FR status changes), ``done`` (``returncode`` 0/1, or
+``CANCELLED_EXIT_CODE`` after a cancel, and ``error``). Progress is sent by
+one sender thread (``_ProgressForwarder``), never by the pipeline threads: if
+the UI reads slowly, only the latest status per FR is kept and the oldest FRs
+are dropped beyond PROGRESS_QUEUE_MAX, so a full pipe cannot stall the run.
+
+``PipelineRun`` is the UI-side handle for one run. It mimics the parts of
+``subprocess.Popen`` the UI uses (``poll``, ``wait``, ``communicate``,
+``terminate``, ``kill``, ``returncode``). ``terminate`` cancels the run
+cooperatively (core.cancel): in-flight LLM requests are aborted, finished
+steps are kept and a partial output is combined. ``kill`` stops the worker
+process; a fresh one is warmed in the background for the next Run.
+
+The worker's stdout/stderr go to logs/pipeline.log (core.log).
+"""
+
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener, arbitrary_address, default_family
+from pathlib import Path
+
+from core.cancel import CANCELLED_EXIT_CODE, CancelToken
+from core.log import stream_to_log
+
+AUTHKEY_ENV = "DECT_WORKER_AUTHKEY"
+START_TIMEOUT_SEC = 120.0
+# Pending progress events in the worker (latest per FR); oldest dropped beyond this
+PROGRESS_QUEUE_MAX = 256
+# Unconsumed progress events kept by PipelineRun (the UI reads them via wait_progress)
+PROGRESS_KEEP = 256
+
+
+# ============================================
+# WORKER PROCESS
+# ============================================
+
+def _watch_parent(parent_pid: int) -> None:
+    """Exit when the UI process is gone (e.g. killed before it connected)."""
+    while True:
+        time.sleep(1.0)
+        if os.getppid() != parent_pid:
+            os._exit(0)
+
+
+def _warm_up() -> None:
+    """Import the pipeline and build what every run needs."""
+    import core.simple_run  # noqa: F401  (pipeline, scheduler, LLM steps)
+    from config import SCHEDULER_POLICY
+
+    if SCHEDULER_POLICY == "graph":
+        from core.batch_graph import get_batch_graph
+        from core.fr_graph import get_fr_graph
+
+        get_fr_graph()
+        get_batch_graph()
+    try:
+        from core.steps import PIPELINE
+        from llm_client import get_llm
+
+        # Imports the provider SDKs and creates one client per configured model
+        for step in PIPELINE.values():
+            if step.run is None:
+                get_llm(step.number)
+    except Exception as e:
+        print(f"Pipeline worker: LLM client warm-up skipped: {e}", flush=True)
+
+
+class _ProgressForwarder:
+    """Bounded progress queue drained by a single sender thread.
+
+    ``put`` is called from pipeline threads and never blocks on the pipe: a
+    newer status for the same FR replaces the pending one, and the oldest FR
+    is dropped when PROGRESS_QUEUE_MAX are pending.
+    """
+
+    def __init__(self, conn: Connection, send_lock: threading.Lock):
+        self._conn = conn
+        self._send_lock = send_lock
+        self._pending: OrderedDict[tuple, dict] = OrderedDict()
+        self._ready = threading.Condition()
+        self.dropped = 0
+        threading.Thread(target=self._send_loop, name="dect-progress", daemon=True).start()
+
+    def put(self, event: dict) -> None:
+        key = (event.get("pdf"), event.get("fr_id"))
+        with self._ready:
+            self._pending.pop(key, None)
+            self._pending[key] = event
+            if len(self._pending) > PROGRESS_QUEUE_MAX:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._ready.notify()
+
+    def _send_loop(self) -> None:
+        while True:
+            with self._ready:
+                while not self._pending:
+                    self._ready.wait()
+                events = list(self._pending.values())
+                self._pending.clear()
+            try:
+                for event in events:
+                    with self._send_lock:
+                        self._conn.send({"type": "progress", **event})
+            except OSError:
+                return  # UI went away
+
+
+def _run(
+    conn: Connection,
+    send_lock: threading.Lock,
+    busy: threading.Event,
+    token: CancelToken,
+    request: dict,
+) -> None:
+    from core.concurrency import set_max_parallel_frs
+    from core.simple_run import main as run_pipeline
+
+    if request.get("max_parallel"):
+        parallel = set_max_parallel_frs(request["max_parallel"])
+        os.environ["MAX_PARALLEL_FRS"] = str(parallel)
+    try:
+        run_pipeline(token)
+        returncode = CANCELLED_EXIT_CODE if token.cancelled else 0
+        reply = {"type": "done", "returncode": returncode, "error": ""}
+    except Exception:
+        traceback.print_exc()
+        reply = {"type": "done", "returncode": 1, "error": traceback.format_exc()}
+    busy.clear()  # before "done", so the next request is never refused
+    with send_lock:
+        conn.send(reply)
+
+
+def serve(address) -> None:
+    """Worker main loop: warm up, accept the UI connection, run requests one at a time."""
+    threading.Thread(target=_watch_parent, args=(os.getppid(),), daemon=True).start()
+    authkey = bytes.fromhex(os.environ.pop(AUTHKEY_ENV))
+    from core.log import configure_logging
+
+    configure_logging()
+
+    with Listener(address, authkey=authkey) as listener:
+        started = time.perf_counter()
+        _warm_up()
+        conn = listener.accept()
+
+    from core.status import add_fr_status_listener
+
+    send_lock = threading.Lock()
+    add_fr_status_listener(_ProgressForwarder(conn, send_lock).put)
+    conn.send({"type": "ready", "pid": os.getpid(), "warm_sec": time.perf_counter() - started})
+
+    busy = threading.Event()
+    token = CancelToken()
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return  # UI went away
+        if request.get("type") == "shutdown":
+            return
+        if request.get("type") == "cancel":
+            token.cancel(request.get("reason") or "Stopped by user")
+            continue
+        if request.get("type") == "run":
+            if busy.is_set():
+                with send_lock:
+                    conn.send({"type": "done", "returncode": 1, "error": "A run is already in progress"})
+                continue
+            busy.set()
+            token = CancelToken()
+            threading.Thread(target=_run, args=(conn, send_lock, busy, token, request), daemon=True).start()
+
+
+# ============================================
+# UI SIDE
+# ============================================
+
+class PipelineRun:
+    """Popen-like handle for one run on the warm worker."""
+
+    def __init__(self, worker: "WarmWorker", process: subprocess.Popen, conn: Connection):
+        self._worker = worker
+        self._process = process
+        self._conn = conn
+        self._lock = threading.Lock()
+        self.returncode: int | None = None
+        self.error = ""
+        self.progress: list[dict] = []
+
+    def _handle(self, message: dict) -> None:
+        if message.get("type") == "progress":
+            self.progress.append(message)
+            if len(self.progress) > PROGRESS_KEEP:
+                del self.progress[:-PROGRESS_KEEP]
+        elif message.get("type") == "done":
+            self.returncode = message.get("returncode", 1)
+            self.error = message.get("error", "")
+
+    def _receive(self, timeout: float) -> None:
+        """Handle messages arriving within `timeout`; detect a dead worker."""
+        with self._lock:
+            if self.returncode is not None:
+                return
+            try:
+                if self._conn.poll(timeout):
+                    while True:
+                        self._handle(self._conn.recv())
+                        if self.returncode is not None or not self._conn.poll(0):
+                            break
+                    return
+            except (EOFError, OSError):
+                pass
+            code = self._process.poll()
+            if code is None and not self._conn.closed:
+                return
+            if code is None:
+                code = self._process.wait()
+            self.returncode = code if code else 1
+            if not self.error and code not in (-signal.SIGTERM, -signal.SIGKILL):
+                self.error = f"Pipeline worker exited unexpectedly (code {code})"
+        self._worker._discard(self._process)
+
+    def poll(self) -> int | None:
+        self._receive(0)
+        return self.returncode
+
+    def wait_progress(self, timeout: float) -> list[dict]:
+        """Wait up to `timeout` for progress or completion; returns (and forgets) unconsumed events."""
+        self._receive(timeout)
+        with self._lock:
+            events, self.progress = self.progress, []
+        return events
+
+    def wait(self, timeout: float | None = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired("pipeline worker", timeout)
+            self._receive(0.2 if remaining is None else min(0.2, remaining))
+        return self.returncode
+
+    def communicate(self) -> tuple[str, str]:
+        self.wait()
+        return "", self.error
+
+    def terminate(self) -> None:
+        """Cancel the run cooperatively (finished steps are kept, partial output combined)."""
+        if self.returncode is None:
+            try:
+                self._conn.send({"type": "cancel"})
+            except OSError:
+                self._process.terminate()
+
+    def kill(self) -> None:
+        if self.returncode is None:
+            self._process.kill()
+
+
+class WarmWorker:
+    """Owns the worker process on the UI side; starts it once and re-warms it after a crash or cancel."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process: subprocess.Popen | None = None
+        self._conn: Connection | None = None
+        self._ready = threading.Event()
+        self._start_error = ""
+
+    def _spawn(self) -> None:
+        address = arbitrary_address(default_family)
+        authkey = secrets.token_bytes(32)
+        env = os.environ.copy()
+        env[AUTHKEY_ENV] = authkey.hex()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "core.warm_worker", address],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=Path.cwd(),
+            env=env,
+        )
+        # Drained continuously so the worker never blocks on a full pipe
+        stream_to_log(process.stdout)
+        stream_to_log(process.stderr, logging.WARNING)
+        self._process, self._conn, self._start_error = process, None, ""
+        self._ready.clear()
+        threading.Thread(target=self._connect, args=(process, address, authkey), daemon=True).start()
+
+    def _connect(self, process: subprocess.Popen, address, authkey: bytes) -> None:
+        deadline = time.monotonic() + START_TIMEOUT_SEC
+        conn = None
+        while conn is None:
+            if process.poll() is not None or time.monotonic() > deadline:
+                self._start_error = f"Pipeline worker failed to start (code {process.poll()})"
+                self._ready.set()
+                return
+            try:
+                conn = Client(address, authkey=authkey)
+            except (OSError, EOFError, AuthenticationError):
+                time.sleep(0.1)
+        try:
+            message = conn.recv()  # "ready" once warm
+        except (EOFError, OSError):
+            self._start_error = f"Pipeline worker exited during warm-up (code {process.wait()})"
+            self._ready.set()
+            return
+        with self._lock:
+            if self._process is process:
+                self._conn = conn
+        print(f"Pipeline worker {message.get('pid')} warm in {message.get('warm_sec', 0):.1f}s", flush=True)
+        self._ready.set()
+
+    def prestart(self) -> None:
+        """Start (or restart) the worker in the background if none is alive."""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._spawn()
+
+    def _discard(self, process: subprocess.Popen) -> None:
+        """Forget a dead worker and warm a replacement."""
+        with self._lock:
+            if self._process is not process:
+                return
+            if self._conn is not None:
+                self._conn.close()
+            self._process, self._conn = None, None
+        self.prestart()
+
+    def start_run(self, max_parallel: int) -> PipelineRun:
+        """Send a run request to the (warm) worker; raises RuntimeError if it cannot start."""
+        self.prestart()
+        if not self._ready.wait(START_TIMEOUT_SEC):
+            raise RuntimeError("Pipeline worker did not become ready")
+        with self._lock:
+            process, conn = self._process, self._conn
+        if conn is None or process.poll() is not None:
+            error = self._start_error or "Pipeline worker is not running"
+            self._discard(process)
+            raise RuntimeError(error)
+        try:
+            conn.send({"type": "run", "max_parallel": max_parallel})
+        except OSError as e:
+            self._discard(process)
+            raise RuntimeError(f"Pipeline worker is not reachable: {e}") from e
+        return PipelineRun(self, process, conn)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            process, conn = self._process, self._conn
+            self._process, self._conn = None, None
+        if conn is not None:
+            try:
+                conn.send({"type": "shutdown"})
+            except OSError:
+                pass
+            conn.close()
+        if process is not None:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
@@ -0,0 +1,224 @@
+"""dect-worker: consume FR-step jobs from the durable queue (core.jobqueue).
+
+Run any number of these, on this machine or on others sharing the data volume:
+
+    python -m core.worker                   # MAX_PARALLEL_FRS threads, runs forever
+    python -m core.worker --exit-when-idle  # stop once the queue is drained
+
+A worker stops on Ctrl+C, or (``--cancel-on-eof``, used for the pipeline's
+local workers) when its stdin closes: in-flight steps are cancelled
+(core.cancel) and their jobs released back to the queue. A job whose run was
+cancelled (JobQueue.cancel_run) is stopped at its next lease heartbeat.
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+
+from rich import print
+
+from config import JOB_LEASE_SEC, MAX_PARALLEL_FRS
+from core.cancel import CancelToken
+from core.fr_graph import execute_step, mark_cancelled
+from core.log import configure_logging, fr_context, get_logger
+from core.jobqueue import Job, JobQueue, default_worker_id, new_run_id
+from core.logbook_index import resume_point
+from core.status import set_fr_status, write_pipeline_status
+from core.steps import FINAL_STEP, resume_step
+
+log = get_logger(__name__)
+
+
+def _keep_lease(queue: JobQueue, job: Job, stop: threading.Event, job_cancel: CancelToken) -> None:
+    while not stop.wait(max(1.0, JOB_LEASE_SEC / 3)):
+        if not queue.heartbeat(job):
+            # Run cancelled, or the lease expired and another worker took the job:
+            # abort the step (its FR status belongs to the run / the new owner)
+            job_cancel.cancel("Job lease lost")
+            return
+
+
+def run_job(queue: JobQueue, job: Job, cancel: CancelToken | None = None) -> bool:
+    """Run one leased step; returns True on success."""
+    with fr_context(job.pdf_name, job.fr_id, job.step):
+        return _run_job(queue, job, cancel)
+
+
+def _run_job(queue: JobQueue, job: Job, cancel: CancelToken | None) -> bool:
+    log.info("[%s] step %d (attempt %d)", job.lease_owner, job.step, job.attempts)
+    job_cancel = CancelToken()
+    unregister = cancel.on_cancel(lambda: job_cancel.cancel(cancel.reason)) if cancel else (lambda: None)
+    stop = threading.Event()
+    keeper = threading.Thread(target=_keep_lease, args=(queue, job, stop, job_cancel), daemon=True)
+    keeper.start()
+    try:
+        # A cancelled job is released, not the FR: run_tasks_via_queue marks the
+        # FRs of a cancelled run, and a released or lost job runs again elsewhere
+        result = execute_step(
+            job.pdf_name, job.fr_id, job.fr_text, job.step, job_cancel, queue.done_steps(job), mark_fr=False
+        )
+    except Exception as e:
+        result = {"error": str(e)}
+    finally:
+        stop.set()
+        unregister()
+
+    if result.get("cancelled"):
+        queue.release(job)
+        log.info("Step %d cancelled; job released", job.step)
+        return False
+    if result.get("error"):
+        retry = queue.fail(job, result["error"])
+        log.warning("Step %d failed (%s)", job.step, "retrying" if retry else "giving up")
+        return False
+    queue.complete(job)
+    return True
+
+
+def worker_loop(
+    worker_id: str,
+    *,
+    run_id: str | None = None,
+    poll_interval: float = 2.0,
+    exit_when_idle: bool = False,
+    cancel: CancelToken | None = None,
+) -> None:
+    queue = JobQueue()
+    while not (cancel and cancel.cancelled):
+        job = queue.claim(worker_id, run_id)
+        if job is None:
+            if exit_when_idle and queue.is_drained(run_id):
+                return
+            if cancel is not None:
+                cancel.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        run_job(queue, job, cancel)
+
+
+def _mark_unfinished_cancelled(queue: JobQueue, run_id: str) -> int:
+    """mark_cancelled every FR of a cancelled run that neither finished nor failed."""
+    count = 0
+    for (pdf_name, fr_id), steps in queue.fr_steps(run_id).items():
+        if steps.get(FINAL_STEP) == "done" or "failed" in steps.values():
+            continue
+        done = {step for step, status in steps.items() if status == "done"}
+        mark_cancelled(pdf_name, fr_id, resume_step(done))
+        count += 1
+    return count
+
+
+def run_tasks_via_queue(
+    tasks: dict[str, list[dict[str, str]]],
+    local_workers: int = 1,
+    poll_interval: float = 2.0,
+    cancel=None,
+) -> dict[str, int]:
+    """Enqueue a run, optionally start local workers for it, and wait until drained.
+
+    FRs cancelled in an earlier run resume after their last completed step.
+    With a `cancel` token (core.cancel) the wait ends when it fires: the run's
+    remaining jobs are cancelled in the queue, local workers cancel their
+    in-flight steps, and unfinished FRs are marked cancelled so the next run
+    resumes them.
+    """
+    queue = JobQueue()
+    run_id = new_run_id()
+    start_steps: dict[str, dict[str, int]] = {}
+    for pdf_name, frs_list in tasks.items():
+        for fr in frs_list:
+            fr_id = list(fr.keys())[0]
+            step = resume_point(pdf_name, fr_id)
+            start_steps.setdefault(pdf_name, {})[fr_id] = step
+            message = f"Queued (resuming after step {step})" if step else "Queued"
+            set_fr_status(pdf_name, fr_id, step, "running", message)
+    total = queue.enqueue_tasks(run_id, tasks, start_steps)
+    write_pipeline_status(f"Queued {total} FR(s) as run {run_id}")
+
+    # Closing a local worker's stdin cancels it (--cancel-on-eof)
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "core.worker", "--run-id", run_id, "--exit-when-idle", "--cancel-on-eof"],
+            stdin=subprocess.PIPE,
+        )
+        for _ in range(local_workers)
+    ]
+    if not workers:
+        print(f"Run {run_id} queued; waiting for external dect-worker processes")
+
+    cancelled = False
+    while not queue.is_drained(run_id):
+        if cancel is not None and cancel.wait(poll_interval):
+            cancelled = True
+            break
+        if cancel is None:
+            time.sleep(poll_interval)
+
+    if cancelled:
+        # Before the workers stop, so no released job is claimed again
+        queue.cancel_run(run_id)
+    for worker in workers:
+        worker.stdin.close()
+    for worker in workers:
+        worker.wait()
+    if cancelled:
+        count = _mark_unfinished_cancelled(queue, run_id)
+        print(f"Run {run_id} cancelled; {count} FR(s) will resume on the next run")
+    counts = queue.counts(run_id)
+    write_pipeline_status(
+        f"Run {run_id}: {counts.get('done', 0)} step(s) done, {counts.get('failed', 0)} failed"
+    )
+    return counts
+
+
+def _cancel_on_eof(cancel: CancelToken) -> None:
+    sys.stdin.read()
+    cancel.cancel("Run cancelled")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="dect-worker", description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=MAX_PARALLEL_FRS, help="concurrent jobs in this process")
+    parser.add_argument("--id", default=default_worker_id(), help="worker id recorded on leases")
+    parser.add_argument("--run-id", default=None, help="only take jobs from this run")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between empty-queue polls")
+    parser.add_argument("--exit-when-idle", action="store_true", help="exit once no jobs are queued or leased")
+    parser.add_argument("--cancel-on-eof", action="store_true", help="cancel and exit when stdin is closed")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    print(f"dect-worker {args.id}: {args.threads} thread(s)")
+    cancel = CancelToken()
+    if args.cancel_on_eof:
+        threading.Thread(target=_cancel_on_eof, args=(cancel,), daemon=True).start()
+    threads = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f"{args.id}/{i}",),
+            kwargs={
+                "run_id": args.run_id,
+                "poll_interval": args.poll,
+                "exit_when_idle": args.exit_when_idle,
+                "cancel": cancel,
+            },
+            daemon=True,
+        )
+        for i in range(max(1, args.threads))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("dect-worker: interrupted; releasing leased jobs")
+        cancel.cancel("Worker interrupted")
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
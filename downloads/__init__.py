@@ -1,4 +1,11 @@
 from downloads.csv import prepare_csv_download
 from downloads.json import prepare_json_download
+from downloads.jsonl import prepare_jsonl_download
+from downloads.xlsx import prepare_xlsx_download
 
-__all__ = ["prepare_csv_download", "prepare_json_download"]
+__all__ = [
+    "prepare_csv_download",
+    "prepare_json_download",
+    "prepare_jsonl_download",
+    "prepare_xlsx_download",
+]
@@ -1,6 +1,5 @@
-from downloads.dataframe import load_final_output_as_dataframe
 from downloads.ensure import get_csv_download_path
-from downloads.paths import ERROR_FILENAME, FINAL_JSON_PATH, ensure_outputs_dir
+from downloads.paths import ERROR_FILENAME, FINAL_CSV_PATH, FINAL_JSON_PATH, ensure_outputs_dir
 
 
 def ensure_csv_file() -> tuple[bool, str]:
@@ -9,13 +8,15 @@ def ensure_csv_file() -> tuple[bool, str]:
         return False, "JSON file not found"
 
     try:
-        df = load_final_output_as_dataframe(limit_rows=None, truncate_for_snippet=False)
-        if df.empty:
+        from core.results import results_lock
+        from core.results_store import export_csv
+
+        # Streamed from the results store; same columns as the rows appended per FR.
+        # Under the results lock so no worker appends to the file being replaced
+        with results_lock():
+            count = export_csv(FINAL_CSV_PATH)
+        if not count:
             return False, "No data to export to CSV"
-
-        from downloads.paths import FINAL_CSV_PATH
-
-        df.to_csv(FINAL_CSV_PATH, index=False, encoding="utf-8")
         return True, f"CSV generated successfully: {FINAL_CSV_PATH}"
     except Exception as e:
         return False, f"Error generating CSV: {e}"
@@ -1,5 +1,5 @@
 import json
-from pathlib import Path
+import re
 
 import pandas as pd
 
@@ -19,6 +19,25 @@ def truncate_text(text, max_length=30):
     return truncated + "..."
 
 
+def truncate_series(series, max_length=30):
+    """Vectorised truncate_text for a whole column."""
+    text = series.fillna("").astype(str)
+    too_long = text.str.len() > max_length
+    if not too_long.any():
+        return text
+
+    head = text[too_long].str[:max_length].str.rstrip()
+    # Cut at the last space if it is late enough (same rule as truncate_text)
+    before_space = head.str.extract(r"^(.*) [^ ]*$", flags=re.S)[0]
+    space_at = before_space.str.len()
+    at_word = before_space.notna() & (space_at >= max(0, max_length - 10)) & (space_at > max_length // 2)
+    head = head.where(~at_word, before_space.str.rstrip())
+
+    result = text.copy()
+    result[too_long] = head + "..."
+    return result
+
+
 def truncate_dataframe_cells(df, max_length=30, exclude_columns=None, custom_lengths=None):
     """Truncate text in all DataFrame cells with customizable lengths per column."""
     if exclude_columns is None:
@@ -38,71 +57,146 @@ def truncate_dataframe_cells(df, max_length=30, exclude_columns=None, custom_len
     df_truncated = df.copy()
     for column in df_truncated.columns:
         if column not in exclude_columns:
-            col_max_length = custom_lengths.get(column, max_length)
-            df_truncated[column] = df_truncated[column].astype(str).apply(
-                lambda x: truncate_text(x, col_max_length)
+            df_truncated[column] = truncate_series(
+                df_truncated[column], custom_lengths.get(column, max_length)
             )
     return df_truncated
 
 
+RESULTS_COLUMNS = {
+    "fr_id": "FR ID",
+    "title": "Test Case",
+    "precondition": "Precondition",
+    "steps": "Steps",
+    "test_data": "Test Data",
+    "expected_result": "Expected Result",
+    "environment": "Environment",
+    "actual_result": "Actual Result",
+    "status": "Test Status (Pass / Fail)",
+    "jira_bug_link": "Jira Bug Link",
+}
+
+# (final_output.json mtime_ns, results_version(), limit_rows, truncate_for_snippet) -> DataFrame
+_frame_cache: dict[tuple, pd.DataFrame] = {}
+
+# Bytes read at a time when only the leading suites of final_output.json are needed
+_READ_CHUNK = 64 * 1024
+_TEST_SUITE_KEY = re.compile(r'"test_suite"\s*:\s*\[')
+
+
 def _empty_results_dataframe() -> pd.DataFrame:
-    return pd.DataFrame(
-        columns=[
-            "FR ID",
-            "Test Case",
-            "Precondition",
-            "Steps",
-            "Test Data",
-            "Expected Result",
-            "Environment",
-            "Actual Result",
-            "Test Status (Pass / Fail)",
-            "Jira Bug Link",
-        ]
-    )
+    return pd.DataFrame(columns=list(RESULTS_COLUMNS.values()))
+
+
+def _suites_for_rows(test_suite: list, limit_rows=None) -> list:
+    """Suites covering the first limit_rows test cases (all suites if no limit)."""
+    if not limit_rows:
+        return test_suite
+    suites, count = [], 0
+    for suite in test_suite:
+        if count >= limit_rows:
+            break
+        suites.append(suite)
+        count += len(suite.get("test_cases", []))
+    return suites
+
+
+def results_dataframe(data: dict, limit_rows=None) -> pd.DataFrame:
+    """Flatten a final_output dict into the results table (no per-cell Python)."""
+    suites = [
+        {"fr_id": suite.get("fr_id", "Unknown"), "test_cases": suite.get("test_cases") or []}
+        for suite in _suites_for_rows(data.get("test_suite", []), limit_rows)
+    ]
+    if not suites:
+        return _empty_results_dataframe()
+    df = pd.json_normalize(suites, record_path="test_cases", meta=["fr_id"], meta_prefix="suite.")
+    if df.empty:
+        return _empty_results_dataframe()
+    if limit_rows:
+        df = df.head(limit_rows)
+    df["fr_id"] = df["suite.fr_id"]
+    df = df.reindex(columns=list(RESULTS_COLUMNS)).fillna("")
+    return df.rename(columns=RESULTS_COLUMNS).reset_index(drop=True)
+
+
+def _read_leading_suites(path, limit_rows: int) -> list | None:
+    """Suites covering the first limit_rows test cases, decoding final_output.json
+    only up to them (None if the file does not start the usual way)."""
+    decoder = json.JSONDecoder()
+    suites, count = [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(_READ_CHUNK)
+        match = _TEST_SUITE_KEY.search(buffer)
+        if match is None:
+            return None
+        pos = match.end()
+        while count < limit_rows:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if buffer[pos:pos + 1] == "]":
+                break
+            try:
+                suite, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The suite runs past what has been read so far
+                more = f.read(max(_READ_CHUNK, len(buffer)))
+                if not more:
+                    raise
+                buffer += more
+                continue
+            suites.append(suite)
+            count += len(suite.get("test_cases") or [])
+    return suites
+
+
+def _results_key() -> tuple[int, int]:
+    from core.results import results_version
+
+    try:
+        mtime = FINAL_JSON_PATH.stat().st_mtime_ns
+    except OSError:
+        mtime = 0
+    return mtime, results_version()
 
 
 def load_final_output_as_dataframe(limit_rows=None, truncate_for_snippet=False):
-    """Load final_output.json and convert to pandas DataFrame for display or export."""
+    """Load final_output.json and convert to pandas DataFrame for display or export.
+
+    Memoised on the file's mtime and the shard version, so polling the
+    snippet costs two stat calls until new results land. With limit_rows only
+    the leading suites are decoded.
+    """
     from downloads.ensure import ensure_final_output_json
 
+    key = (*_results_key(), limit_rows, truncate_for_snippet)
+    if key in _frame_cache:
+        return _frame_cache[key].copy()
+
     ensure_final_output_json()
-    if not FINAL_JSON_PATH.exists():
+    key = (*_results_key(), limit_rows, truncate_for_snippet)
+    if key[0] == 0:
         return _empty_results_dataframe()
+    if key in _frame_cache:
+        return _frame_cache[key].copy()
 
     try:
-        with open(FINAL_JSON_PATH, "r") as f:
-            data = json.load(f)
-
-        rows = []
-        for test_suite in data.get("test_suite", []):
-            fr_id = test_suite.get("fr_id", "Unknown")
-            for test_case in test_suite.get("test_cases", []):
-                rows.append(
-                    {
-                        "FR ID": fr_id,
-                        "Test Case": test_case.get("title", ""),
-                        "Precondition": test_case.get("precondition", ""),
-                        "Steps": test_case.get("steps", ""),
-                        "Test Data": test_case.get("test_data", ""),
-                        "Expected Result": test_case.get("expected_result", ""),
-                        "Environment": test_case.get("environment", ""),
-                        "Actual Result": test_case.get("actual_result", ""),
-                        "Test Status (Pass / Fail)": test_case.get("status", ""),
-                        "Jira Bug Link": test_case.get("jira_bug_link", ""),
-                    }
-                )
-
-        if not rows:
-            return _empty_results_dataframe()
-
-        df = pd.DataFrame(rows)
-        if limit_rows:
-            df = df.head(limit_rows)
-        if truncate_for_snippet:
+        suites = _read_leading_suites(FINAL_JSON_PATH, limit_rows) if limit_rows else None
+        if suites is not None:
+            data = {"test_suite": suites}
+        else:
+            with open(FINAL_JSON_PATH, "r") as f:
+                data = json.load(f)
+
+        df = results_dataframe(data, limit_rows)
+        if truncate_for_snippet and not df.empty:
             df = truncate_dataframe_cells(df, max_length=30)
-        return df
 
     except Exception as e:
         print(f"Error loading final output: {e}")
         return _empty_results_dataframe()
+
+    # Keep only entries for the current results
+    for stale in [k for k in _frame_cache if k[:2] != key[:2]]:
+        del _frame_cache[stale]
+    _frame_cache[key] = df
+    return df.copy()
@@ -3,7 +3,14 @@
 import json
 from pathlib import Path
 
-from downloads.paths import FINAL_CSV_PATH, FINAL_JSON_PATH, ensure_outputs_dir
+from downloads.paths import (
+    FINAL_CSV_PATH,
+    FINAL_JSON_PATH,
+    FINAL_JSONL_PATH,
+    FINAL_XLSX_PATH,
+    SHARDS_DIR,
+    ensure_outputs_dir,
+)
 
 LOGBOOK_DIR = Path("data/pdf_logbook")
 
@@ -25,10 +32,18 @@ def _load_final_output() -> dict | None:
     return data if isinstance(data, dict) else None
 
 
+def _shards_exist() -> bool:
+    return SHARDS_DIR.is_dir() and any(SHARDS_DIR.glob("*/*.json"))
+
+
 def _step8_files_exist() -> bool:
+    if _shards_exist():
+        return True
     if not LOGBOOK_DIR.is_dir():
         return False
-    return any(LOGBOOK_DIR.rglob("step8.json"))
+    from core.logbook_index import has_step
+
+    return has_step(8)
 
 
 def rebuild_final_output_from_step8() -> bool:
@@ -44,8 +59,14 @@ def rebuild_final_output_from_step8() -> bool:
 
 
 def ensure_final_output_json() -> Path | None:
-    """Valid final_output.json path, rebuilding from step8 when missing or empty."""
+    """Valid final_output.json path, folding in new result shards (works mid-run)."""
     ensure_outputs_dir()
+    if _shards_exist():
+        from core.results import combine_result_shards
+
+        summary = combine_result_shards()
+        if summary and summary["test_cases"]:
+            return FINAL_JSON_PATH
     data = _load_final_output()
     if data and _final_output_has_results(data):
         return FINAL_JSON_PATH
@@ -61,11 +82,9 @@ def ensure_final_output_csv() -> Path | None:
         return None
 
     json_mtime = json_path.stat().st_mtime
-    if (
-        FINAL_CSV_PATH.is_file()
-        and FINAL_CSV_PATH.stat().st_size > 0
-        and FINAL_CSV_PATH.stat().st_mtime >= json_mtime
-    ):
+    csv_ready = FINAL_CSV_PATH.is_file() and FINAL_CSV_PATH.stat().st_size > 0
+    # With shards the CSV is appended per FR (and removed when stale)
+    if csv_ready and (_shards_exist() or FINAL_CSV_PATH.stat().st_mtime >= json_mtime):
         return FINAL_CSV_PATH
 
     from downloads.csv import ensure_csv_file
@@ -76,6 +95,39 @@ def ensure_final_output_csv() -> Path | None:
     return None
 
 
+def _ensure_export(path: Path, export) -> Path | None:
+    """Stream an export from the results store when it is older than the results."""
+    json_path = ensure_final_output_json()
+    if not json_path:
+        return None
+
+    from core.results_store import store_version, sync_store
+
+    source_mtime = store_version() if sync_store() else json_path.stat().st_mtime_ns
+    if path.is_file() and path.stat().st_mtime_ns >= source_mtime:
+        return path
+    try:
+        export(path)
+    except Exception as e:
+        print(f"Error exporting {path.name}: {e}")
+        return None
+    return path if path.is_file() else None
+
+
+def ensure_final_output_xlsx() -> Path | None:
+    from core.results_store import export_xlsx, openpyxl_available
+
+    if not openpyxl_available():
+        return None
+    return _ensure_export(FINAL_XLSX_PATH, export_xlsx)
+
+
+def ensure_final_output_jsonl() -> Path | None:
+    from core.results_store import export_jsonl
+
+    return _ensure_export(FINAL_JSONL_PATH, export_jsonl)
+
+
 def results_download_available() -> bool:
     """Cheap check: valid JSON on disk or step8 outputs that can be combined."""
     data = _load_final_output()
@@ -92,3 +144,13 @@ def get_json_download_path() -> str | None:
 def get_csv_download_path() -> str | None:
     path = ensure_final_output_csv()
     return str(path.resolve()) if path else None
+
+
+def get_xlsx_download_path() -> str | None:
+    path = ensure_final_output_xlsx()
+    return str(path.resolve()) if path else None
+
+
+def get_jsonl_download_path() -> str | None:
+    path = ensure_final_output_jsonl()
+    return str(path.resolve()) if path else None
@@ -0,0 +1,14 @@
+from downloads.ensure import get_jsonl_download_path
+from downloads.paths import ERROR_FILENAME, ensure_outputs_dir
+
+
+def prepare_jsonl_download() -> str:
+    """Return filepath for gr.DownloadButton (single-click download when value is pre-set)."""
+    path = get_jsonl_download_path()
+    if path:
+        return path
+
+    outputs_dir = ensure_outputs_dir()
+    error_file = outputs_dir / ERROR_FILENAME
+    error_file.write_text("Error: could not generate JSON Lines from results.")
+    return str(error_file.resolve())
@@ -3,6 +3,10 @@ from pathlib import Path
 OUTPUTS_DIR = Path("outputs")
 FINAL_JSON_PATH = OUTPUTS_DIR / "final_output.json"
 FINAL_CSV_PATH = OUTPUTS_DIR / "final_output.csv"
+FINAL_XLSX_PATH = OUTPUTS_DIR / "final_output.xlsx"
+FINAL_JSONL_PATH = OUTPUTS_DIR / "final_output.jsonl"
+SHARDS_DIR = OUTPUTS_DIR / "shards"
+STORE_DIR = OUTPUTS_DIR / "store"
 ERROR_FILENAME = "download_error.txt"
 
 
@@ -1,48 +1,456 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import cache
+
+from langchain_core.runnables import Runnable
+
 from config import (
     OPENAI_API_KEY, ANTHROPIC_API_KEY, OLLAMA_HOST,
-    LLM_PROVIDER, LLM_MODEL,
-    IMAGE_MODEL_PROVIDER, IMAGE_MODEL
+    OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, OLLAMA_NUM_CTX_MAX,
+    LLM_PROVIDER, LLM_MODEL, STEP_MODELS,
+    IMAGE_MODEL_PROVIDER, IMAGE_MODEL,
+    LLM_FALLBACKS, IMAGE_MODEL_FALLBACKS,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SEC,
 )
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_ollama import ChatOllama
+from core.log import get_logger
+
+log = get_logger("llm_client")
+
+# Provider SDKs are imported in the branch that uses them: only the configured
+# provider is loaded, and importing this module stays cheap.
 
 # ============================================
 # LLM FUNCTIONS
 # ============================================
 
-def get_llm():
+# (provider, model) -> chat model; clients (and their HTTP pools) are reused.
+# One instance serves every thread of the process. Their sync calls are
+# thread-safe, and their async calls all run on llm_loop(), the only loop
+# their async pools are ever bound to.
+_llm_registry: dict[tuple[str, str], object] = {}
+_registry_lock = threading.Lock()
+
+
+# ============================================
+# ASYNC CALLS
+# ============================================
+
+# Async calls (cancellable and hedged requests, core.llm_steps) all run on one
+# long-lived loop: a client's async HTTP pool is bound to the loop that first
+# used it, so a loop per call would leave the shared clients on closed loops.
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def llm_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop for async LLM calls (started on first use)."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            if _loop is not None:
+                # Clients that made async calls hold pools bound to the old loop
+                with _registry_lock:
+                    _llm_registry.clear()
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="dect-llm-loop", daemon=True).start()
+        return _loop
+
+
+def _reset_after_fork() -> None:
+    # A forked child has no loop thread (threads do not survive fork) and must
+    # not reuse the parent's connections: start over with fresh clients
+    global _loop, _loop_lock, _registry_lock
+    _loop = None
+    _loop_lock = threading.Lock()
+    _registry_lock = threading.Lock()
+    _llm_registry.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def run_async(coro):
+    """Run `coro` on llm_loop() in the caller's context; block until it returns or raises."""
+    context = contextvars.copy_context()
+    result: concurrent.futures.Future = concurrent.futures.Future()
+    loop = llm_loop()
+
+    def done(task: asyncio.Task) -> None:
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start() -> None:
+        loop.create_task(coro, context=context).add_done_callback(done)
+
+    loop.call_soon_threadsafe(start)
+    return result.result()
+
+
+def step_model(step: int | None = None) -> tuple[str, str]:
+    """(provider, model) for a pipeline step (STEP{N}_PROVIDER / STEP{N}_MODEL), else the default."""
+    if step is None:
+        return LLM_PROVIDER, LLM_MODEL
+    return STEP_MODELS.get(step, (LLM_PROVIDER, LLM_MODEL))
+
+
+def model_label(step: int | None = None) -> str:
+    """The "provider:model" label recorded in the logbook and cost report."""
+    provider, model = step_model(step)
+    return f"{provider}:{model}"
+
+
+def _chat_model(provider: str, model: str):
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(model=model, api_key=OPENAI_API_KEY)
+    elif provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic
+
+        return ChatAnthropic(model_name=model, api_key=ANTHROPIC_API_KEY, timeout=None, stop=None)
+    elif provider == "ollama":
+        return _ollama_chat_class()(model=model, base_url=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE)
+    else:
+        raise ValueError(f"❌ Unknown provider: {provider}")
+
+
+# ============================================
+# OLLAMA TUNING
+# ============================================
+
+# Ollama's default context window silently truncates the long step prompts, but
+# num_ctx is a load-time setting: every new value reloads the model. So the
+# window is sized from the rendered prompt in powers of two and only grows.
+_MIN_NUM_CTX = 8192
+_OUTPUT_RESERVE_TOKENS = 4096
+_CHARS_PER_TOKEN = 3
+_IMAGE_TOKENS = 1024
+_num_ctx: dict[str, int] = {}
+_num_ctx_lock = threading.Lock()
+_warm_lock = threading.Lock()
+
+
+def ollama_num_ctx(model: str, prompt_tokens: int = 0) -> int:
+    """Context window for the next request to `model` (OLLAMA_NUM_CTX if set)."""
+    if OLLAMA_NUM_CTX:
+        return OLLAMA_NUM_CTX
+    size = _MIN_NUM_CTX
+    while size < prompt_tokens + _OUTPUT_RESERVE_TOKENS and size < OLLAMA_NUM_CTX_MAX:
+        size *= 2
+    size = min(size, OLLAMA_NUM_CTX_MAX)
+    with _num_ctx_lock:
+        previous = _num_ctx.get(model, 0)
+        if size > previous:
+            _num_ctx[model] = size
+            if previous:
+                log.info("Ollama %s: growing num_ctx %d -> %d (model reloads)", model, previous, size)
+        return max(size, previous)
+
+
+@cache
+def _ollama_chat_class():
+    from langchain_ollama import ChatOllama
+
+    class SizedChatOllama(ChatOllama):
+        """ChatOllama whose num_ctx follows the rendered prompt (ollama_num_ctx)."""
+
+        def _chat_params(self, messages, stop=None, **kwargs):
+            params = super()._chat_params(messages, stop, **kwargs)
+            options = params.get("options")
+            if self.num_ctx is None and isinstance(options, dict) and "num_ctx" not in options:
+                chars = sum(len(m.get("content") or "") for m in params["messages"])
+                images = sum(len(m.get("images") or []) for m in params["messages"])
+                tokens = chars // _CHARS_PER_TOKEN + images * _IMAGE_TOKENS
+                options["num_ctx"] = ollama_num_ctx(self.model, tokens)
+            return params
+
+    return SizedChatOllama
+
+
+def ollama_models() -> list[str]:
+    """Every Ollama model the configuration can call (steps, fallbacks, vision)."""
+    chain = [
+        *STEP_MODELS.values(),
+        (LLM_PROVIDER, LLM_MODEL),
+        *LLM_FALLBACKS,
+        (IMAGE_MODEL_PROVIDER, IMAGE_MODEL),
+        *IMAGE_MODEL_FALLBACKS,
+    ]
+    return list(dict.fromkeys(model for provider, model in chain if provider == "ollama" and model))
+
+
+def warm_ollama_models(background: bool = True) -> threading.Thread | None:
+    """Load the configured Ollama models now so the first step skips the cold load.
+
+    An empty generate request loads a model with the run's keep_alive and
+    num_ctx. Skipped when no Ollama model is configured or a warm-up is already
+    in progress; failures are logged, never raised.
     """
-    Get the LLM based on provider and model from config
-    
+    models = ollama_models()
+    if not models:
+        return None
+
+    def warm():
+        if not _warm_lock.acquire(blocking=False):
+            return
+        try:
+            from ollama import Client
+
+            client = Client(host=OLLAMA_HOST or None)
+            for model in models:
+                start = time.monotonic()
+                client.generate(
+                    model=model,
+                    prompt="",
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                    options={"num_ctx": ollama_num_ctx(model)},
+                )
+                log.info("Ollama %s loaded in %.1fs", model, time.monotonic() - start)
+        except Exception as e:
+            log.warning("Ollama warm-up failed: %s", e)
+        finally:
+            _warm_lock.release()
+
+    if not background:
+        warm()
+        return None
+    thread = threading.Thread(target=warm, name="dect-ollama-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# ============================================
+# PROVIDER FAILOVER
+# ============================================
+
+class CircuitBreaker:
+    """Per-provider breaker: open after LLM_BREAKER_FAILURES failures in a row.
+
+    While open the provider is skipped. After LLM_BREAKER_COOLDOWN_SEC one call
+    is let through as a probe: success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= LLM_BREAKER_COOLDOWN_SEC:
+            return "half-open"
+        return "open"
+
+    def can_try(self) -> bool:
+        """Whether a call could go to this provider now (no side effects)."""
+        with self._lock:
+            state = self.state
+            return state == "closed" or (state == "half-open" and not self._probing)
+
+    def allow(self) -> bool:
+        """Admit a call about to be made (takes the half-open probe slot).
+
+        Call only right before invoking the provider. The call must end in
+        success(), failure() or release().
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                log.info("Re-probing provider %s after its cooldown", self.provider)
+                return True
+            return False
+
+    def release(self) -> None:
+        """The admitted call ended without a verdict (e.g. cancelled): free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                log.info("Provider %s is healthy again", self.provider)
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= LLM_BREAKER_FAILURES:
+                if self.opened_at is None or self._probing:
+                    log.warning(
+                        "Provider %s failed %d time(s) in a row; skipping it for %.0fs",
+                        self.provider,
+                        self.failures,
+                        LLM_BREAKER_COOLDOWN_SEC,
+                    )
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    with _registry_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+# "provider:model" labels of the calls served inside a served_models() block
+_served: contextvars.ContextVar[Counter | None] = contextvars.ContextVar(
+    "dect_served_models", default=None
+)
+
+
+@contextmanager
+def served_models():
+    """Count which model served each LLM call made inside the block (threads included)."""
+    counts: Counter = Counter()
+    token = _served.set(counts)
+    try:
+        yield counts
+    finally:
+        _served.reset(token)
+
+
+def _record_served(label: str) -> None:
+    counts = _served.get()
+    if counts is not None:
+        counts[label] += 1
+
+
+class FailoverLLM(Runnable):
+    """Chat model that tries an ordered chain of (provider, model) until one answers.
+
+    Providers whose circuit breaker is open are skipped; if every breaker is
+    open the chain is tried anyway rather than failing outright. Clients are
+    created on first use, so an unused fallback never imports its SDK.
+    """
+
+    def __init__(self, chain: list[tuple[str, str]]):
+        self.chain = chain
+
+    def _attempts(self):
+        """(provider, model) entries to call, in order, each admitted by its breaker.
+
+        Eligibility is checked without side effects; a half-open provider's
+        probe slot is taken only right before that provider is called. If no
+        provider is eligible (all open), the chain is tried anyway.
+        """
+        admitted = False
+        for provider, model in self.chain:
+            breaker = breaker_for(provider)
+            if breaker.can_try() and breaker.allow():
+                admitted = True
+                yield provider, model, breaker
+        if not admitted:
+            for provider, model in self.chain:
+                yield provider, model, breaker_for(provider)
+
+    def _failed(self, provider: str, model: str, breaker: CircuitBreaker, error: Exception) -> None:
+        breaker.failure()
+        log.warning("%s:%s failed (%s); trying the next provider, if any", provider, model, error)
+
+    def _served(self, provider: str, model: str, breaker: CircuitBreaker) -> None:
+        breaker.success()
+        _record_served(f"{provider}:{model}")
+
+    def invoke(self, input, config=None, **kwargs):
+        error = None
+        for provider, model, breaker in self._attempts():
+            try:
+                result = get_chat_model(provider, model).invoke(input, config, **kwargs)
+            except Exception as e:
+                self._failed(provider, model, breaker, e)
+                error = e
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            self._served(provider, model, breaker)
+            return result
+        raise error
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        error = None
+        for provider, model, breaker in self._attempts():
+            try:
+                result = await get_chat_model(provider, model).ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self._failed(provider, model, breaker, e)
+                error = e
+                continue
+            except BaseException:
+                # Cancelled (run stopped, hedge lost): no verdict on the provider
+                breaker.release()
+                raise
+            self._served(provider, model, breaker)
+            return result
+        raise error
+
+
+def _with_fallbacks(primary: tuple[str, str], fallbacks: list[tuple[str, str]]):
+    chain = [primary, *(entry for entry in fallbacks if entry != primary)]
+    if len(chain) == 1:
+        return get_chat_model(*primary)
+    return FailoverLLM(chain)
+
+
+def get_llm(step: int | None = None):
+    """
+    Get the LLM for a pipeline step (or the default LLM_PROVIDER / LLM_MODEL)
+
+    Clients are created once per (provider, model) and shared. With
+    LLM_FALLBACKS set, the step's model is wrapped in a FailoverLLM.
+
     Returns:
-        LLM instance (ChatOpenAI, ChatAnthropic, or ChatOllama)
+        LLM instance (ChatOpenAI, ChatAnthropic, ChatOllama or FailoverLLM)
     """
-    print(f"🤖 Initializing LLM: {LLM_PROVIDER} ({LLM_MODEL})")
-    
-    if LLM_PROVIDER == "openai":
-        return ChatOpenAI(model=LLM_MODEL, api_key=OPENAI_API_KEY)
-    elif LLM_PROVIDER == "anthropic":
-        return ChatAnthropic(model_name=LLM_MODEL, api_key=ANTHROPIC_API_KEY, timeout=None, stop=None)
-    elif LLM_PROVIDER == "ollama":
-        return ChatOllama(model=LLM_MODEL, base_url=OLLAMA_HOST)
-    else:
-        raise ValueError(f"❌ Unknown provider: {LLM_PROVIDER}")
+    return _with_fallbacks(step_model(step), LLM_FALLBACKS)
+
+
+def get_chat_model(provider: str, model: str):
+    """Shared client for (provider, model), created on first use.
+
+    The same instance is returned to every caller and thread. Run async calls
+    on it only through run_async (one loop per process), never asyncio.run.
+    """
+    key = (provider, model)
+    llm = _llm_registry.get(key)
+    if llm is not None:
+        return llm
+    with _registry_lock:
+        if key not in _llm_registry:
+            print(f"🤖 Initializing LLM: {provider} ({model})")
+            _llm_registry[key] = _chat_model(provider, model)
+        return _llm_registry[key]
 
 def get_image_llm():
     """
-    Use multimodal LLM for image captioning
+    Use multimodal LLM for image captioning (IMAGE_MODEL_FALLBACKS as failover)
     
     Returns:
         Vision-capable LLM instance
     """
     print(f"👁️ Initializing vision LLM: {IMAGE_MODEL_PROVIDER} ({IMAGE_MODEL})")
-    
-    if IMAGE_MODEL_PROVIDER == "openai":
-        return ChatOpenAI(model=IMAGE_MODEL, api_key=OPENAI_API_KEY)
-    elif IMAGE_MODEL_PROVIDER == "anthropic":
-        return ChatAnthropic(model_name=IMAGE_MODEL, api_key=ANTHROPIC_API_KEY, timeout=None, stop=None)
-    elif IMAGE_MODEL_PROVIDER == "ollama":
-        return ChatOllama(model=IMAGE_MODEL, base_url=OLLAMA_HOST)
-    else:
-        raise ValueError(f"❌ Unknown image model provider: {IMAGE_MODEL_PROVIDER}")
\ No newline at end of file
+    return _with_fallbacks((IMAGE_MODEL_PROVIDER, IMAGE_MODEL), IMAGE_MODEL_FALLBACKS)
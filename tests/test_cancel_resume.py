@@ -0,0 +1,46 @@
+"""Where a cancelled FR resumes: the last step with every earlier step done."""
+
+import pytest
+
+from core.cancel import CancelToken
+from core.fr_graph import _graph_done_steps, execute_step
+from core.io import write_step_json
+from core.logbook_index import fr_statuses
+
+PDF, FR, TEXT = "a.pdf", "FR-1", "The system shall ..."
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def cancelled():
+    token = CancelToken()
+    token.cancel()
+    return token
+
+
+def _status():
+    (row,) = fr_statuses(PDF)
+    return row["phase"], row["step"]
+
+
+def test_resume_point_ignores_steps_done_out_of_order(cancelled):
+    # Step 4 finished before step 3 was cancelled: the FR resumes after step 2
+    result = execute_step(PDF, FR, TEXT, 3, cancelled, done={1, 2, 4})
+    assert result["cancelled"] and result["current_step"] == 2
+    assert _status() == ("cancelled", 2)
+
+
+def test_resume_point_defaults_to_the_logbook(cancelled):
+    for step in (1, 2):
+        write_step_json(PDF, FR, TEXT, step, {"system_prompt": "s"}, {}, llm_response={"ok": step})
+    result = execute_step(PDF, FR, TEXT, 5, cancelled)
+    assert result["current_step"] == 2
+
+
+def test_graph_counts_resumed_steps_as_done():
+    state = {"start_step": 2, "done_steps": [3]}
+    assert _graph_done_steps(state) == {1, 2, 3}
@@ -0,0 +1,74 @@
+"""Provider failover and circuit breakers (llm_client.FailoverLLM)."""
+
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+import llm_client
+from config import LLM_BREAKER_COOLDOWN_SEC, LLM_BREAKER_FAILURES
+
+
+def _fail(_):
+    raise ConnectionError("503 overloaded")
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    calls = []
+    models = {
+        "up": RunnableLambda(lambda x: calls.append("up") or "from up"),
+        "up2": RunnableLambda(lambda x: calls.append("up2") or "from up2"),
+        "down": RunnableLambda(lambda x: calls.append("down") or _fail(x)),
+    }
+    monkeypatch.setattr(llm_client, "get_chat_model", lambda provider, model: models[provider])
+    monkeypatch.setattr(llm_client, "_breakers", {})
+    return calls
+
+
+def _half_open(provider: str) -> llm_client.CircuitBreaker:
+    breaker = llm_client.breaker_for(provider)
+    breaker.failures = LLM_BREAKER_FAILURES
+    breaker.opened_at = time.monotonic() - LLM_BREAKER_COOLDOWN_SEC - 1
+    return breaker
+
+
+def test_uncalled_half_open_provider_keeps_its_probe(providers):
+    first, second = _half_open("up"), _half_open("up2")
+    llm = llm_client.FailoverLLM([("up", "m"), ("up2", "m")])
+
+    assert llm.invoke("hi") == "from up"
+    assert providers == ["up"]
+    assert first.state == "closed"
+    # The second provider was never called, so its probe slot is still free
+    assert second.state == "half-open" and second.can_try()
+    assert second.allow()
+
+
+def test_fails_over_and_opens_breaker(providers):
+    llm = llm_client.FailoverLLM([("down", "m"), ("up", "m")])
+    for _ in range(LLM_BREAKER_FAILURES):
+        assert llm.invoke("hi") == "from up"
+    assert llm_client.breaker_for("down").state == "open"
+
+    providers.clear()
+    assert llm.invoke("hi") == "from up"
+    assert providers == ["up"]  # open provider skipped
+
+
+def test_failed_probe_reopens_breaker(providers):
+    breaker = _half_open("down")
+    llm = llm_client.FailoverLLM([("down", "m"), ("up", "m")])
+    assert llm.invoke("hi") == "from up"
+    assert breaker.state == "open" and not breaker.can_try()
+
+
+def test_all_open_still_tries_the_chain(providers):
+    llm = llm_client.FailoverLLM([("down", "m")])
+    for _ in range(LLM_BREAKER_FAILURES):
+        with pytest.raises(ConnectionError):
+            llm.invoke("hi")
+    providers.clear()
+    with pytest.raises(ConnectionError):
+        llm.invoke("hi")
+    assert providers == ["down"]
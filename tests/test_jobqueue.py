@@ -0,0 +1,47 @@
+"""Durable job queue (core.jobqueue): resume, release and run cancellation."""
+
+import pytest
+
+from core.jobqueue import JobQueue
+from core.steps import ready_steps, resume_step
+
+RUN = "run-1"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.sqlite")
+
+
+def test_enqueue_resumes_after_start_step(queue):
+    queue.enqueue_fr(RUN, "a.pdf", "FR-1", "text", start_step=2)
+    steps = queue.fr_steps(RUN)[("a.pdf", "FR-1")]
+    assert {step for step, status in steps.items() if status == "done"} == {1, 2}
+    queued = {step for step, status in steps.items() if status == "queued"}
+    assert queued == set(ready_steps({1, 2}))
+    assert queue.claim("w").step in queued
+
+
+def test_release_keeps_the_attempt(queue):
+    queue.enqueue_fr(RUN, "a.pdf", "FR-1", "text")
+    job = queue.claim("w")
+    queue.release(job)
+    again = queue.claim("w")
+    assert again.id == job.id and again.attempts == 1
+
+
+def test_cancel_run_drains_and_blocks_claims(queue):
+    queue.enqueue_tasks(RUN, {"a.pdf": [{"FR-1": "one"}, {"FR-2": "two"}]})
+    leased = queue.claim("w")
+    assert queue.cancel_run(RUN) == 2
+    assert queue.is_drained(RUN)
+    assert queue.claim("w") is None
+    # The worker that held a lease can neither extend nor complete it
+    assert not queue.heartbeat(leased)
+    queue.complete(leased)
+    assert queue.counts(RUN) == {"cancelled": 2}
+
+
+def test_resume_step_is_the_completed_prefix():
+    assert resume_step(set()) == 0
+    assert resume_step({1, 2, 4}) == 2
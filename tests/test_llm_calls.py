@@ -0,0 +1,128 @@
+"""LLM call path against a real client type (ChatOpenAI) and a local HTTP server.
+
+The server speaks the OpenAI chat-completions API, so the client's real sync
+and async HTTP transports are exercised (a BaseChatModel stub has none).
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+
+from core.cancel import CancelToken, RunCancelled
+from core.llm_steps import _invoke_chain
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, like real servers: the client pools and reuses connections
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        body = json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test-model",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"ok": True})},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client aborted the request (cancel)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.delay = 0.0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+
+
+def _chain(httpd):
+    llm = ChatOpenAI(
+        model="test-model",
+        api_key="test",
+        base_url=f"http://127.0.0.1:{httpd.server_port}/v1",
+        max_retries=0,
+    )
+    prompt = ChatPromptTemplate.from_messages([("user", "Return JSON")])
+    return prompt | llm | JsonOutputParser()
+
+
+def test_shared_client_survives_many_cancellable_calls(server):
+    # The same client (as from the llm_client registry) serves every call
+    chain = _chain(server)
+    for _ in range(3):
+        assert _invoke_chain(chain, CancelToken()) == {"ok": True}
+
+
+def test_shared_client_across_threads(server):
+    chain = _chain(server)
+    results = []
+
+    def call():
+        results.append(_invoke_chain(chain, CancelToken()))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert results == [{"ok": True}] * 4
+
+
+def test_cancel_aborts_in_flight_request(server):
+    server.delay = 5.0
+    chain = _chain(server)
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(RunCancelled):
+        _invoke_chain(chain, token)
+    assert time.monotonic() - start < 3.0
+    # The client still works after an aborted request
+    server.delay = 0.0
+    assert _invoke_chain(chain, CancelToken()) == {"ok": True}
+
+
+@pytest.mark.skipif(not hasattr(__import__("os"), "fork"), reason="needs os.fork")
+def test_registry_shares_clients_and_resets_in_forked_child(monkeypatch):
+    import os
+
+    import llm_client
+
+    monkeypatch.setattr(llm_client, "_chat_model", lambda provider, model: object())
+    first = llm_client.get_chat_model("openai", "shared-model")
+    assert llm_client.get_chat_model("openai", "shared-model") is first
+    llm_client.llm_loop()
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: no inherited clients or loop (its thread did not survive the fork)
+        ok = not llm_client._llm_registry and llm_client._loop is None
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert llm_client.get_chat_model("openai", "shared-model") is first
+    llm_client._llm_registry.pop(("openai", "shared-model"))
@@ -0,0 +1,57 @@
+"""Compact step files: input refs stay correct when a producer step is rerun."""
+
+import pytest
+
+from core import io
+from core.io import prepare_step_input_with_ref, read_step_json, write_step_json
+
+PDF, FR, TEXT = "a.pdf", "FR-1", "The system shall ..."
+PROMPT = {"system_prompt": "s", "user_prompt": "u"}
+
+
+@pytest.fixture(autouse=True)
+def logbook(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(io, "LOGBOOK_FORMAT", "compact")
+
+
+def _write(step: int, response: dict) -> None:
+    step_input, ref = prepare_step_input_with_ref(PDF, FR, TEXT, step)
+    write_step_json(PDF, FR, TEXT, step, PROMPT, step_input, llm_response=response, input_ref=ref)
+
+
+def test_ref_records_the_producer_hash():
+    _write(1, {"atomic_blocks": ["old"]})
+    _, ref = prepare_step_input_with_ref(PDF, FR, TEXT, 2)
+    assert ref == {"step": 1, "hash": io.content_hash({"atomic_blocks": ["old"]})}
+    _write(2, {"partitions": []})
+    _write(3, {"boundaries": []})
+    _, ref = prepare_step_input_with_ref(PDF, FR, TEXT, 4)
+    assert ref["steps"] == [2, 3] and len(ref["hashes"]) == 2
+
+
+def test_rerun_producer_inlines_the_old_input():
+    _write(1, {"atomic_blocks": ["old"]})
+    _write(2, {"partitions": []})
+    assert "input_ref" in read_step_json(PDF, FR, 2, resolve=False)
+
+    _write(1, {"atomic_blocks": ["new"]})
+    step2 = read_step_json(PDF, FR, 2, resolve=False)
+    assert "input_ref" not in step2
+    assert step2["input_data"] == {"atomic_blocks": ["old"]}
+
+
+def test_producer_rerun_before_write_is_inlined():
+    _write(1, {"atomic_blocks": ["old"]})
+    step_input, ref = prepare_step_input_with_ref(PDF, FR, TEXT, 2)
+    _write(1, {"atomic_blocks": ["new"]})
+    write_step_json(PDF, FR, TEXT, 2, PROMPT, step_input, llm_response={}, input_ref=ref)
+    step2 = read_step_json(PDF, FR, 2, resolve=False)
+    assert "input_ref" not in step2
+    assert step2["input_data"] == {"atomic_blocks": ["old"]}
+
+
+def test_stale_ref_resolves_to_none():
+    _write(1, {"atomic_blocks": ["new"]})
+    data = {"fr_text": TEXT, "input_ref": {"step": 1, "hash": io.content_hash({"atomic_blocks": ["old"]})}}
+    assert io._resolve_input_ref(io.logbook_dir(PDF, FR), data, data["input_ref"]) is None
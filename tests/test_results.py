@@ -0,0 +1,101 @@
+"""Incremental results (core.results): shards, the combined output and the CSV."""
+
+import json
+
+import pytest
+
+from core import results
+from core.results import combine_result_shards, write_result_shard
+from downloads.paths import FINAL_JSON_PATH
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def _cases(n: int) -> dict:
+    return {"test_cases": [{"title": f"case {i}"} for i in range(n)]}
+
+
+def test_combine_folds_in_new_shards():
+    assert combine_result_shards() is None
+    write_result_shard("a.pdf", "FR-1", _cases(2))
+    assert combine_result_shards() == {"suites": 1, "test_cases": 2}
+    write_result_shard("a.pdf", "FR-2", _cases(3))
+    assert combine_result_shards() == {"suites": 2, "test_cases": 5}
+    data = json.loads(FINAL_JSON_PATH.read_text(encoding="utf-8"))
+    assert [suite["fr_id"] for suite in data["test_suite"]] == ["FR-1", "FR-2"]
+
+
+def test_unchanged_shards_read_nothing(monkeypatch):
+    write_result_shard("a.pdf", "FR-1", _cases(2))
+    combine_result_shards()
+
+    def no_read(path, default):
+        raise AssertionError(f"read {path}")
+
+    monkeypatch.setattr(results, "_load_json", lambda path, default: (
+        json.loads(path.read_text(encoding="utf-8")) if path == results.MANIFEST_PATH else no_read(path, default)
+    ))
+    assert combine_result_shards() == {"suites": 1, "test_cases": 2}
+
+
+def _write_shards(worker: int) -> None:
+    for i in range(20):
+        write_result_shard("a.pdf", f"FR-{worker}-{i}", _cases(3))
+
+
+def test_csv_appends_from_several_processes():
+    import csv
+    import multiprocessing
+
+    from downloads.paths import FINAL_CSV_PATH
+
+    processes = [multiprocessing.Process(target=_write_shards, args=(w,)) for w in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    with open(FINAL_CSV_PATH, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    # One header, and every FR's rows whole
+    assert len(rows) == 4 * 20 * 3
+    assert {row["FR ID"] for row in rows} == {f"FR-{w}-{i}" for w in range(4) for i in range(20)}
+    assert all(row["Document"] == "a.pdf" for row in rows)
+
+
+def test_snippet_is_memoised_until_results_change(monkeypatch):
+    import downloads.ensure
+    from downloads import dataframe
+
+    calls = []
+    ensure = downloads.ensure.ensure_final_output_json
+    monkeypatch.setattr(downloads.ensure, "ensure_final_output_json", lambda: calls.append(1) or ensure())
+
+    for i in range(30):
+        write_result_shard("a.pdf", f"FR-{i:02d}", _cases(2))
+    first = dataframe.load_final_output_as_dataframe(limit_rows=5, truncate_for_snippet=True)
+    assert list(first["FR ID"]) == ["FR-00", "FR-00", "FR-01", "FR-01", "FR-02"]
+    assert len(calls) == 1
+
+    # Nothing changed: no combine and no parse
+    dataframe.load_final_output_as_dataframe(limit_rows=5, truncate_for_snippet=True)
+    assert len(calls) == 1
+
+    write_result_shard("a.pdf", "FR-00", _cases(1))
+    again = dataframe.load_final_output_as_dataframe(limit_rows=5, truncate_for_snippet=True)
+    assert list(again["FR ID"]) == ["FR-00", "FR-01", "FR-01", "FR-02", "FR-02"]
+    assert len(calls) == 2
+
+
+def test_leading_suites_stop_early(tmp_path, monkeypatch):
+    from downloads import dataframe
+
+    monkeypatch.setattr(dataframe, "_READ_CHUNK", 64)
+    path = tmp_path / "out.json"
+    suites = [{"fr_id": f"FR-{i}", "test_cases": [{"title": "x" * 50}] * 2} for i in range(100)]
+    path.write_text(json.dumps({"document_id": "a.pdf", "test_suite": suites}, indent=2), encoding="utf-8")
+    assert dataframe._read_leading_suites(path, 5) == suites[:3]
+    assert dataframe._read_leading_suites(path, 1000) == suites
@@ -0,0 +1,89 @@
+"""Cross-FR step batching (core.llm_steps._StepBatcher) and cancellation."""
+
+import threading
+import time
+
+import pytest
+
+from core import llm_steps
+from core.cancel import CancelToken, RunCancelled
+from core.concurrency import llm_slot
+
+STEP = 5
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    monkeypatch.setattr(llm_steps, "STEP_BATCH_SIZE", 3)
+    monkeypatch.setattr(llm_steps, "STEP_BATCH_WINDOW_SEC", 0.5)
+    sent = []
+
+    def invoke_batch(step_number, items):
+        sent.append([item.fr_text for item in items])
+        return [{"fr": item.fr_text} for item in items]
+
+    monkeypatch.setattr(llm_steps, "_invoke_batch", invoke_batch)
+    batcher = llm_steps._StepBatcher()
+    batcher.sent = sent
+    return batcher
+
+
+def _submit(batcher, fr_text, token, results):
+    def run():
+        try:
+            results[fr_text] = batcher.submit(STEP, {}, {}, fr_text, token)
+        except RunCancelled as e:
+            results[fr_text] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_full_group_is_sent_as_one_batch(batcher):
+    results = {}
+    threads = [_submit(batcher, f"FR-{i}", CancelToken(), results) for i in range(3)]
+    for thread in threads:
+        thread.join(5)
+    assert batcher.sent == [["FR-0", "FR-1", "FR-2"]]
+    assert results == {f"FR-{i}": {"fr": f"FR-{i}"} for i in range(3)}
+
+
+def test_cancelled_items_are_dropped_before_the_batch_is_sent(batcher):
+    results = {}
+    cancelled = CancelToken()
+    threads = [
+        _submit(batcher, "FR-0", CancelToken(), results),
+        _submit(batcher, "FR-1", cancelled, results),
+    ]
+    time.sleep(0.1)
+    cancelled.cancel()
+    threads.append(_submit(batcher, "FR-2", CancelToken(), results))
+    for thread in threads:
+        thread.join(5)
+    # The group filled up, but only the live FRs were sent
+    assert batcher.sent == [["FR-0", "FR-2"]]
+    assert isinstance(results["FR-1"], RunCancelled)
+    assert results["FR-0"] == {"fr": "FR-0"}
+
+
+def test_cancelled_first_item_stops_waiting_and_sends_nothing(batcher, monkeypatch):
+    monkeypatch.setattr(llm_steps, "STEP_BATCH_WINDOW_SEC", 10.0)
+    results = {}
+    token = CancelToken()
+    thread = _submit(batcher, "FR-0", token, results)
+    time.sleep(0.1)
+    start = time.monotonic()
+    token.cancel()
+    thread.join(5)
+    assert time.monotonic() - start < 1.0
+    assert isinstance(results["FR-0"], RunCancelled)
+    assert batcher.sent == []
+
+
+def test_llm_slot_is_not_taken_once_cancelled():
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(RunCancelled):
+        with llm_slot(token):
+            pytest.fail("slot taken after cancel")
@@ -0,0 +1,37 @@
+"""Task selector: search, page and timer renders are per browser session."""
+
+import json
+
+import gradio as gr
+import pytest
+
+from components.taskSelector import create_task_selector
+
+
+@pytest.fixture
+def task_selector(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    extracted = tmp_path / "data" / "extractedFR"
+    extracted.mkdir(parents=True)
+    requirements = [{"id": f"FR-{i}", "text": f"Requirement {i}"} for i in range(1, 121)]
+    (extracted / "doc.json").write_text(json.dumps({"requirements": requirements}))
+    with gr.Blocks():
+        yield create_task_selector()
+
+
+def test_timer_renders_each_session(task_selector):
+    sync = task_selector["sync_task_files"]
+    view = task_selector["view_state"].value
+
+    *updates_a, view_a = sync("doc", view)
+    *again_a, view_a = sync("doc", view_a)
+    # A second session still gets its first render
+    *updates_b, view_b = sync("doc", view)
+    assert updates_a == updates_b
+    assert again_a == [gr.update()] * len(updates_a)
+    assert view == {"query": "", "page": 1, "rendered": None}
+
+
+def test_reset_gives_a_fresh_view(task_selector):
+    *_updates, view = task_selector["reset_task_files"]()
+    assert view["page"] == 1 and view["query"] == "" and view["rendered"] is None
@@ -0,0 +1,91 @@
+"""Progress forwarding between the warm worker and the UI handle."""
+
+import threading
+import time
+from multiprocessing import Pipe
+
+from core import warm_worker
+from core.warm_worker import PipelineRun, _ProgressForwarder
+
+
+def _event(fr: int, step: int) -> dict:
+    return {"pdf": "a.pdf", "fr_id": f"FR-{fr}", "step": step, "phase": "running", "message": "x" * 1000}
+
+
+def test_put_never_blocks_on_a_full_pipe():
+    reader, writer = Pipe(duplex=False)
+    forwarder = _ProgressForwarder(writer, threading.Lock())
+    start = time.monotonic()
+    # Far more than the pipe buffer holds; nobody reads yet
+    for step in range(1, 9):
+        for fr in range(1000):
+            forwarder.put(_event(fr, step))
+    assert time.monotonic() - start < 5.0
+    assert forwarder.dropped > 0
+
+    messages = []
+    while reader.poll(1.0):
+        messages.append(reader.recv())
+    # Coalesced and bounded, and the last status sent is the latest one
+    assert len(messages) < 8 * 1000 / 4
+    assert messages[-1]["fr_id"] == "FR-999" and messages[-1]["step"] == 8
+
+
+class _LiveProcess:
+    def poll(self):
+        return None
+
+
+def test_run_handle_forgets_consumed_progress():
+    reader, writer = Pipe(duplex=False)
+    run = PipelineRun(worker=None, process=_LiveProcess(), conn=reader)
+    sent = warm_worker.PROGRESS_KEEP + 50
+
+    def send():
+        for fr in range(sent):
+            writer.send({"type": "progress", "fr_id": f"FR-{fr}", "step": 1})
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    while sender.is_alive() or reader.poll(0):
+        run.poll()
+    assert len(run.progress) == warm_worker.PROGRESS_KEEP
+    assert run.progress[-1]["fr_id"] == f"FR-{sent - 1}"
+
+    writer.send({"type": "progress", "fr_id": "FR-0", "step": 2})
+    events = run.wait_progress(1.0)
+    assert events[-1]["step"] == 2
+    assert run.progress == []
+
+
+def test_run_loop_renders_a_progress_burst_once():
+    from components.top import RUN_UI_MIN_INTERVAL_SEC, _wait_for_progress
+
+    reader, writer = Pipe(duplex=False)
+    run = PipelineRun(worker=None, process=_LiveProcess(), conn=reader)
+    stop = threading.Event()
+
+    def send():
+        fr = 0
+        while not stop.wait(0.02):
+            writer.send({"type": "progress", "fr_id": f"FR-{fr}", "step": 1})
+            fr += 1
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    try:
+        last_render = time.monotonic()
+        _wait_for_progress(run, last_render, 10.0)
+        waited = time.monotonic() - last_render
+    finally:
+        stop.set()
+        sender.join()
+    # Not woken by each event, and the burst was drained meanwhile
+    assert RUN_UI_MIN_INTERVAL_SEC <= waited < 5.0
+    assert len(run.progress) <= 2
+
+    # A finished run is rendered at once
+    writer.send({"type": "done", "returncode": 0})
+    start = time.monotonic()
+    _wait_for_progress(run, start, 10.0)
+    assert time.monotonic() - start < RUN_UI_MIN_INTERVAL_SEC
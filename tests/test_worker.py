@@ -0,0 +1,58 @@
+"""Queue workers (core.worker): a lost lease aborts the step, not the FR."""
+
+import threading
+import time
+
+import pytest
+
+import core.fr_graph
+import core.jobqueue
+import core.worker
+from core.jobqueue import JobQueue
+from core.logbook_index import fr_statuses
+from core.status import set_fr_status
+from core.worker import run_job
+
+PDF, FR, TEXT = "a.pdf", "FR-1", "The system shall ..."
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_lost_lease_leaves_the_fr_to_the_new_owner(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.jobqueue, "JOB_LEASE_SEC", 0.2)
+    monkeypatch.setattr(core.worker, "JOB_LEASE_SEC", 0.2)  # heartbeat every 1s
+    started = threading.Event()
+
+    def blocking_llm(step_number, step_prompt, step_input_data, fr_text, cancel):
+        started.set()
+        cancel.wait(10)
+        cancel.raise_if_cancelled()
+        return {}
+
+    monkeypatch.setattr(core.fr_graph, "invoke_step_fanned_out", blocking_llm)
+    queue = JobQueue(tmp_path / "jobs.sqlite")
+    queue.enqueue_fr("run-1", PDF, FR, TEXT)
+
+    job_a = queue.claim("worker-a")
+    results = []
+    worker_a = threading.Thread(target=lambda: results.append(run_job(queue, job_a)))
+    worker_a.start()
+    assert started.wait(5)
+
+    # Worker A stalls past its lease; worker B takes the job over and runs it
+    job_b = None
+    while job_b is None:
+        time.sleep(0.05)
+        job_b = queue.claim("worker-b")
+    assert job_b.id == job_a.id
+    set_fr_status(PDF, FR, job_b.step, "running", f"Step {job_b.step}/8")
+
+    # A's next heartbeat fails and its step aborts
+    worker_a.join(10)
+    assert results == [False]
+    (row,) = fr_statuses(PDF)
+    assert row["phase"] == "running"
+    assert queue.heartbeat(job_b)